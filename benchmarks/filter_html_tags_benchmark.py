@@ -0,0 +1,120 @@
+"""
+Compares the time of nina_string_helper.filter_html_tags with the old implementation (per character loop with str +=
+and a substring probe at every index) on warning descriptions and covid rules, and checks that both give the same
+output.
+
+Usage: python filter_html_tags_benchmark.py [directory with recorded NINA API responses (nina_http_record_directory)]
+The descriptions (info/description), covid rules (rules/text) and general covid infos (generalInfo) of all .json files
+in the directory are used. Without a directory synthetic MOWAS / DWD like descriptions are generated.
+"""
+
+import json
+import os
+import random
+import sys
+import time
+
+sys.path.insert(0, os.path.join(os.path.dirname(os.path.abspath(__file__)), "..", "source"))
+
+import nina_string_helper
+
+_NUMBER_OF_DESCRIPTIONS = 500
+_REPETITIONS = 5
+
+
+def _filter_html_tags_old(s: str) -> str:
+    filtered_string = ""
+    opened_brackets_counter = 0
+    link = ""
+    in_text = False
+    s = s.replace("&nbsp;", " ")
+    for i in range(0, len(s)):
+        c = s[i]
+        if c == '<':
+            in_text = False
+            opened_brackets_counter += 1
+        if opened_brackets_counter == 0:
+            filtered_string += c
+            if len(link) != 0 and i + 1 < len(s) and s[i + 1] == "<" and in_text:
+                filtered_string += ": " + link
+                link = ""
+        if nina_string_helper.find_specific(s, i, "/p"):
+            filtered_string += '\n'
+        if not in_text and nina_string_helper.find_specific(s, i, "br"):
+            filtered_string += '\n'
+        if nina_string_helper.find_specific(s, i, "href="):
+            link = ""
+            for j in range(i + len("href=\""), len(s)):
+                if s[j] == '"':
+                    break
+                link += s[j]
+        if c == '>':
+            opened_brackets_counter -= 1
+            in_text = True
+    return filtered_string
+
+
+def _collect_texts(value, texts: list):
+    if isinstance(value, dict):
+        for key, child in value.items():
+            if key in ("description", "text", "generalInfo") and isinstance(child, str):
+                texts.append(child)
+            else:
+                _collect_texts(child, texts)
+    elif isinstance(value, list):
+        for child in value:
+            _collect_texts(child, texts)
+
+
+def _load_texts(directory: str) -> list[str]:
+    if directory is not None:
+        texts = []
+        for root, directories, names in os.walk(directory):
+            for name in names:
+                if name.endswith(".json"):
+                    with open(os.path.join(root, name), "rb") as file_object:
+                        _collect_texts(json.load(file_object), texts)
+        return texts
+
+    rng = random.Random(42)
+    sentences = ["Es tritt leichter Frost zwischen -1 und -5 °C auf.",
+                 "In Bodennähe wird Glätte durch überfrierende Nässe erwartet.",
+                 "Schließen Sie Fenster und Türen und schalten Sie Lüftungs- und Klimaanlagen ab.",
+                 "Informieren Sie sich in den Medien, zum Beispiel im Radio.",
+                 "Die Pegelstände steigen an der Elbe weiter&nbsp;an."]
+    texts = []
+    for i in range(_NUMBER_OF_DESCRIPTIONS):
+        paragraphs = []
+        for j in range(rng.randint(2, 8)):
+            paragraph = " ".join(rng.choice(sentences) for k in range(rng.randint(1, 4)))
+            if rng.random() < 0.3:
+                paragraph += ' Weitere Informationen: <a href="https://warnung.bund.de/meldung/' + str(i) \
+                             + '" target="_blank">warnung.bund.de</a>'
+            paragraphs.append("<p>" + paragraph + "<br/>Stand: 13.02.2023</p>")
+        texts.append("".join(paragraphs))
+    return texts
+
+
+def main():
+    directory = sys.argv[1] if len(sys.argv) > 1 else None
+    texts = _load_texts(directory)
+    for text in texts:
+        if nina_string_helper.filter_html_tags(text) != _filter_html_tags_old(text):
+            raise AssertionError("different output for: " + text)
+
+    data_set = directory if directory is not None else "synthetic"
+    print("data set: " + data_set + " (" + str(len(texts)) + " texts, "
+          + str(round(sum(len(text) for text in texts) / 1024, 1)) + " KiB)")
+    results = {}
+    for variant, filter_html_tags in [("old", _filter_html_tags_old), ("new", nina_string_helper.filter_html_tags)]:
+        start = time.perf_counter()
+        for i in range(_REPETITIONS):
+            for text in texts:
+                filter_html_tags(text)
+        results[variant] = (time.perf_counter() - start) / _REPETITIONS
+        print(variant + ": " + str(round(results[variant] * 1000, 1)) + " ms")
+    print("speedup: " + str(round(results["old"] / results["new"], 1)) + "x")
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,123 @@
+"""
+Compares the parse time, the number of allocated objects and the retained memory of a full mapData poll cycle (all six
+feeds), parsed eagerly into dataclasses (old nina_service._parse_general_warnings: every start date, type and title
+converted at once) and lazily into __slots__ records (GeneralWarning._from_map_data: converted on first access).
+Most warnings of a cycle are never sent to a user, so only their id, version and severity are read (warning_feed).
+
+Usage: python general_warning_parse_benchmark.py [directory with saved mapData .json responses of the NINA API]
+Without a directory a synthetic cycle with the size of a stormy day (3000 warnings) is generated.
+"""
+
+import json
+import os
+import random
+import sys
+import time
+import tracemalloc
+from dataclasses import dataclass
+
+sys.path.insert(0, os.path.join(os.path.dirname(os.path.abspath(__file__)), "..", "source"))
+
+import nina_service
+from enum_types import WarningSeverity, WarningType
+from nina_service import GeneralWarning
+
+_NUMBER_OF_WARNINGS = 3000
+_REPETITIONS = 20
+
+
+def _load_feeds(directory: str) -> list[bytes]:
+    if directory is not None:
+        feeds = []
+        for name in sorted(os.listdir(directory)):
+            if name.endswith(".json"):
+                with open(os.path.join(directory, name), "rb") as file_object:
+                    feeds.append(file_object.read())
+        return feeds
+
+    rng = random.Random(42)
+    feeds = []
+    for feed in ["dwd", "biwapp", "mowas", "katwarn", "police", "lhp"]:
+        items = []
+        for i in range(_NUMBER_OF_WARNINGS // 6):
+            items.append({"id": feed + ".2.49.0.0.276.0." + str(1676300000000 + i), "version": rng.randint(1, 9),
+                          "startDate": "2023-02-%02dT%02d:00:00+01:00" % (rng.randint(1, 28), rng.randint(0, 23)),
+                          "severity": rng.choice(["Minor", "Moderate", "Severe", "Extreme"]),
+                          "urgency": "Immediate", "type": rng.choice(["Alert", "Update", "Cancel"]),
+                          "i18nTitle": {"de": "Amtliche WARNUNG vor " + rng.choice(["GLÄTTE", "STURMBÖEN", "FROST"]),
+                                        "en": "Official WARNING of " + rng.choice(["ICE", "GALES", "FROST"])}})
+        feeds.append(json.dumps(items).encode())
+    return feeds
+
+
+@dataclass
+class _DataclassGeneralWarning:
+    """the GeneralWarning before it had __slots__ and lazy fields"""
+    id: str
+    version: int
+    start_date: str
+    severity: WarningSeverity
+    type: WarningType
+    title: str
+
+
+def _parse_eagerly(response) -> list[_DataclassGeneralWarning]:
+    return [_DataclassGeneralWarning(item["id"], item["version"], nina_service._translate_time(item["startDate"]),
+                                     nina_service._get_warning_severity(item["severity"]),
+                                     nina_service._get_warning_type(item["type"]), item["i18nTitle"]["de"])
+            for item in response]
+
+
+def _parse_lazily(response) -> list[GeneralWarning]:
+    return nina_service._parse_general_warnings(response)
+
+
+def _poll_cycle(parse, feeds: list[bytes]) -> list:
+    warnings = []
+    for feed in feeds:
+        warnings.extend(parse(json.loads(feed)))
+    for warning in warnings:  # what warning_feed reads of every warning
+        (warning.id, warning.version, warning.severity)
+    return warnings
+
+
+def _measure(parse, feeds: list[bytes]) -> tuple[float, int, int]:
+    """
+    Returns:
+        the time per cycle in seconds, the number of allocated blocks and the retained bytes of one cycle
+    """
+    start = time.perf_counter()
+    for i in range(_REPETITIONS):
+        _poll_cycle(parse, feeds)
+    duration = (time.perf_counter() - start) / _REPETITIONS
+
+    tracemalloc.start()
+    before = tracemalloc.take_snapshot()
+    warnings = _poll_cycle(parse, feeds)
+    after = tracemalloc.take_snapshot()
+    tracemalloc.stop()
+    statistics = after.compare_to(before, "filename")
+    blocks = sum(statistic.count_diff for statistic in statistics)
+    retained = sum(statistic.size_diff for statistic in statistics)
+    del warnings
+    return duration, blocks, retained
+
+
+def main():
+    directory = sys.argv[1] if len(sys.argv) > 1 else None
+    feeds = _load_feeds(directory)
+    data_set = directory if directory is not None else "synthetic (" + str(_NUMBER_OF_WARNINGS) + " warnings)"
+    print("data set: " + data_set)
+    results = {}
+    for variant, parse in [("eager", _parse_eagerly), ("lazy", _parse_lazily)]:
+        results[variant] = _measure(parse, feeds)
+        duration, blocks, retained = results[variant]
+        print(variant + ": " + str(round(duration * 1000, 1)) + " ms per cycle, " + str(blocks) + " blocks, "
+              + str(round(retained / 1024, 1)) + " KiB retained")
+    print("reduction: " + str(round(100 * (1 - results["lazy"][0] / results["eager"][0]), 1)) + " % time, "
+          + str(round(100 * (1 - results["lazy"][1] / results["eager"][1]), 1)) + " % blocks, "
+          + str(round(100 * (1 - results["lazy"][2] / results["eager"][2]), 1)) + " % retained")
+
+
+if __name__ == '__main__':
+    main()
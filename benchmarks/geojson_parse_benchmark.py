@@ -0,0 +1,104 @@
+"""
+Compares the peak memory and the parse time of the geojson of detailed warnings, parsed as a whole with json.loads
+(old nina_service._parse_detailed_warning_geo on response.json()) and parsed feature by feature while it is read
+(nina_service._parse_detailed_warning_geo_stream).
+Every variant runs in its own process, the peak memory is the increase of the maximum RSS while the corpus is parsed.
+The results of all warnings stay alive, like in the geojson cache of nina_service.
+
+Usage: python geojson_parse_benchmark.py [directory with saved .geojson responses of the NINA API]
+Without a directory a synthetic corpus of large flood and weather warnings is generated.
+"""
+
+import json
+import math
+import os
+import random
+import resource
+import subprocess
+import sys
+import tempfile
+import time
+
+sys.path.insert(0, os.path.join(os.path.dirname(os.path.abspath(__file__)), "..", "source"))
+
+_NUMBER_OF_WARNINGS = 20
+_FEATURES_PER_WARNING = 12
+_COORDINATES_PER_RING = 8000
+
+
+def _get_max_rss_in_bytes() -> int:
+    return resource.getrusage(resource.RUSAGE_SELF).ru_maxrss * 1024
+
+
+def _write_synthetic_corpus(directory: str):
+    rng = random.Random(42)
+    for i in range(_NUMBER_OF_WARNINGS):
+        features = []
+        for j in range(_FEATURES_PER_WARNING):
+            center_x = rng.uniform(6.0, 15.0)
+            center_y = rng.uniform(47.5, 55.0)
+            polygons = []
+            for k in range(2):
+                ring = []
+                for n in range(_COORDINATES_PER_RING):
+                    angle = 2 * math.pi * n / _COORDINATES_PER_RING
+                    radius = rng.uniform(0.2, 0.3) + k
+                    ring.append([round(center_x + radius * math.cos(angle), 6),
+                                 round(center_y + radius * math.sin(angle), 6)])
+                ring.append(ring[0])
+                polygons.append([ring])
+            features.append({"type": "Feature", "properties": {"AREADESC": "Gebiet " + str(j)},
+                             "geometry": {"type": "MultiPolygon", "coordinates": polygons}})
+        with open(os.path.join(directory, "warning" + str(i) + ".geojson"), "w") as file_object:
+            json.dump({"type": "FeatureCollection", "features": features}, file_object)
+
+
+def _measure(variant: str, directory: str):
+    import nina_service
+
+    paths = sorted(os.path.join(directory, name) for name in os.listdir(directory) if name.endswith(".geojson"))
+    before = _get_max_rss_in_bytes()
+    start = time.perf_counter()
+    results = []
+    for path in paths:
+        with open(path, "rb") as file_object:
+            if variant == "json":
+                results.append(json.loads(file_object.read())["features"])  # like response.json()
+            else:
+                results.append(nina_service._parse_detailed_warning_geo_stream(file_object))
+    duration = time.perf_counter() - start
+    print(str(_get_max_rss_in_bytes() - before) + " " + str(duration))
+    return results
+
+
+def main():
+    directory = sys.argv[1] if len(sys.argv) > 1 else None
+    with tempfile.TemporaryDirectory() as temporary_directory:
+        if directory is None:
+            _write_synthetic_corpus(temporary_directory)
+            corpus = temporary_directory
+        else:
+            corpus = directory
+        corpus_size = sum(os.path.getsize(os.path.join(corpus, name)) for name in os.listdir(corpus)
+                          if name.endswith(".geojson"))
+        results = {}
+        for variant in ["json", "stream"]:
+            command = [sys.executable, __file__, "--measure", variant, corpus]
+            output = subprocess.run(command, capture_output=True, text=True, check=True).stdout
+            peak, duration = output.strip().splitlines()[-1].split()
+            results[variant] = (int(peak), float(duration))
+
+    data_set = directory if directory is not None else "synthetic (" + str(_NUMBER_OF_WARNINGS) + " warnings, " \
+                                                       + str(_FEATURES_PER_WARNING) + " features each)"
+    print("data set: " + data_set + ", " + str(round(corpus_size / 1024 / 1024, 1)) + " MiB")
+    for variant, (peak, duration) in results.items():
+        print(variant + ": " + str(round(peak / 1024 / 1024, 1)) + " MiB peak, " + str(round(duration, 2)) + " s")
+    print("reduction: " + str(round(100 * (1 - results["stream"][0] / results["json"][0]), 1)) + " % peak memory, "
+          + str(round(100 * (1 - results["stream"][1] / results["json"][1]), 1)) + " % parse time")
+
+
+if __name__ == '__main__':
+    if len(sys.argv) > 3 and sys.argv[1] == "--measure":
+        _measure(sys.argv[2], sys.argv[3])
+    else:
+        main()
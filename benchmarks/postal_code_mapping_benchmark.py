@@ -0,0 +1,128 @@
+"""
+Compares the time to compute the postal codes in the polygons of warnings with the former warning_handler.
+write_postal_codes (place_converter.get_postal_code_dicts_in_polygon: one thread, the polygons of all postal codes built
+again for every ring) with the process pool of postal_code_mapper on 1 to N processes, and checks that both give the
+same postal codes.
+
+Usage: python postal_code_mapping_benchmark.py [path to a saved georef-germany-postleitzahl json] [N]
+Without a path a synthetic data set with the size of the real one (8200 postal codes) is generated, N is the number of
+CPU cores by default. The warnings are synthetic polygons of the size of DWD, MOWAS and LHP warnings.
+"""
+
+import json
+import math
+import os
+import random
+import sys
+import time
+from concurrent.futures import ProcessPoolExecutor
+
+import numpy
+import shapely
+
+sys.path.insert(0, os.path.join(os.path.dirname(os.path.abspath(__file__)), "..", "source"))
+
+import postal_code_mapper
+from postal_code_store import PostalCodeStore
+
+_NUMBER_OF_POSTAL_CODES = 8200
+_COORDINATES_PER_POLYGON = 400
+_NUMBER_OF_WARNINGS = 200
+_NUMBER_OF_OLD_WARNINGS = 10
+"""the old implementation is slow, it is only measured on the first warnings and extrapolated"""
+
+
+def _get_circle(rng: random.Random, center_x: float, center_y: float, radius: float, coordinates: int) -> list:
+    ring = [[center_x + radius * math.cos(2 * math.pi * k / coordinates),
+             center_y + radius * math.sin(2 * math.pi * k / coordinates)] for k in range(coordinates)]
+    ring.append(ring[0])
+    return ring
+
+
+def _load_records(path: str) -> list[tuple]:
+    if path is not None:
+        with open(path) as file_object:
+            postal_code_table = json.load(file_object)
+        return [(record['fields']['plz_code'], record['fields']['plz_name'], record['fields']['krs_code'],
+                 record['fields']['geometry']['coordinates'][0]) for record in postal_code_table['records']]
+
+    rng = random.Random(42)
+    return [(str(10000 + i), "Ort " + str(i % 5000), "%05d" % (1000 + i % 400),
+             _get_circle(rng, rng.uniform(6.0, 15.0), rng.uniform(47.5, 55.0), rng.uniform(0.02, 0.06),
+                         _COORDINATES_PER_POLYGON))
+            for i in range(_NUMBER_OF_POSTAL_CODES)]
+
+
+def _get_warnings() -> list[tuple[str, list[numpy.ndarray]]]:
+    rng = random.Random(7)
+    warnings = []
+    for i in range(_NUMBER_OF_WARNINGS):
+        rings = []
+        for j in range(rng.choice([1, 1, 1, 2, 3])):
+            rings.append(numpy.asarray(_get_circle(rng, rng.uniform(6.0, 15.0), rng.uniform(47.5, 55.0),
+                                                   rng.choice([0.05, 0.2, 0.5]), 100)))
+        warnings.append(("warning " + str(i), rings))
+    return warnings
+
+
+def _get_postal_codes_old(store: PostalCodeStore, rings: list[numpy.ndarray]) -> list[str]:
+    all_postal_codes = []
+    for ring in rings:
+        polygon = shapely.Polygon(ring)
+        for record in store.records():
+            place_rings = record.rings
+            place_poly = shapely.Polygon(place_rings[0], place_rings[1:])
+            if polygon.intersects(place_poly):
+                intersections = polygon.intersection(place_poly)
+                if not isinstance(intersections, shapely.geometry.multilinestring.MultiLineString):
+                    if record.postal_code not in all_postal_codes:
+                        all_postal_codes.append(record.postal_code)
+    return all_postal_codes
+
+
+def _map_on_pool(executor: ProcessPoolExecutor, warnings: list) -> dict:
+    futures = [executor.submit(postal_code_mapper._get_postal_codes_in_rings, warning_id, rings)
+               for warning_id, rings in warnings]
+    return dict(future.result() for future in futures)
+
+
+def main():
+    path = sys.argv[1] if len(sys.argv) > 1 and sys.argv[1] != "-" else None
+    maximum_processes = int(sys.argv[2]) if len(sys.argv) > 2 else (os.cpu_count() or 1)
+    store = PostalCodeStore(_load_records(path))
+    warnings = _get_warnings()
+    data_set = path if path is not None else "synthetic"
+    print("data set: " + data_set + " (" + str(len(store)) + " postal codes, " + str(len(warnings)) + " warnings), "
+          + str(os.cpu_count()) + " CPU cores")
+
+    start = time.perf_counter()
+    old_results = {warning_id: _get_postal_codes_old(store, rings)
+                   for warning_id, rings in warnings[:_NUMBER_OF_OLD_WARNINGS]}
+    old_duration = (time.perf_counter() - start) * len(warnings) / _NUMBER_OF_OLD_WARNINGS
+    print("old (1 thread, extrapolated): " + str(round(old_duration, 2)) + " s")
+
+    process_counts = sorted({1, maximum_processes} | {2 ** i for i in range(1, 10) if 2 ** i < maximum_processes})
+    single_process_duration = None
+    for process_count in process_counts:
+        with ProcessPoolExecutor(max_workers=process_count,
+                                 mp_context=postal_code_mapper._MULTIPROCESSING_CONTEXT,
+                                 initializer=postal_code_mapper._init_worker, initargs=(store,)) as executor:
+            start = time.perf_counter()
+            results = _map_on_pool(executor, warnings)  # includes building the index in every process
+            cold_duration = time.perf_counter() - start
+            start = time.perf_counter()
+            _map_on_pool(executor, warnings)
+            warm_duration = time.perf_counter() - start
+        for warning_id, postal_codes in old_results.items():
+            if results[warning_id] != postal_codes:
+                raise AssertionError("different postal codes for " + warning_id)
+        if single_process_duration is None:
+            single_process_duration = warm_duration
+        print(str(process_count) + " processes: " + str(round(cold_duration, 2)) + " s with start, "
+              + str(round(warm_duration, 2)) + " s warm, scaling "
+              + str(round(single_process_duration / warm_duration, 2)) + "x, "
+              + str(round(old_duration / warm_duration, 1)) + "x faster than old")
+
+
+if __name__ == '__main__':
+    main()
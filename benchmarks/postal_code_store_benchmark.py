@@ -0,0 +1,119 @@
+"""
+Compares the memory (RSS and retained bytes) of the postal code reference data as nested Python lists (old
+_postal_code_dictionary and _postal_place_dictionary) with the PostalCodeStore.
+RSS and retained bytes are measured in separate processes, because tracemalloc itself needs a lot of memory. Every
+process parses the records from a json file, the memory of the parsed json counts only if it stays alive.
+
+Usage: python postal_code_store_benchmark.py [path to a saved georef-germany-postleitzahl json]
+Without a path a synthetic data set with the size of the real one (8200 postal codes) is generated.
+"""
+
+import ctypes
+import gc
+import json
+import math
+import os
+import random
+import subprocess
+import sys
+import tempfile
+import tracemalloc
+
+sys.path.insert(0, os.path.join(os.path.dirname(os.path.abspath(__file__)), "..", "source"))
+
+_NUMBER_OF_POSTAL_CODES = 8200
+_COORDINATES_PER_POLYGON = 400
+
+
+def _get_rss_in_bytes() -> int:
+    with open("/proc/self/statm") as statm:
+        return int(statm.read().split()[1]) * os.sysconf("SC_PAGE_SIZE")
+
+
+def _load_records(path: str) -> list[tuple]:
+    if path is not None:
+        with open(path) as file_object:
+            postal_code_table = json.load(file_object)
+        return [(record['fields']['plz_code'], record['fields']['plz_name'], record['fields']['krs_code'],
+                 record['fields']['geometry']['coordinates'][0]) for record in postal_code_table['records']]
+
+    rng = random.Random(42)
+    records = []
+    for i in range(_NUMBER_OF_POSTAL_CODES):
+        center_x = rng.uniform(6.0, 15.0)
+        center_y = rng.uniform(47.5, 55.0)
+        ring = []
+        for j in range(_COORDINATES_PER_POLYGON):
+            angle = 2 * math.pi * j / _COORDINATES_PER_POLYGON
+            radius = rng.uniform(0.01, 0.05)
+            ring.append([center_x + radius * math.cos(angle), center_y + radius * math.sin(angle)])
+        ring.append(ring[0])
+        records.append((str(10000 + i), "Ort " + str(i % 5000), "%05d" % (1000 + i % 400), ring))
+    return records
+
+
+def _release_free_memory():
+    gc.collect()
+    try:
+        ctypes.CDLL("libc.so.6").malloc_trim(0)
+    except (OSError, AttributeError):
+        pass
+
+
+def _measure(variant: str, measurement: str, records_path: str):
+    _release_free_memory()
+    before = _get_rss_in_bytes()
+    if measurement == "retained":
+        tracemalloc.start()
+
+    with open(records_path) as file_object:
+        records = json.load(file_object)  # fresh objects, as if they came from the http response
+    if variant == "lists":
+        postal_code_dictionary = {}
+        postal_place_dictionary = {}
+        for postal_code, place_name, district_id, polygon_area in records:
+            postal_code_dictionary[postal_code] = [place_name, district_id, polygon_area]
+        for postal_code in postal_code_dictionary:
+            postal_place_dictionary[postal_code] = postal_code_dictionary[postal_code][0]
+        data = (postal_code_dictionary, postal_place_dictionary)
+    else:
+        from postal_code_store import PostalCodeStore
+        data = PostalCodeStore(records)
+    del records
+
+    _release_free_memory()
+    if measurement == "retained":
+        print(tracemalloc.get_traced_memory()[0])
+    else:
+        print(_get_rss_in_bytes() - before)
+    return data
+
+
+def main():
+    path = sys.argv[1] if len(sys.argv) > 1 else None
+    with tempfile.NamedTemporaryFile("w", suffix=".json") as records_file:
+        json.dump(_load_records(path), records_file)
+        records_file.flush()
+        results = {}
+        for variant in ["lists", "store"]:
+            results[variant] = []
+            for measurement in ["rss", "retained"]:
+                command = [sys.executable, __file__, "--measure", variant, measurement, records_file.name]
+                output = subprocess.run(command, capture_output=True, text=True, check=True).stdout
+                results[variant].append(int(output.strip().splitlines()[-1]))
+
+    data_set = path if path is not None else "synthetic (" + str(_NUMBER_OF_POSTAL_CODES) + " postal codes, " \
+                                             + str(_COORDINATES_PER_POLYGON) + " coordinates each)"
+    print("data set: " + data_set)
+    for variant, (rss, retained) in results.items():
+        print(variant + ": " + str(round(rss / 1024 / 1024, 1)) + " MiB RSS, "
+              + str(round(retained / 1024 / 1024, 1)) + " MiB retained")
+    print("reduction: " + str(round(100 * (1 - results["store"][0] / results["lists"][0]), 1)) + " % RSS, "
+          + str(round(100 * (1 - results["store"][1] / results["lists"][1]), 1)) + " % retained")
+
+
+if __name__ == '__main__':
+    if len(sys.argv) > 4 and sys.argv[1] == "--measure":
+        _measure(sys.argv[2], sys.argv[3], sys.argv[4])
+    else:
+        main()
@@ -1,23 +1,32 @@
 import threading
 
+import nina_service
+import place_converter
 import receiver
 import subscriptions
+import warning_feed
 
 
 # Call this script to start the bot
 
 def start_bot():
     """
-    Starts the chat receiver and the subscription handling mechanism in two different threads
+    Starts the chat receiver and the subscription handling mechanism in two different threads, the warning feed, the
+    reference data refresher and the covid prefetcher
 
     """
+    warning_feed.init_warning_feed()
 
     subscriptions_thread = threading.Thread(target=subscriptions.start_subscriptions)
     receiver_thread = threading.Thread(target=receiver.start_receiver)
 
     subscriptions_thread.start()
     receiver_thread.start()
+    place_converter.init_reference_data_refresher()
+    nina_service.init_covid_prefetcher()
     print("\n\033[92m" + "Bot started successfully!" + "\033[0m\n")
 
 
-start_bot()
+# the worker processes of postal_code_mapper are spawned and import this script again, they must not start the bot
+if __name__ == '__main__':
+    start_bot()
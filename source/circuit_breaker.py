@@ -0,0 +1,91 @@
+import threading
+import time
+from collections import deque
+
+from enum_types import CircuitBreakerState
+
+# A circuit breaker stops sending requests to an endpoint that keeps failing, so a broken upstream does not add its
+# timeouts to every request. After the cool-down one trial request decides whether the endpoint works again.
+
+
+class CircuitBreaker:
+    def __init__(self, name: str, window_size: int, minimum_requests: int, failure_rate_threshold: float,
+                 cool_down_in_seconds: float):
+        """
+        Args:
+            name: name of the endpoint, used for the log
+            window_size: number of the last requests the failure rate is computed of
+            minimum_requests: the circuit breaker only opens if the window contains at least this many requests
+            failure_rate_threshold: the circuit breaker opens if at least this share of the window failed
+            cool_down_in_seconds: time the circuit breaker stays open before a trial request is sent
+        """
+        self.name = name
+        self._minimum_requests = minimum_requests
+        self._failure_rate_threshold = failure_rate_threshold
+        self._cool_down_in_seconds = cool_down_in_seconds
+        self._results = deque(maxlen=window_size)
+        """True for every failed request"""
+        self._state = CircuitBreakerState.CLOSED
+        self._opened_at = 0.0
+        self._trial_running = False
+        self._state_changes = 0
+        self._rejected_requests = 0
+        self._lock = threading.Lock()
+
+    def _set_state(self, state: CircuitBreakerState):
+        print("Circuit breaker " + self.name + ": " + self._state.value + " -> " + state.value)
+        self._state = state
+        self._state_changes += 1
+        if state == CircuitBreakerState.OPEN:
+            self._opened_at = time.monotonic()
+        elif state == CircuitBreakerState.CLOSED:
+            self._results.clear()
+
+    def allow_request(self) -> bool:
+        """
+        Returns:
+            True if the request may be sent. Every allowed request must be followed by record_success or record_failure
+        """
+        with self._lock:
+            if self._state == CircuitBreakerState.OPEN \
+                    and time.monotonic() - self._opened_at >= self._cool_down_in_seconds:
+                self._set_state(CircuitBreakerState.HALF_OPEN)
+            if self._state == CircuitBreakerState.CLOSED:
+                return True
+            if self._state == CircuitBreakerState.HALF_OPEN and not self._trial_running:
+                self._trial_running = True
+                return True
+            self._rejected_requests += 1
+            return False
+
+    def record_success(self):
+        with self._lock:
+            self._results.append(False)
+            if self._state == CircuitBreakerState.HALF_OPEN:
+                self._trial_running = False
+                self._set_state(CircuitBreakerState.CLOSED)
+
+    def record_failure(self):
+        with self._lock:
+            self._results.append(True)
+            if self._state == CircuitBreakerState.HALF_OPEN:
+                self._trial_running = False
+                self._set_state(CircuitBreakerState.OPEN)
+            elif self._state == CircuitBreakerState.CLOSED and len(self._results) >= self._minimum_requests \
+                    and sum(self._results) / len(self._results) >= self._failure_rate_threshold:
+                self._set_state(CircuitBreakerState.OPEN)
+
+    @property
+    def state(self) -> CircuitBreakerState:
+        with self._lock:
+            return self._state
+
+    def get_statistics(self) -> dict:
+        """
+        Returns:
+            {'state', 'failure_rate', 'state_changes', 'rejected_requests'}, the failure rate of the current window
+        """
+        with self._lock:
+            failure_rate = sum(self._results) / len(self._results) if len(self._results) > 0 else 0.0
+            return {'state': self._state.value, 'failure_rate': failure_rate, 'state_changes': self._state_changes,
+                    'rejected_requests': self._rejected_requests}
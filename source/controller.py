@@ -1,6 +1,6 @@
 import datetime
 
-from requests import HTTPError
+from requests import HTTPError, RequestException
 
 import sender
 import text_templates
@@ -9,6 +9,7 @@ import data_service
 import place_converter
 import frontend_helper
 import warning_handler
+import warning_feed
 
 from text_templates import Button, Answers
 from enum_types import Commands, ReceiveInformation, WarningSeverity, ErrorCodes, WarningCategory, BotUsageHelp, \
@@ -308,6 +309,8 @@ def button_in_subscriptions_pressed(chat_id: int, button_text: str):
         command = Commands.SET_DEFAULT_LEVEL.value + ";"
 
         buttons = []
+        # MINOR gets all warnings and SEVERE the severe and extreme ones (enum_types.get_integer_from_warning_severity),
+        # MODERATE and EXTREME are no choices of their own
         default_levels = list(WarningSeverity)
         default_levels.remove(WarningSeverity.EXTREME)
         default_levels.remove(WarningSeverity.MODERATE)
@@ -435,6 +438,7 @@ def inline_button_for_adding_subscriptions(chat_id: int, callback_command: str):
         markup = InlineKeyboardMarkup()
 
         buttons = []
+        # all warnings or only the severe and extreme ones, see the default levels above
         for button_level in [Button.MINOR, Button.SEVERE]:
             button_name = text_templates.get_button_name(button_level)
             button = sender.create_inline_button(button_name, callback_command + ";" + str(button_level.value))
@@ -491,6 +495,30 @@ def inline_button_for_deleting_subscriptions(chat_id: int, callback_command: str
     sender.send_message(chat_id, text_templates.get_delete_subscription_message(location_name, warning_name))
 
 
+def location_inline_query(inline_query_id: str, text: str):
+    """
+    This method will be called when the user types "@<bot name> <text>" in a chat. It suggests locations while the user
+    is typing, an incomplete postal code like "642" gives all postal codes starting with it. Selecting a suggestion
+    sends its postal code to the chat, which then is handled like a typed postal code.
+
+    Args:
+        inline_query_id: a string for the id of the inline query
+        text: a string which contains the text the user typed so far
+    """
+    if text.strip() == "":
+        sender.answer_inline_query(inline_query_id, [])
+        return
+    suggestion_dicts = place_converter.get_non_covid_dict_suggestions(text, 20)
+    results = []
+    for dic in suggestion_dicts:
+        postal_code = place_converter.get_postal_code_from_dict(dic)
+        place_name = place_converter.get_place_name_from_dict(dic)
+        district_name = place_converter.get_district_name_from_dict(dic)
+        results.append(sender.create_inline_query_result(postal_code, postal_code + " " + place_name, district_name,
+                                                         postal_code))
+    sender.answer_inline_query(inline_query_id, results)
+
+
 def location_for_favorites(chat_id: int, text: str):
     """
     This method will be called when the user is in the state for adding a location to favorites and then sends a message
@@ -554,7 +582,7 @@ def location_for_warning(chat_id: int, text: str, command: Commands):
     if text.lower() == "testhausen":
         if warning_category is not WarningCategory.NONE:
             try:
-                general_warnings = nina_service.call_general_warning(warning_category)
+                general_warnings = warning_feed.get_warnings(warning_category)
                 text = warning_handler.get_random_postal_code_for_active_warning(general_warnings[0])
             except IndexError:
                 text = "64285"
@@ -660,11 +688,21 @@ def detailed_general_warning(chat_id: int, warning: WarningCategory, postal_code
     sender.send_chat_action(chat_id, "typing")
     keyboard = frontend_helper.get_warning_keyboard_buttons()
     data_service.set_user_state(chat_id, 2)
+    relevant_postal_codes = None
     try:
-        warnings = nina_service.call_general_warning(warning)
-    except HTTPError:
-        error_handler(chat_id, ErrorCodes.NINA_API)
-        return
+        warnings = [general_warning for general_warning, category in nina_service.get_regional_warnings(district_id)
+                    if category == warning]
+        # the dashboard has the warnings of the whole district, only those for the area of the postal code are sent
+        warnings = warning_handler.get_regional_warnings_for_postal_code(warnings, postal_code)
+    except RequestException as e:
+        # the warnings of the whole category, filtered by the postal codes of the warning handler
+        print("ERROR: regional warnings of " + district_id + " failed, using all warnings: " + repr(e))
+        relevant_postal_codes = [postal_code]
+        try:
+            warnings = warning_feed.get_warnings(warning)
+        except HTTPError:
+            error_handler(chat_id, ErrorCodes.NINA_API)
+            return
     if len(warnings) == 0:
         sender.send_message(chat_id, text_templates.get_no_current_warnings_message(_get_general_warning_name(warning)),
                             keyboard)
@@ -673,7 +711,7 @@ def detailed_general_warning(chat_id: int, warning: WarningCategory, postal_code
         ask_if_add_to_subscriptions(chat_id, warning, postal_code, district_id)
         return
 
-    num_sent = send_detailed_general_warnings(chat_id, warnings, [postal_code])
+    num_sent = send_detailed_general_warnings(chat_id, warnings, relevant_postal_codes)
     if num_sent == 0:
         sender.send_message(chat_id, text_templates.get_no_current_warnings_message(_get_general_warning_name(warning)),
                             keyboard)
@@ -722,7 +760,8 @@ def send_detailed_general_warnings(chat_id: int, general_warnings: list[nina_ser
         general_warnings: list of GeneralWarning enum for all general_warnings which could be relevant for sending
         relevant_postal_codes: list of postal code strings.
                             If the general warning has a postal code that is in this list
-                            the detailed warning will be sent to the user with the chat_id
+                            the detailed warning will be sent to the user with the chat_id.
+                            None if all general_warnings are relevant (for example the warnings of a region)
         detail_for_testing: DetailedWarning which is only used when the user asks for the test location
 
 
@@ -732,28 +771,32 @@ def send_detailed_general_warnings(chat_id: int, general_warnings: list[nina_ser
     # just for the test location
     if detail_for_testing is not None:
         relevant_warning_ids = [general_warnings[0].id]
+    elif relevant_postal_codes is None:
+        relevant_warning_ids = [general_warning.id for general_warning in general_warnings]
     else:
         relevant_warning_ids = warning_handler.get_all_relevant_warning_ids(general_warnings, relevant_postal_codes)
 
     for warning_id in relevant_warning_ids:
         try:
             # just for the test location
+            warning_type = ""
+            start_date = ""
+            version = None
+            for warning in general_warnings:
+                if warning.id == warning_id:
+                    warning_type = warning.type.value
+                    start_date = warning.start_date
+                    version = warning.version
+                    break
             if detail_for_testing is not None:
                 detail = detail_for_testing
             else:
-                detail = nina_service.get_detailed_warning(warning_id)
+                detail = nina_service.get_detailed_warning(warning_id, version=version)
             event = detail.info.event
             headline = detail.info.headline
             description = detail.info.description
             severity_value = detail.info.severity
             severity = text_templates.get_button_name(Button[severity_value.name])
-            warning_type = ""
-            start_date = ""
-            for warning in general_warnings:
-                if warning.id == warning_id:
-                    warning_type = warning.type.value
-                    start_date = warning.start_date
-                    break
             date_expires = detail.info.date_expires
             status = detail.status
             link = detail.government_warning_url
@@ -1,3 +1,4 @@
+import functools
 import json
 import os
 import threading
@@ -476,6 +477,20 @@ def get_all_chat_ids() -> list[int]:
     return chat_ids
 
 
+def get_all_district_ids() -> list[str]:
+    """
+    Returns:
+        list of the district ids of all favorites and subscriptions of all users, every district id once
+    """
+    district_ids = {}  # dict instead of set to keep the order
+    for user in _read_file(_USER_DATA_PATH).values():
+        for favorite in user[Attributes.FAVORITES.value]:
+            district_ids[get_favorite_district_id(favorite)] = None
+        for subscription in user[Attributes.LOCATIONS.value].values():
+            district_ids[get_subscription_district_id(subscription)] = None
+    return list(district_ids)
+
+
 def get_chat_ids_of_warned_users() -> list[int]:
     """
     Returns:
@@ -484,22 +499,46 @@ def get_chat_ids_of_warned_users() -> list[int]:
     return list(filter(lambda chat_id: get_receive_warnings(chat_id), get_all_chat_ids()))
 
 
+WARNINGS_ALREADY_RECEIVED_LOCK = threading.Lock()
+
+
 def add_warning_id_to_users_warnings_received_list(chat_id: int, general_warning_id: str):
     """
     Args:
         chat_id: of the user
         general_warning_id: of the warning that should be added to users warnings_already_received list
     """
-    user_data = _read_file(_WARNINGS_ALREADY_RECEIVED_PATH)
-    chat_id_string = str(chat_id)
+    with WARNINGS_ALREADY_RECEIVED_LOCK:
+        user_data = _read_file(_WARNINGS_ALREADY_RECEIVED_PATH)
+        chat_id_string = str(chat_id)
 
-    if chat_id_string not in user_data:
-        user_data[chat_id_string] = []
+        if chat_id_string not in user_data:
+            user_data[chat_id_string] = []
 
-    list_of_received_warnings = user_data[chat_id_string]
-    list_of_received_warnings.append(general_warning_id)
+        list_of_received_warnings = user_data[chat_id_string]
+        list_of_received_warnings.append(general_warning_id)
+
+        _write_file(_WARNINGS_ALREADY_RECEIVED_PATH, user_data)
 
-    _write_file(_WARNINGS_ALREADY_RECEIVED_PATH, user_data)
+
+def remove_warning_id_from_all_warnings_received_lists(general_warning_id: str):
+    """
+    Removes the warning from the warnings_already_received list of every user, for example when it expired
+
+    Args:
+        general_warning_id: of the warning that should be removed
+    """
+    with WARNINGS_ALREADY_RECEIVED_LOCK:
+        user_data = _read_file(_WARNINGS_ALREADY_RECEIVED_PATH)
+        changed = False
+        for chat_id_string, list_of_received_warnings in user_data.items():
+            if general_warning_id in list_of_received_warnings:
+                user_data[chat_id_string] = [warning_id for warning_id in list_of_received_warnings
+                                             if warning_id != general_warning_id]
+                changed = True
+
+        if changed:
+            _write_file(_WARNINGS_ALREADY_RECEIVED_PATH, user_data)
 
 
 def get_users_already_received_warning_ids(chat_id: int) -> list[str]:
@@ -643,6 +682,25 @@ def remove_from_active_warnings_dict(key_to_remove: int):
         _set_active_warnings_dict(active_warnings)
 
 
+def remove_from_active_warnings_dict_if_present(key_to_remove: int) -> bool:
+    """
+    Removes entry with given key of file in active_warnings_path, if there is one.
+
+    Args:
+        key_to_remove: key of entry that will be deleted
+
+    Returns:
+        True if the entry was removed
+    """
+    with ACTIVE_WARNINGS_LOCK:
+        active_warnings = _read_file(_ACTIVE_WARNINGS_PATH)
+        if key_to_remove not in active_warnings:
+            return False
+        del active_warnings[key_to_remove]
+        _set_active_warnings_dict(active_warnings)
+        return True
+
+
 def get_user_subscription_postal_codes(chat_id: int) -> list[str]:
     """
     Returns a list of all postal codes the user is subscribed to
@@ -668,3 +726,15 @@ def get_config() -> dict:
         Dict containing all config values
     """
     return _read_file(_CONFIG_PATH)
+
+
+@functools.lru_cache(maxsize=1)
+def get_cached_config() -> dict:
+    """
+    Like get_config, but config.json is only read on the first call. For the code that runs with every request or
+    every tick (nina_client, nina_service, warning_feed), changes of these settings need a restart of the bot
+
+    Returns:
+        Dict containing all config values, must not be changed
+    """
+    return get_config()
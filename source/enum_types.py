@@ -109,6 +109,20 @@ class WarningType(Enum):
     UNKNOWN = "Unknown"
 
 
+# circuit_breaker ------------------------------------------------------------------------------------------------------
+
+
+class CircuitBreakerState(Enum):
+    """
+    CLOSED: requests are sent\n
+    OPEN: requests are not sent until the cool-down is over\n
+    HALF_OPEN: one trial request is sent, it decides whether the circuit breaker closes or opens again
+    """
+    CLOSED = "closed"
+    OPEN = "open"
+    HALF_OPEN = "half_open"
+
+
 # text_templates -------------------------------------------------------------------------------------------------------
 
 
@@ -225,18 +239,24 @@ class BotUsageHelp(Enum):
 
 def get_integer_from_warning_severity(severity: WarningSeverity) -> int:
     """
-    Returns int of given WarningSeverity.
+    Returns int of given WarningSeverity, the more severe the higher.
 
     Args:
-        severity: WarningSeverity of which a corresponding int is wanted
+        severity: WarningSeverity or its value of which a corresponding int is wanted
 
     Returns:
-        int of given WarningSeverity.
+        int of given WarningSeverity, 0 for WarningSeverity.MANUAL and unknown severities.
     """
+    if isinstance(severity, WarningSeverity):
+        severity = severity.value
     severity = str(severity).lower()
     if severity == str(WarningSeverity.MINOR.value).lower():
         return 1
-    elif severity == str(WarningSeverity.SEVERE.value).lower():
+    elif severity == str(WarningSeverity.MODERATE.value).lower():
         return 2
+    elif severity == str(WarningSeverity.SEVERE.value).lower():
+        return 3
+    elif severity == str(WarningSeverity.EXTREME.value).lower():
+        return 4
     else:
         return 0
\ No newline at end of file
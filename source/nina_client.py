@@ -0,0 +1,222 @@
+import random
+import threading
+import time
+from collections import deque
+
+import requests
+from requests.adapters import HTTPAdapter
+
+import data_service
+import nina_recording
+from circuit_breaker import CircuitBreaker
+
+# All requests to the NINA API go through one requests.Session, so the TLS connections to warnung.bund.de are kept
+# alive and reused by all threads (subscriptions, warning handler, receiver) instead of opening a new one per call.
+# Every endpoint has its own circuit breaker, so an endpoint that keeps failing is not requested until its cool-down is
+# over.
+
+_RETRY_STATUS_CODES = {429, 500, 502, 503, 504}
+_LATENCY_SAMPLES_PER_ENDPOINT = 1000
+
+_session = None
+_session_lock = threading.Lock()
+
+_latency_statistics = {}
+"""dictionary endpoint : str -> {'requests', 'errors', 'retries', 'latencies' : deque[float]}"""
+_latency_statistics_lock = threading.Lock()
+
+_circuit_breakers = {}
+"""dictionary endpoint : str -> CircuitBreaker"""
+_circuit_breakers_lock = threading.Lock()
+
+
+class CircuitOpenError(requests.exceptions.RequestException):
+    """
+    Raised instead of sending a request while the circuit breaker of the endpoint is open
+    """
+
+    def __init__(self, endpoint: str):
+        super().__init__("circuit breaker of " + endpoint + " is open")
+        self.endpoint = endpoint
+
+
+def _get_session() -> requests.Session:
+    """
+    Returns:
+        the shared session, created on the first call with the pool size from config.json. If
+        nina_http_replay_directory is set, the session answers from the fixtures there instead of the network, if
+        nina_http_record_directory is set, it writes every response there (see nina_recording)
+    """
+    global _session
+    with _session_lock:
+        if _session is None:
+            config = data_service.get_cached_config()
+            pool_size = config['nina_http_pool_size']
+            session = requests.Session()
+            if config['nina_http_replay_directory']:
+                adapter = nina_recording.ReplayAdapter(config['nina_http_replay_directory'])
+            elif config['nina_http_record_directory']:
+                adapter = nina_recording.RecordingAdapter(config['nina_http_record_directory'],
+                                                          pool_connections=pool_size, pool_maxsize=pool_size)
+            else:
+                adapter = HTTPAdapter(pool_connections=pool_size, pool_maxsize=pool_size)
+            session.mount("https://", adapter)
+            session.mount("http://", adapter)
+            _session = session
+        return _session
+
+
+def is_recording_or_replaying() -> bool:
+    """
+    Returns:
+        True if the requests are recorded or replayed, then only the shared session may be used for the NINA API
+    """
+    config = data_service.get_cached_config()
+    return bool(config['nina_http_replay_directory'] or config['nina_http_record_directory'])
+
+
+def _get_backoff_time(backoff_in_seconds: float, attempt: int) -> float:
+    """
+    Exponential backoff with full jitter, so retrying threads do not hit the API at the same time
+
+    Args:
+        backoff_in_seconds: base backoff time
+        attempt: number of the failed attempt, starting with 0
+
+    Returns:
+        seconds to wait before the next attempt
+    """
+    return random.uniform(0, backoff_in_seconds * (2 ** attempt))
+
+
+def _record_latency(endpoint: str, latency_in_seconds: float, failed: bool, retried: bool):
+    with _latency_statistics_lock:
+        statistics = _latency_statistics.setdefault(endpoint, {'requests': 0, 'errors': 0, 'retries': 0,
+                                                               'latencies': deque(
+                                                                   maxlen=_LATENCY_SAMPLES_PER_ENDPOINT)})
+        statistics['requests'] += 1
+        statistics['latencies'].append(latency_in_seconds)
+        if failed:
+            statistics['errors'] += 1
+        if retried:
+            statistics['retries'] += 1
+
+
+def _request_with_retries(session: requests.Session, url: str, endpoint: str, timeout: tuple[float, float],
+                          max_retries: int, backoff_in_seconds: float, headers: dict = None,
+                          stream: bool = False) -> requests.Response:
+    """
+    Sends a GET request and retries it on connection errors, timeouts and the status codes in _RETRY_STATUS_CODES
+
+    Raises:
+        requests.exceptions.RequestException: if the last attempt failed without a response
+    """
+    attempt = 0
+    while True:
+        start = time.perf_counter()
+        try:
+            response = session.get(url, headers=headers, timeout=timeout, stream=stream)
+        except (requests.exceptions.ConnectionError, requests.exceptions.Timeout):
+            _record_latency(endpoint, time.perf_counter() - start, True, attempt < max_retries)
+            if attempt >= max_retries:
+                raise
+        else:
+            retry = response.status_code in _RETRY_STATUS_CODES and attempt < max_retries
+            _record_latency(endpoint, time.perf_counter() - start, response.status_code >= 400, retry)
+            if not retry:
+                return response
+            response.close()
+        time.sleep(_get_backoff_time(backoff_in_seconds, attempt))
+        attempt += 1
+
+
+def get_circuit_breaker(endpoint: str) -> CircuitBreaker:
+    """
+    Args:
+        endpoint: name of the endpoint, for example "dwd/mapData" or "warnings"
+
+    Returns:
+        the circuit breaker of the endpoint, created on the first call with the thresholds from config.json
+    """
+    with _circuit_breakers_lock:
+        if endpoint not in _circuit_breakers:
+            config = data_service.get_cached_config()
+            _circuit_breakers[endpoint] = CircuitBreaker(endpoint, config['nina_circuit_breaker_window_size'],
+                                                         config['nina_circuit_breaker_minimum_requests'],
+                                                         config['nina_circuit_breaker_failure_rate'],
+                                                         config['nina_circuit_breaker_cool_down_in_seconds'])
+        return _circuit_breakers[endpoint]
+
+
+def get_circuit_breaker_statistics() -> dict:
+    """
+    Returns:
+        dictionary endpoint : str -> {'state', 'failure_rate', 'state_changes', 'rejected_requests'}
+    """
+    with _circuit_breakers_lock:
+        circuit_breakers = dict(_circuit_breakers)
+    return {endpoint: circuit_breaker.get_statistics() for endpoint, circuit_breaker in circuit_breakers.items()}
+
+
+def get(url: str, endpoint: str, headers: dict = None, stream: bool = False) -> requests.Response:
+    """
+    Sends a GET request to the NINA API over the shared session with the timeouts and retries from config.json.
+    A response with one of the status codes in _RETRY_STATUS_CODES or no response after all retries counts as a
+    failure for the circuit breaker of the endpoint
+
+    Args:
+        url: the complete url
+        endpoint: name of the endpoint the latency is recorded for, for example "dwd/mapData" or "warnings"
+        headers: optional additional request headers
+        stream: if True, only the headers are read, the body is read from response.raw and the response must be closed
+
+    Returns:
+        the response, also if its status code is an error after all retries
+
+    Raises:
+        CircuitOpenError: if the circuit breaker of the endpoint is open
+        requests.exceptions.RequestException: if there was no response after all retries
+    """
+    circuit_breaker = get_circuit_breaker(endpoint)
+    if not circuit_breaker.allow_request():
+        raise CircuitOpenError(endpoint)
+
+    # every allowed request has to be recorded, otherwise a trial request of a half-open circuit breaker that raises
+    # anything else than a RequestException (or is interrupted) would keep it half-open forever
+    failed = True
+    try:
+        config = data_service.get_cached_config()
+        timeout = (config['nina_http_connect_timeout_in_seconds'], config['nina_http_read_timeout_in_seconds'])
+        response = _request_with_retries(_get_session(), url, endpoint, timeout, config['nina_http_max_retries'],
+                                         config['nina_http_backoff_in_seconds'], headers, stream)
+        failed = response.status_code in _RETRY_STATUS_CODES
+    finally:
+        if failed:
+            circuit_breaker.record_failure()
+        else:
+            circuit_breaker.record_success()
+    return response
+
+
+def _get_percentile(sorted_values: list[float], percentile: float) -> float:
+    index = min(len(sorted_values) - 1, int(round(percentile * (len(sorted_values) - 1))))
+    return sorted_values[index]
+
+
+def get_latency_statistics() -> dict:
+    """
+    Returns:
+        dictionary endpoint : str -> {'requests', 'errors', 'retries', 'mean_ms', 'p50_ms', 'p95_ms', 'max_ms'},
+        the latencies are computed from the last 1000 attempts of each endpoint
+    """
+    result = {}
+    with _latency_statistics_lock:
+        for endpoint, statistics in _latency_statistics.items():
+            latencies = sorted(statistics['latencies'])
+            result[endpoint] = {'requests': statistics['requests'], 'errors': statistics['errors'],
+                                'retries': statistics['retries'],
+                                'mean_ms': 1000 * sum(latencies) / len(latencies),
+                                'p50_ms': 1000 * _get_percentile(latencies, 0.5),
+                                'p95_ms': 1000 * _get_percentile(latencies, 0.95),
+                                'max_ms': 1000 * latencies[-1]}
+    return result
@@ -0,0 +1,127 @@
+import hashlib
+import io
+import os
+import tempfile
+import urllib.parse
+
+import requests
+from requests.adapters import BaseAdapter, HTTPAdapter
+from requests.structures import CaseInsensitiveDict
+
+# Record and replay of the NINA API for load tests and benchmarks without warnung.bund.de.
+# While recording, every successful response of nina_client is written to a fixture directory, the file path is the
+# path of the url (https://warnung.bund.de/api31/dwd/mapData.json -> <directory>/api31/dwd/mapData.json). While
+# replaying, nina_client answers every request from these files without any network access. The same directory can be
+# served by nina_stand_in_server.py, then the bot runs against it by setting nina_api_url in config.json.
+
+
+def get_fixture_path(directory: str, url: str) -> str or None:
+    """
+    Args:
+        directory: the fixture directory
+        url: the complete url or only its path
+
+    Returns:
+        the path of the fixture file of the url, None if the url points outside the directory
+    """
+    directory = os.path.abspath(directory)
+    relative_path = urllib.parse.unquote(urllib.parse.urlsplit(url).path).lstrip("/")
+    path = os.path.normpath(os.path.join(directory, relative_path))
+    if not path.startswith(directory + os.sep):
+        return None
+    return path
+
+
+def get_etag(body: bytes) -> str:
+    """
+    Returns:
+        an ETag of the body, the same for the replay and the stand-in server
+    """
+    return '"' + hashlib.sha1(body).hexdigest() + '"'
+
+
+def get_content_type(path: str) -> str:
+    if path.endswith(".geojson"):
+        return "application/geo+json"
+    return "application/json"
+
+
+def _write_fixture(path: str, body: bytes):
+    """
+    Writes the body into a temporary file first and replaces the fixture with it, so a replay never reads a half
+    written fixture
+    """
+    os.makedirs(os.path.dirname(path), exist_ok=True)
+    file_descriptor, temporary_path = tempfile.mkstemp(dir=os.path.dirname(path))
+    with os.fdopen(file_descriptor, "wb") as file_object:
+        file_object.write(body)
+    os.replace(temporary_path, path)
+
+
+class RecordingAdapter(HTTPAdapter):
+    """
+    Sends the requests like HTTPAdapter and writes the body of every response with status code 200 into the fixture
+    directory
+    """
+
+    def __init__(self, directory: str, **kwargs):
+        """
+        Args:
+            directory: the fixture directory, created if it does not exist
+            kwargs: passed on to HTTPAdapter, for example pool_connections and pool_maxsize
+        """
+        super().__init__(**kwargs)
+        self._directory = directory
+
+    def send(self, request: requests.PreparedRequest, **kwargs) -> requests.Response:
+        response = super().send(request, **kwargs)
+        path = get_fixture_path(self._directory, request.url)
+        if response.status_code == 200 and path is not None:
+            body = response.content  # also reads a streamed body
+            response.raw = io.BytesIO(body)  # so a streaming parser still gets the whole body
+            _write_fixture(path, body)
+        return response
+
+
+class ReplayAdapter(BaseAdapter):
+    """
+    Answers every request from the fixture directory: 200 with the fixture, 304 if If-None-Match is the ETag of the
+    fixture and 404 if there is no fixture for the url
+    """
+
+    def __init__(self, directory: str):
+        """
+        Args:
+            directory: the fixture directory
+        """
+        super().__init__()
+        self._directory = directory
+
+    def send(self, request: requests.PreparedRequest, stream: bool = False, timeout=None, verify=True, cert=None,
+             proxies=None) -> requests.Response:
+        path = get_fixture_path(self._directory, request.url)
+        body = b""
+        status_code = 404
+        headers = CaseInsensitiveDict()
+        if path is not None and os.path.isfile(path):
+            with open(path, "rb") as file_object:
+                body = file_object.read()
+            headers["Content-Type"] = get_content_type(path)
+            headers["ETag"] = get_etag(body)
+            status_code = 200
+            if request.headers.get("If-None-Match") == headers["ETag"]:
+                body = b""
+                status_code = 304
+
+        response = requests.Response()
+        response.status_code = status_code
+        response.reason = {200: "OK", 304: "Not Modified", 404: "Not Found"}[status_code]
+        response.headers = headers
+        response.encoding = "utf-8"
+        response.raw = io.BytesIO(body)
+        response.url = request.url
+        response.request = request
+        return response
+
+    def close(self):
+        pass
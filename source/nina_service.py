@@ -1,15 +1,54 @@
+import hashlib
+import sys
+import threading
+import time
+from collections import OrderedDict
+from concurrent.futures import ThreadPoolExecutor
 from dataclasses import dataclass
 from datetime import datetime
-from typing import List
+from typing import List, Callable, Any
+
+import ijson
+import numpy
+import shapely
+from requests import HTTPError
 
 from enum_types import WarningSeverity
 from enum_types import WarningCategory
 from enum_types import WarningType
 
-import requests
+import data_service
+import nina_client
 import nina_string_helper
 
-_API_URL = "https://warnung.bund.de/api31"
+_API_URL = data_service.get_config()['nina_api_url']
+"""https://warnung.bund.de/api31 or a nina_stand_in_server.py"""
+
+_conditional_get_cache = OrderedDict()
+"""LRU dictionary (url : str, language : str) -> (etag : str, last_modified : str, parsed response)"""
+_conditional_get_cache_lock = threading.Lock()
+
+_filtered_html_cache = OrderedDict()
+"""LRU dictionary blake2b digest of the html : bytes -> the html filtered by nina_string_helper.filter_html_tags"""
+_filtered_html_cache_lock = threading.Lock()
+_filtered_html_statistics = {'hits': 0, 'misses': 0}
+
+
+class _InFlightRequest:
+    """
+    A request that is currently running, all callers asking for the same key wait for its result
+    """
+
+    def __init__(self):
+        self.done = threading.Event()
+        self.result = None
+        self.exception = None
+
+
+_in_flight_requests = {}
+"""dictionary (url : str, language : str) -> _InFlightRequest"""
+_in_flight_requests_lock = threading.Lock()
+_single_flight_statistics = {'requests': 0, 'absorbed': 0}
 
 
 @dataclass
@@ -37,22 +76,170 @@ def _get_safely(dict, key: str):
         return None
 
 
+def _single_flight(key: tuple, call: Callable[[], Any]) -> Any:
+    """
+    Runs the call once for all threads that ask for the same key at the same time: the first thread runs it, the
+    others wait and get the same result (or exception).
+    :param key: identifies the request, for example (url, language)
+    :param call: the request
+    :return: the result of the call
+    """
+    with _in_flight_requests_lock:
+        _single_flight_statistics['requests'] += 1
+        in_flight_request = _in_flight_requests.get(key)
+        if in_flight_request is None:
+            in_flight_request = _InFlightRequest()
+            _in_flight_requests[key] = in_flight_request
+            leader = True
+        else:
+            _single_flight_statistics['absorbed'] += 1
+            leader = False
+
+    if not leader:
+        in_flight_request.done.wait()
+        if in_flight_request.exception is not None:
+            raise in_flight_request.exception
+        return in_flight_request.result
+
+    try:
+        in_flight_request.result = call()
+    except Exception as e:
+        in_flight_request.exception = e
+        raise
+    finally:
+        with _in_flight_requests_lock:
+            del _in_flight_requests[key]
+        in_flight_request.done.set()
+    return in_flight_request.result
+
+
+def get_single_flight_statistics() -> dict:
+    """
+    :return: {'requests', 'absorbed'}: number of requests to the NINA API and how many of them were duplicates that
+    waited for an identical request that was already running instead of sending their own
+    """
+    with _in_flight_requests_lock:
+        return dict(_single_flight_statistics)
+
+
+def _get_parsed_conditionally(url: str, endpoint: str, parse: Callable[[Any], Any], language: str = None,
+                              stream: bool = False) -> Any:
+    """
+    Gets the url with If-None-Match / If-Modified-Since, if the last response had an ETag or Last-Modified header.
+    If the NINA API answers 304 Not Modified, the previously parsed result is returned without downloading and parsing
+    the json again.
+    :param url: the complete url
+    :param endpoint: name of the endpoint for the latency statistics of nina_client
+    :param parse: method that turns the json response into the result
+    :param language: part of the cache key, if the result of parse depends on a language
+    :param stream: if True, parse gets the body as a binary file object instead of the json, so it can parse the body
+    while it is downloaded
+    :return: the parsed result, the same object as before if the data was not modified. Threads asking for the same
+    url and language at the same time share one request (see _single_flight)
+    :raises HTTPError: if the status code is an error (the body is not parsed) or a 304 comes without a cached result
+    """
+    return _single_flight((url, language),
+                          lambda: _get_parsed_conditionally_now(url, endpoint, parse, language, stream))
+
+
+def _get_parsed_conditionally_now(url: str, endpoint: str, parse: Callable[[Any], Any], language: str,
+                                  stream: bool) -> Any:
+    cache_key = (url, language)
+    with _conditional_get_cache_lock:
+        cache_entry = _conditional_get_cache.get(cache_key)
+
+    headers = {}
+    if cache_entry is not None:
+        etag, last_modified, parsed = cache_entry
+        if etag is not None:
+            headers["If-None-Match"] = etag
+        if last_modified is not None:
+            headers["If-Modified-Since"] = last_modified
+
+    response_raw = nina_client.get(url, endpoint, headers, stream)
+    with response_raw:
+        if response_raw.status_code == 304:
+            if cache_entry is None:
+                # validators are only sent with a cache entry, there is nothing to reuse
+                raise HTTPError("304 Not Modified without a cached response for url: " + url, response=response_raw)
+            with _conditional_get_cache_lock:
+                if cache_key in _conditional_get_cache:
+                    _conditional_get_cache.move_to_end(cache_key)
+            return cache_entry[2]
+
+        # an error body must not be parsed, the result would be cached (also by the callers, for example per version)
+        response_raw.raise_for_status()
+        if stream:
+            response_raw.raw.decode_content = True
+            parsed = parse(response_raw.raw)
+        else:
+            parsed = parse(response_raw.json())
+    etag = response_raw.headers.get("ETag")
+    last_modified = response_raw.headers.get("Last-Modified")
+    if etag is not None or last_modified is not None:
+        max_size = data_service.get_cached_config()['nina_conditional_get_cache_size']
+        with _conditional_get_cache_lock:
+            _conditional_get_cache[cache_key] = (etag, last_modified, parsed)
+            _conditional_get_cache.move_to_end(cache_key)
+            while len(_conditional_get_cache) > max_size:
+                _conditional_get_cache.popitem(last=False)
+    return parsed
+
+
+def _filter_html_tags(html: str) -> str:
+    """
+    nina_string_helper.filter_html_tags with a memo: the same descriptions and covid rules come again with every new
+    version of a warning and every covid request, they are only filtered once. The memo is keyed by a hash of the
+    html, so it does not keep the html itself alive
+    :param html: the html, for example the description of a warning
+    :return: the filtered text
+    """
+    if not isinstance(html, str):
+        return nina_string_helper.filter_html_tags(html)
+
+    key = hashlib.blake2b(html.encode(), digest_size=16).digest()
+    with _filtered_html_cache_lock:
+        filtered_text = _filtered_html_cache.get(key)
+        if filtered_text is not None:
+            _filtered_html_cache.move_to_end(key)
+            _filtered_html_statistics['hits'] += 1
+            return filtered_text
+        _filtered_html_statistics['misses'] += 1
+
+    filtered_text = nina_string_helper.filter_html_tags(html)
+    max_size = data_service.get_cached_config()['nina_html_filter_cache_size']
+    with _filtered_html_cache_lock:
+        _filtered_html_cache[key] = filtered_text
+        _filtered_html_cache.move_to_end(key)
+        while len(_filtered_html_cache) > max_size:
+            _filtered_html_cache.popitem(last=False)
+    return filtered_text
+
+
+def get_html_filter_statistics() -> dict:
+    """
+    :return: {'hits', 'misses', 'hit_ratio', 'size'} of the memo of the filtered html texts
+    """
+    with _filtered_html_cache_lock:
+        lookups = _filtered_html_statistics['hits'] + _filtered_html_statistics['misses']
+        return {'hits': _filtered_html_statistics['hits'], 'misses': _filtered_html_statistics['misses'],
+                'hit_ratio': _filtered_html_statistics['hits'] / lookups if lookups > 0 else 0.0,
+                'size': len(_filtered_html_cache)}
+
+
 def get_covid_rules(district_id: str) -> CovidRules or None:
     """
     Gets current covid rules from the NinaApi for a city and returns them as a CovidRules class
     If the city_name is not valid, an indirect ValueError is thrown (forwarded from place_converter)
+    The rules and the infos come from the same response, it is cached for nina_covid_cache_ttl_in_seconds per district
     :param district_id: Each district may have different covid_rules
     :return: CovidRules class, None if we did not get a valid response from the Nina API
     :raises HTTPError:
     """
-    district_id = nina_string_helper.expand_location_id_with_zeros(district_id)
+    return _get_covid_data(district_id)[1]
 
-    # aktuelle Coronameldungen abrufen nach Gebietscode
-    covid_info_api = "/appdata/covid/covidrules/DE/"
-    response_raw = requests.get(_API_URL + covid_info_api + district_id + ".json")
-
-    response = response_raw.json()
 
+def _parse_covid_rules(response) -> CovidRules or None:
     rules_list = _get_safely(response, "rules")
 
     if rules_list is None:
@@ -66,17 +253,17 @@ def get_covid_rules(district_id: str) -> CovidRules or None:
     fines = None
 
     if len(rules_list) > 0:
-        vaccine_info = nina_string_helper.filter_html_tags(rules_list[0]["text"])
+        vaccine_info = _filter_html_tags(rules_list[0]["text"])
     if len(rules_list) > 1:
-        contact_terms = nina_string_helper.filter_html_tags(rules_list[1]["text"])
+        contact_terms = _filter_html_tags(rules_list[1]["text"])
     if len(rules_list) > 2:
-        school_kita_rules = nina_string_helper.filter_html_tags(rules_list[2]["text"])
+        school_kita_rules = _filter_html_tags(rules_list[2]["text"])
     if len(rules_list) > 3:
-        hospital_rules = nina_string_helper.filter_html_tags(rules_list[3]["text"])
+        hospital_rules = _filter_html_tags(rules_list[3]["text"])
     if len(rules_list) > 4:
-        travelling_rules = nina_string_helper.filter_html_tags(rules_list[4]["text"])
+        travelling_rules = _filter_html_tags(rules_list[4]["text"])
     if len(rules_list) > 5:
-        fines = nina_string_helper.filter_html_tags(rules_list[5]["text"])
+        fines = _filter_html_tags(rules_list[5]["text"])
 
     return CovidRules(vaccine_info, contact_terms, school_kita_rules, hospital_rules, travelling_rules, fines)
 
@@ -93,25 +280,102 @@ def get_covid_infos(district_id: str) -> CovidInfo:
     """
     Gets current covid infos from the NinaApi for a certain city and returns them as a CovidInfo class
     If the city_name is not valid, an indirect ValueError is thrown (forwarded from place_converter)
+    The rules and the infos come from the same response, it is cached for nina_covid_cache_ttl_in_seconds per district
     :param district_id:
     :return: CovidInfo class
+    :raises HTTPError: also if the response contains no covid infos
+    """
+    covid_info = _get_covid_data(district_id)[0]
+    if covid_info is None:
+        raise HTTPError("no covid infos for district " + district_id)
+    return covid_info
+
+
+def _parse_covid_infos(response) -> CovidInfo or None:
+    try:
+        infektion_danger_level = response["level"]["headline"]
+
+        inzidenz_split = str(response["level"]["range"]).split("\n")
+
+        sieben_tage_inzidenz_kreis = inzidenz_split[0]
+        sieben_tage_inzidenz_bundesland = inzidenz_split[1]
+        general_tips = _filter_html_tags(response["generalInfo"])
+    except (KeyError, IndexError, TypeError):
+        return None
+    return CovidInfo(infektion_danger_level, sieben_tage_inzidenz_kreis, sieben_tage_inzidenz_bundesland, general_tips)
+
+
+_covid_cache = {}
+"""dictionary district_id (12 digits) : str -> (time.monotonic() of the request, CovidInfo or None, CovidRules or None)"""
+_covid_cache_lock = threading.Lock()
+
+
+def _get_covid_data(district_id: str, refresh: bool = False) -> tuple:
+    """
+    :param district_id: the district id of place_converter, for example "06411"
+    :param refresh: if True, the covid data is requested even if the cached data is not expired
+    :return: tuple of CovidInfo and CovidRules, both are None if the response does not contain them
     :raises HTTPError:
     """
     district_id = nina_string_helper.expand_location_id_with_zeros(district_id)
+    ttl_in_seconds = data_service.get_cached_config()['nina_covid_cache_ttl_in_seconds']
+    with _covid_cache_lock:
+        cache_entry = _covid_cache.get(district_id)
+    if not refresh and cache_entry is not None and time.monotonic() - cache_entry[0] < ttl_in_seconds:
+        return cache_entry[1:]
 
-    # aktuelle Coronameldungen abrufen nach Gebietscode
-    covid_info_api = "/appdata/covid/covidrules/DE/"
+    url = _API_URL + "/appdata/covid/covidrules/DE/" + district_id + ".json"
+    return _single_flight((url, None), lambda: _request_covid_data(url, district_id, ttl_in_seconds))
 
-    response_raw = requests.get(_API_URL + covid_info_api + district_id + ".json")
+
+def _request_covid_data(url: str, district_id: str, ttl_in_seconds: float) -> tuple:
+    requested_at = time.monotonic()
+    response_raw = nina_client.get(url, "covidrules")
+    response_raw.raise_for_status()
     response = response_raw.json()
-    infektion_danger_level = response["level"]["headline"]
+    covid_data = (_parse_covid_infos(response), _parse_covid_rules(response))
+    with _covid_cache_lock:
+        _covid_cache[district_id] = (requested_at,) + covid_data
+        for cached_district_id in [key for key, value in _covid_cache.items()
+                                   if requested_at - value[0] >= ttl_in_seconds]:
+            del _covid_cache[cached_district_id]
+    return covid_data
 
-    inzidenz_split = str(response["level"]["range"]).split("\n")
 
-    sieben_tage_inzidenz_kreis = inzidenz_split[0]
-    sieben_tage_inzidenz_bundesland = inzidenz_split[1]
-    general_tips = nina_string_helper.filter_html_tags(response["generalInfo"])
-    return CovidInfo(infektion_danger_level, sieben_tage_inzidenz_kreis, sieben_tage_inzidenz_bundesland, general_tips)
+def prefetch_covid_data(district_ids: list[str]):
+    """
+    Requests the covid data of the districts into the cache of get_covid_infos and get_covid_rules, one district after
+    the other. Failed requests are only printed
+    :param district_ids: the district ids of place_converter, for example "06411"
+    """
+    for district_id in dict.fromkeys(district_ids):
+        try:
+            _get_covid_data(district_id, refresh=True)
+        except Exception as e:
+            print("ERROR: prefetching the covid data of district " + str(district_id) + " failed: " + repr(e))
+
+
+def _start_covid_prefetcher_loop():
+    """
+    Prefetches the covid data of all districts in the favorites and subscriptions of the users every
+    nina_covid_prefetch_interval_in_seconds (config.json), so the covid buttons are answered from the cache.
+    An interval of 0 disables the prefetcher
+    """
+    while True:
+        prefetch_interval = data_service.get_cached_config()['nina_covid_prefetch_interval_in_seconds']
+        if prefetch_interval <= 0:
+            return
+        prefetch_covid_data(data_service.get_all_district_ids())
+        time.sleep(prefetch_interval)
+
+
+def init_covid_prefetcher():
+    """
+    This method will be called when the bot is initialized
+    """
+    print("Initializing Covid Prefetcher")
+    prefetcher_thread = threading.Thread(target=_start_covid_prefetcher_loop)
+    prefetcher_thread.start()
 
 
 def _get_warning_severity(warn_severity: str) -> WarningSeverity:
@@ -122,8 +386,8 @@ def _get_warning_severity(warn_severity: str) -> WarningSeverity:
     """
     try:
         return WarningSeverity(warn_severity)
-    except KeyError:
-        print("New warning_severity_type: " + warn_severity)
+    except ValueError:
+        print("New warning_severity_type: " + str(warn_severity))
         return WarningSeverity.MINOR
 
 
@@ -136,19 +400,77 @@ def _get_warning_type(warning_type: str) -> WarningType:
     """
     try:
         return WarningType(warning_type)
-    except KeyError:
-        print("New warning_type: " + warning_type)
+    except ValueError:
+        print("New warning_type: " + str(warning_type))
         return WarningType.UNKNOWN
 
 
-@dataclass
 class GeneralWarning:
-    id: str
-    version: int
-    start_date: str
-    severity: WarningSeverity
-    type: WarningType
-    title: str
+    """
+    A warning of a mapData feed. There is one instance per active warning and feed poll, so it has no __dict__ and the
+    fields only needed when a warning is sent (start_date and type) are converted on first access
+    """
+    __slots__ = ("id", "version", "severity", "title", "_start_date", "_nina_start_date", "_type")
+
+    def __init__(self, id: str, version: int, start_date: str, severity: WarningSeverity, type: WarningType,
+                 title: str):
+        self.id = id
+        self.version = version
+        self.severity = severity
+        self.title = title
+        self._start_date = start_date
+        self._nina_start_date = None
+        self._type = type
+
+    @classmethod
+    def _from_map_data(cls, item: dict) -> "GeneralWarning":
+        """
+        :param item: one warning of a mapData feed
+        :return: the warning, start_date and type are converted on first access
+        """
+        warning = cls.__new__(cls)
+        warning.id = item["id"]
+        warning.version = item["version"]
+        warning.severity = _get_warning_severity(item["severity"])
+        warning.title = item["i18nTitle"]["de"]  # only a reference, the item is not kept alive
+        warning._start_date = None
+        warning._nina_start_date = item["startDate"]
+        warning._type = sys.intern(item["type"])
+        return warning
+
+    @property
+    def start_date(self) -> str:
+        if self._start_date is None and self._nina_start_date is not None:
+            self._start_date = _translate_time(self._nina_start_date)
+        return self._start_date
+
+    def get_start_timestamp(self) -> float or None:
+        """
+        :return: the start of the warning as a POSIX timestamp, unlike start_date it can be compared. None if the
+        warning is not from a mapData feed
+        """
+        if self._nina_start_date is None:
+            return None
+        return datetime.fromisoformat(self._nina_start_date).timestamp()
+
+    @property
+    def type(self) -> WarningType:
+        if isinstance(self._type, str):
+            self._type = _get_warning_type(self._type)
+        return self._type
+
+    def _get_fields(self) -> tuple:
+        return self.id, self.version, self.start_date, self.severity, self.type, self.title
+
+    def __eq__(self, other) -> bool:
+        if other.__class__ is not self.__class__:
+            return NotImplemented
+        return self._get_fields() == other._get_fields()
+
+    __hash__ = None  # mutable like the dataclass it replaces
+
+    def __repr__(self) -> str:
+        return "GeneralWarning(id=%r, version=%r, start_date=%r, severity=%r, type=%r, title=%r)" % self._get_fields()
 
 
 def _translate_time(nina_time: str) -> str:
@@ -164,35 +486,33 @@ def _translate_time(nina_time: str) -> str:
     return normal_time_string
 
 
-def _poll_general_warning(api_string: str) -> list[GeneralWarning]:
+def _parse_general_warnings(response) -> list[GeneralWarning]:
     """
-    biwapp, katwarn, mowas, dwd, lhp and police-warnings are all generally the same
-    this is the general method to poll those
-    :param api_string: the string for the exact api we poll for
-    :return: a list of all warnings that are actual. An empty list is returned if there are none
-    :raises HTTPError:
+    :param response: the json of a mapData feed
+    :return: a list of all warnings in the response. An empty list is returned if there are none
     """
-    response_raw = requests.get(_API_URL + api_string)
-    response = response_raw.json()
-
     warning_list = []
 
     if response is None:
         return warning_list
 
-    for i in range(0, len(list(response))):
-        id_response = response[i]["id"]
-        version = response[i]["version"]
+    for item in response:
+        warning_list.append(GeneralWarning._from_map_data(item))
 
-        start_date = _translate_time(response[i]["startDate"])
+    return warning_list
 
-        severity = _get_warning_severity(response[i]["severity"])
-        response_type = _get_warning_type(response[i]["type"])
-        title = response[i]["i18nTitle"]["de"]
-        warning_list.append(GeneralWarning(id=id_response, version=version, start_date=start_date, severity=severity,
-                                           type=response_type, title=title))
 
-    return warning_list
+def _poll_general_warning(api_string: str) -> list[GeneralWarning]:
+    """
+    biwapp, katwarn, mowas, dwd, lhp and police-warnings are all generally the same
+    this is the general method to poll those
+    :param api_string: the string for the exact api we poll for
+    :return: a list of all warnings that are actual. An empty list is returned if there are none
+    :raises HTTPError:
+    """
+    warning_list = _get_parsed_conditionally(_API_URL + api_string, api_string.strip("/").replace(".json", ""),
+                                             _parse_general_warnings)
+    return list(warning_list)  # the cached list must not be changed by the caller
 
 
 def poll_biwapp_warning() -> list[GeneralWarning]:
@@ -270,6 +590,8 @@ class DetailedWarningInfo:
     description: str
     language: str
     area: list[DetailedWarningInfoArea]
+    expires: float = None
+    """the end of the warning as a POSIX timestamp (date_expires is only for reading), None if it has no end"""
 
 
 @dataclass
@@ -320,38 +642,144 @@ def _get_detailed_warning_infos(response_infos, language: str) -> DetailedWarnin
         if info_language is not None and not info_language.lower().__contains__(language):
             continue
 
-        event = _get_safely(info, "event")
+        event = _intern(_get_safely(info, "event"))
         severity = _get_warning_severity(_get_safely(info, "severity"))
         headline = _get_safely(info, "headline")
-        description = nina_string_helper.filter_html_tags(_get_safely(info, "description"))
+        description = _filter_html_tags(_get_safely(info, "description"))
         area = _get_detailed_warning_infos_area(_get_safely(info, "area"))
 
         date_expires = _get_safely(info, "expires")
+        expires = None
         if date_expires is not None:
+            expires = datetime.fromisoformat(date_expires).timestamp()
             date_expires = _translate_time(date_expires)
 
         return DetailedWarningInfo(event=event, severity=severity, date_expires=date_expires, headline=headline,
-                                   description=description, area=area, language=info_language)
+                                   description=description, area=area, language=_intern(info_language),
+                                   expires=expires)
 
     return None
 
 
-def get_detailed_warning(warning_id: str, language: str = "de") -> DetailedWarning:
+_active_warning_versions = {}
+"""dictionary warning_id : str -> version : int of the warnings in the last mapData poll"""
+
+_detailed_warning_cache = {}
+"""dictionary (warning_id : str, version : int, language : str) -> DetailedWarning"""
+
+_detailed_warning_geo_cache = {}
+"""dictionary (warning_id : str, version : int) -> DetailedWarningGeo"""
+
+_detailed_warning_cache_lock = threading.Lock()
+
+
+def _update_active_warning_versions(general_warnings: list[GeneralWarning], complete: bool):
+    """
+    Remembers the versions of the polled warnings. If the poll was complete, the detailed warnings and geojsons of all
+    warnings that are not active anymore are removed from the caches.
+    :param general_warnings: the warnings of the poll
+    :param complete: True if all feeds could be polled, so missing warnings are not active anymore
+    """
+    with _detailed_warning_cache_lock:
+        if complete:
+            _active_warning_versions.clear()
+        for warning in general_warnings:
+            _active_warning_versions[warning.id] = warning.version
+        if complete:
+            for cache in [_detailed_warning_cache, _detailed_warning_geo_cache]:
+                for cache_key in list(cache.keys()):
+                    if cache_key[0] not in _active_warning_versions:
+                        del cache[cache_key]
+
+
+def remove_warning_from_caches(warning_id: str):
+    """
+    Removes the detailed warnings and geojsons of all versions and languages of the warning from the caches, for
+    example when it expired. The warning is only downloaded again if it is requested again
+    :param warning_id: the id of the warning
+    """
+    with _detailed_warning_cache_lock:
+        for cache in [_detailed_warning_cache, _detailed_warning_geo_cache]:
+            for cache_key in [key for key in cache if key[0] == warning_id]:
+                del cache[cache_key]
+
+    warning_url = _API_URL + "/warnings/" + warning_id + "."
+    with _conditional_get_cache_lock:
+        for cache_key in [key for key in _conditional_get_cache if key[0].startswith(warning_url)]:
+            del _conditional_get_cache[cache_key]
+
+
+def _get_cached(cache: dict, warning_id: str, version: int, key_suffix: tuple) -> tuple[tuple, Any]:
+    """
+    :param version: the version of the warning, the version of the last mapData poll if None
+    :return: the cache key, None if the version is not known, and the cached entry, None on a miss
+    """
+    with _detailed_warning_cache_lock:
+        if version is None:
+            version = _active_warning_versions.get(warning_id)
+        if version is None:
+            return None, None
+        cache_key = (warning_id, version) + key_suffix
+        return cache_key, cache.get(cache_key)
+
+
+def _put_cached(cache: dict, cache_key: tuple, result: Any):
+    """
+    Stores the result and removes the entries of older versions of the warning
+    """
+    warning_id, version = cache_key[0], cache_key[1]
+    with _detailed_warning_cache_lock:
+        for old_cache_key in [key for key in cache if key[0] == warning_id and key[1] != version]:
+            del cache[old_cache_key]
+        cache[cache_key] = result
+
+
+def _get_cached_by_version(cache: dict, warning_id: str, version: int, key_suffix: tuple, load: Callable[[], Any]):
+    """
+    Returns the entry for (warning_id, version, *key_suffix), loads it on a miss. Entries of older versions of the
+    warning are removed when a new version is loaded.
+    :param version: the version of the warning, the version of the last mapData poll if None. If it is not known
+    either, nothing is cached
+    """
+    cache_key, result = _get_cached(cache, warning_id, version, key_suffix)
+    if result is not None:
+        return result
+
+    result = load()
+    if cache_key is not None:
+        _put_cached(cache, cache_key, result)
+    return result
+
+
+def get_detailed_warning(warning_id: str, language: str = "de", version: int = None) -> DetailedWarning:
     """
     This method should be called after a warning with one of the poll_****_warning methods was received
     Args:
         warning_id: warning id is extracted from the poll_****_warning method return type: GeneralWarning.id
         language: what language will be returned
+        version: version of the warning (GeneralWarning.version), by default the version of the last poll.
+                 The detailed warning is only downloaded once per warning id, version and language
     Returns:
          the detailed Warning as a DetailedWarning class
     Raises: HTTPError
     """
-    response_raw = requests.get(_API_URL + "/warnings/" + warning_id + ".json")
-    response = response_raw.json()
+    return _get_cached_by_version(_detailed_warning_cache, warning_id, version, (language,),
+                                  lambda: _get_parsed_conditionally(
+                                      _API_URL + "/warnings/" + warning_id + ".json", "warnings",
+                                      lambda response: _parse_detailed_warning(response, language), language))
+
+
+def _intern(value: str or None) -> str or None:
+    """
+    :return: the interned string, so the few different values (sender, status, ...) of all warnings share one object
+    """
+    return sys.intern(value) if isinstance(value, str) else value
 
+
+def _parse_detailed_warning(response, language: str) -> DetailedWarning:
     id_response = _get_safely(response, "identifier")
-    sender = _get_safely(response, "sender")
-    status = _get_safely(response, "status")
+    sender = _intern(_get_safely(response, "sender"))
+    status = _intern(_get_safely(response, "status"))
 
     date_sent = _get_safely(response, "sent")
     if date_sent is not None:
@@ -370,7 +798,27 @@ def get_detailed_warning(warning_id: str, language: str = "de") -> DetailedWarni
 
 @dataclass
 class GeoCoordinates:
-    coordinates: list[list[list[str]]]
+    geometry: shapely.Geometry
+    """the geometry of one feature of the geojson, usually a Polygon or a MultiPolygon"""
+
+    @property
+    def coordinates(self) -> list:
+        """
+        :return: the coordinates as nested lists like in the geojson, built on every call
+        """
+        return _to_lists(shapely.geometry.mapping(self.geometry)["coordinates"])
+
+    def get_rings(self) -> list:
+        """
+        :return: the exterior and interior rings of all polygons of the geometry, each as an array of coordinates
+        """
+        return [shapely.get_coordinates(ring) for ring in shapely.get_rings(shapely.get_parts(self.geometry))]
+
+
+def _to_lists(coordinates) -> list:
+    if isinstance(coordinates, (tuple, list)):
+        return [_to_lists(value) for value in coordinates]
+    return coordinates
 
 
 @dataclass
@@ -378,11 +826,14 @@ class DetailedWarningGeo:
     affected_areas: list[GeoCoordinates]
 
 
-def get_detailed_warning_geo(warning_id: str) -> DetailedWarningGeo:
+def get_detailed_warning_geo(warning_id: str, version: int = None) -> DetailedWarningGeo:
     """
-    This method should be called after a warning with one of the poll_****_warning methods was received
+    This method should be called after a warning with one of the poll_****_warning methods was received.
+    The geojson is parsed while it is downloaded, feature by feature (see _parse_detailed_warning_geo_stream)
     Args:
         warning_id: warning id is extracted from the poll_****_warning method return type: GeneralWarning.id
+        version: version of the warning (GeneralWarning.version), by default the version of the last poll.
+                 The geojson is only downloaded once per warning id and version
 
     Returns:
         the detailed Warning as a geojson
@@ -390,9 +841,40 @@ def get_detailed_warning_geo(warning_id: str) -> DetailedWarningGeo:
     Raises:
          HTTPError:
     """
-    response_raw = requests.get(_API_URL + "/warnings/" + warning_id + ".geojson")
-    response = response_raw.json()
+    return _get_cached_by_version(_detailed_warning_geo_cache, warning_id, version, (),
+                                  lambda: _get_parsed_conditionally(
+                                      _API_URL + "/warnings/" + warning_id + ".geojson", "warnings.geojson",
+                                      _parse_detailed_warning_geo_stream, stream=True))
+
+
+def _get_geo_coordinates(geometry) -> GeoCoordinates or None:
+    """
+    :param geometry: the geometry of a geojson feature as parsed json
+    :return: the geometry as GeoCoordinates, None if the feature has no valid geometry
+    """
+    if geometry is None or _get_safely(geometry, "coordinates") is None:
+        return None
+    try:
+        if geometry.get("type") == "Polygon":
+            return GeoCoordinates(geometry=_get_polygon(geometry["coordinates"]))
+        if geometry.get("type") == "MultiPolygon":
+            return GeoCoordinates(geometry=shapely.MultiPolygon([_get_polygon(rings)
+                                                                 for rings in geometry["coordinates"]]))
+        return GeoCoordinates(geometry=shapely.geometry.shape(geometry))
+    except (ValueError, TypeError, IndexError, shapely.errors.GEOSException) as e:
+        print("ERROR: skipping invalid geometry of type " + str(geometry.get("type")) + ": " + repr(e))
+        return None
 
+
+def _get_polygon(rings: list) -> shapely.Polygon:
+    """
+    Faster than shapely.geometry.shape, since every ring is converted to an array in one call
+    """
+    rings = [numpy.asarray(ring, dtype=numpy.float64) for ring in rings]
+    return shapely.Polygon(rings[0], rings[1:])
+
+
+def _parse_detailed_warning_geo(response) -> DetailedWarningGeo:
     features = _get_safely(response, "features")
     affected_areas = []
 
@@ -400,27 +882,62 @@ def get_detailed_warning_geo(warning_id: str) -> DetailedWarningGeo:
         return DetailedWarningGeo(affected_areas=affected_areas)
 
     for feature in features:
-        geometry = _get_safely(feature, "geometry")
-        if geometry is None:
-            continue
+        geo_coordinates = _get_geo_coordinates(_get_safely(feature, "geometry"))
+        if geo_coordinates is not None:
+            affected_areas.append(geo_coordinates)
 
-        coordinates = _get_safely(geometry, "coordinates")
-        if coordinates is None:
-            continue
+    return DetailedWarningGeo(affected_areas=affected_areas)
 
-        affected_areas.append(GeoCoordinates(coordinates=coordinates))
 
+def _parse_detailed_warning_geo_stream(body) -> DetailedWarningGeo:
+    """
+    Parses the geojson while it is read: only the nested coordinate lists of the current feature exist as Python
+    objects, they are turned into a shapely geometry (coordinates in one array) before the next feature is read.
+    Neither the whole text nor the coordinate lists of all features are in memory at the same time
+    :param body: the geojson as binary file object, for example the raw body of a streamed response
+    :return: the same result as _parse_detailed_warning_geo for the parsed json
+    """
+    affected_areas = []
+    for geometry in ijson.items(body, "features.item.geometry", use_float=True):
+        geo_coordinates = _get_geo_coordinates(geometry)
+        if geo_coordinates is not None:
+            affected_areas.append(geo_coordinates)
     return DetailedWarningGeo(affected_areas=affected_areas)
 
 
+_feed_executor = ThreadPoolExecutor(max_workers=6, thread_name_prefix="nina_feed")
+"""one thread per mapData feed, so all feeds of a poll cycle are fetched at the same time"""
+
+
+def _poll_feeds_concurrently(feeds: list[Callable[[], list[GeneralWarning]]]) -> list[list[GeneralWarning]]:
+    """
+    Calls all poll methods at the same time, so a poll cycle takes about as long as the slowest feed.
+    A failing feed only drops its own warnings.
+    :param feeds: the poll_****_warning methods
+    :return: the warnings of every feed in the order of the given feeds, None for a feed that failed
+    """
+    futures = [_feed_executor.submit(feed) for feed in feeds]
+    result = []
+    for feed, future in zip(feeds, futures):
+        try:
+            result.append(future.result())
+        except Exception as e:
+            print("ERROR: could not poll " + feed.__name__ + ", skipping its warnings: " + repr(e))
+            result.append(None)
+    return result
+
+
 def _poll_civil_protection_warnings() -> list[GeneralWarning]:
-    result = [poll_biwapp_warning(), poll_mowas_warning(), poll_katwarn_warning(), poll_police_warning()]
+    result = _poll_feeds_concurrently([poll_biwapp_warning, poll_mowas_warning, poll_katwarn_warning,
+                                       poll_police_warning])
     return _filter_warnings(result)
 
 
 def _filter_warnings(warnings: list[list[GeneralWarning]]) -> list[GeneralWarning]:
     result = []
     for listWarning in warnings:
+        if listWarning is None:  # feed could not be polled
+            continue
         for singleWarning in listWarning:
             result.append(singleWarning)
     return result
@@ -432,6 +949,16 @@ _call_general_warning_map = {
     WarningCategory.CIVIL_PROTECTION: _poll_civil_protection_warnings,
 }
 
+_feed_category_list = [
+    ("dwd", poll_dwd_warning, WarningCategory.WEATHER),
+    ("biwapp", poll_biwapp_warning, WarningCategory.CIVIL_PROTECTION),
+    ("mowas", poll_mowas_warning, WarningCategory.CIVIL_PROTECTION),
+    ("katwarn", poll_katwarn_warning, WarningCategory.CIVIL_PROTECTION),
+    ("police", poll_police_warning, WarningCategory.CIVIL_PROTECTION),
+    ("lhp", poll_lhp_warning, WarningCategory.FLOOD),
+]
+"""every mapData feed with its name and the category of its warnings, in the order of WarningCategory"""
+
 
 def call_general_warning(warning: WarningCategory) -> list[GeneralWarning]:
     """
@@ -448,17 +975,176 @@ def call_general_warning(warning: WarningCategory) -> list[GeneralWarning]:
     return _call_general_warning_map[warning]()
 
 
+_last_good_feed_results = {}
+"""dictionary feed name : str -> list[GeneralWarning], the result of the last successful poll of every feed"""
+_failed_feeds = set()
+"""names of the feeds whose last poll failed"""
+_last_good_feed_results_lock = threading.Lock()
+
+
+@dataclass
+class ActiveWarningsPoll:
+    warnings: list[tuple[GeneralWarning, WarningCategory]]
+    failed_categories: set[WarningCategory]
+    """categories of which the last poll of at least one feed failed (or that was not polled yet)"""
+    stale_categories: set[WarningCategory]
+    """categories of which the last poll of at least one feed failed and its last successful result is used"""
+    feed_results: dict[str, list[GeneralWarning]]
+    """dictionary feed name -> warnings of every polled feed, None if it could not be polled"""
+    changed_feeds: set[str]
+    """names of the polled feeds whose warnings (ids and versions) differ from their last successful poll"""
+
+
+def get_feed_names() -> list[str]:
+    """
+    :return: the names of all mapData feeds, for example "dwd" or "mowas"
+    """
+    return [name for name, feed, category in _feed_category_list]
+
+
+def poll_active_warnings(feed_names: set[str] = None) -> ActiveWarningsPoll:
+    """
+    Polls the given mapData feeds at the same time, for all other feeds the warnings of their last successful poll are
+    used. If a feed can not be polled (for example because its circuit breaker in nina_client is open), the warnings of
+    its last successful poll are used as well, if there was one.
+    The versions of the warnings are remembered for the detailed warning cache.
+    :param feed_names: names of the feeds that are polled (see get_feed_names), all feeds if None
+    :return: the warnings of all feeds and what happened to the polled feeds
+    """
+    polled_feeds = [(name, feed, category) for name, feed, category in _feed_category_list
+                    if feed_names is None or name in feed_names]
+    feed_results = dict(zip([name for name, feed, category in polled_feeds],
+                            _poll_feeds_concurrently([feed for name, feed, category in polled_feeds])))
+
+    warnings = []
+    failed_categories = set()
+    stale_categories = set()
+    changed_feeds = set()
+    with _last_good_feed_results_lock:
+        for name, feed, category in _feed_category_list:
+            if name in feed_results and feed_results[name] is None:
+                _failed_feeds.add(name)
+            elif name in feed_results:
+                _failed_feeds.discard(name)
+                last_good_feed_warnings = _last_good_feed_results.get(name, [])
+                if name not in _last_good_feed_results \
+                        or {(warning.id, warning.version) for warning in feed_results[name]} \
+                        != {(warning.id, warning.version) for warning in last_good_feed_warnings}:
+                    changed_feeds.add(name)
+                _last_good_feed_results[name] = feed_results[name]
+
+            feed_warnings = _last_good_feed_results.get(name)
+            if name in _failed_feeds or feed_warnings is None:  # feed_warnings is None if the feed was not polled yet
+                failed_categories.add(category)
+                if feed_warnings is None:
+                    continue
+                stale_categories.add(category)
+            for warning in feed_warnings:
+                warnings.append((warning, category))
+
+    _update_active_warning_versions([warning for warning, category in warnings], len(failed_categories) == 0)
+
+    return ActiveWarningsPoll(warnings, failed_categories, stale_categories, feed_results, changed_feeds)
+
+
+def poll_all_active_warnings() -> tuple[list[tuple[GeneralWarning, WarningCategory]], set[WarningCategory],
+                                        set[WarningCategory]]:
+    """
+    Polls all mapData feeds at the same time, see poll_active_warnings
+    :return: list of tuples consisting of GeneralWarning and WarningCategory, the categories of which at least one
+    feed could not be polled and the categories of which at least one feed is served from its last successful poll
+    """
+    result = poll_active_warnings()
+    return result.warnings, result.failed_categories, result.stale_categories
+
+
 def get_all_active_warnings() -> list[tuple[GeneralWarning, WarningCategory]]:
     """
+    Polls all mapData feeds at the same time. If a feed can not be polled, only its warnings are missing.
+    Use warning_feed.get_snapshot() instead, if the warnings do not have to be polled right now.
 
     Returns: List of tuples consisting of GeneralWarning and WarningCategory
 
+    """
+    return poll_all_active_warnings()[0]
+
+
+_dashboard_provider_categories = {
+    "DWD": WarningCategory.WEATHER,
+    "LHP": WarningCategory.FLOOD,
+}
+"""provider of a dashboard warning -> WarningCategory, all other providers are WarningCategory.CIVIL_PROTECTION"""
+
+_dashboard_cache = {}
+"""dictionary ars : str -> (time.monotonic() of the request, list[tuple[GeneralWarning, WarningCategory]])"""
+_dashboard_cache_lock = threading.Lock()
+
+
+def _get_dashboard_warning_category(warning_id: str, provider: str) -> WarningCategory:
+    if provider is not None:
+        return _dashboard_provider_categories.get(provider.upper(), WarningCategory.CIVIL_PROTECTION)
+    for prefix, category in [("dwd", WarningCategory.WEATHER), ("lhp", WarningCategory.FLOOD)]:
+        if warning_id.startswith(prefix):
+            return category
+    return WarningCategory.CIVIL_PROTECTION
+
+
+def _parse_dashboard(response) -> list[tuple[GeneralWarning, WarningCategory]]:
+    """
+    :param response: the json of the dashboard of a region
+    :return: all warnings of the region with their WarningCategory
     """
     warnings = []
-    for warn_type in WarningCategory:
-        for warning in call_general_warning(warn_type):
-            warnings.append((warning, warn_type))
+    if response is None:
+        return warnings
+
+    for item in response:
+        try:
+            payload = _get_safely(item, "payload")
+            if payload is None:
+                continue
+            data = _get_safely(payload, "data") or {}
+            warning_id = _get_safely(item, "id")
+            start_date = _get_safely(item, "startDate") or _get_safely(item, "sent")
+            if start_date is not None:
+                start_date = _translate_time(start_date)
+            title = (_get_safely(item, "i18nTitle") or {}).get("de") or _get_safely(data, "headline")
+            warning = GeneralWarning(id=warning_id, version=_get_safely(payload, "version"), start_date=start_date,
+                                     severity=_get_warning_severity(_get_safely(data, "severity")),
+                                     type=_get_warning_type(_get_safely(data, "msgType")), title=title)
+            warnings.append((warning, _get_dashboard_warning_category(warning_id, _get_safely(data, "provider"))))
+        except (ValueError, KeyError, TypeError, AttributeError) as e:
+            # one malformed entry must not hide the other warnings of the region
+            print("ERROR: skipping malformed dashboard entry: " + repr(e))
+    return warnings
+
 
+def get_regional_warnings(district_id: str) -> list[tuple[GeneralWarning, WarningCategory]]:
+    """
+    Gets the active warnings of one district from the dashboard of the NINA API. The result is cached for
+    nina_dashboard_cache_ttl_in_seconds per district
+    :param district_id: the district id of place_converter, for example "06411"
+    :return: list of tuples consisting of GeneralWarning and WarningCategory
+    :raises HTTPError:
+    """
+    ars = nina_string_helper.expand_location_id_with_zeros(district_id[0:5])
+    ttl_in_seconds = data_service.get_cached_config()['nina_dashboard_cache_ttl_in_seconds']
+    with _dashboard_cache_lock:
+        cache_entry = _dashboard_cache.get(ars)
+    if cache_entry is not None and time.monotonic() - cache_entry[0] < ttl_in_seconds:
+        return list(cache_entry[1])
+
+    url = _API_URL + "/dashboard/" + ars + ".json"
+    return list(_single_flight((url, None), lambda: _request_dashboard(url, ars)))
+
+
+def _request_dashboard(url: str, ars: str) -> list[tuple[GeneralWarning, WarningCategory]]:
+    requested_at = time.monotonic()
+    response_raw = nina_client.get(url, "dashboard")
+    response_raw.raise_for_status()
+    warnings = _parse_dashboard(response_raw.json())
+    with _dashboard_cache_lock:
+        _dashboard_cache[ars] = (requested_at, warnings)
     return warnings
 
 
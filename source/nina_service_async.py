@@ -0,0 +1,253 @@
+import asyncio
+import time
+from typing import Any, Awaitable, Callable, Iterable
+
+import aiohttp
+import ijson
+from requests import HTTPError
+
+import data_service
+import nina_client
+import nina_service
+from nina_service import GeneralWarning, DetailedWarning, DetailedWarningGeo, WarningCategory
+
+# asyncio variant of the NINA API calls of nina_service, for fetching many warnings at once (for example all active
+# warnings when the bot starts). It returns the same dataclasses as nina_service and fills the same detailed warning
+# caches, so the synchronous calls after a prefetch do not download anything again.
+# The mapData feeds and warning documents are not fetched conditionally (no ETag / If-Modified-Since) here.
+
+_feed_path_category_list = [
+    ("/dwd/mapData.json", WarningCategory.WEATHER),
+    ("/biwapp/mapData.json", WarningCategory.CIVIL_PROTECTION),
+    ("/mowas/mapData.json", WarningCategory.CIVIL_PROTECTION),
+    ("/katwarn/mapData.json", WarningCategory.CIVIL_PROTECTION),
+    ("/police/mapData.json", WarningCategory.CIVIL_PROTECTION),
+    ("/lhp/mapData.json", WarningCategory.FLOOD),
+]
+"""the same feeds in the same order as nina_service._feed_category_list"""
+
+_session = None
+_session_loop = None
+
+
+def _get_session() -> aiohttp.ClientSession:
+    """
+    :return: the session of the running event loop, created with the pool size and timeouts from config.json
+    """
+    global _session, _session_loop
+    loop = asyncio.get_running_loop()
+    if _session is None or _session.closed or _session_loop is not loop:
+        config = data_service.get_cached_config()
+        connector = aiohttp.TCPConnector(limit=config['nina_http_pool_size'])
+        timeout = aiohttp.ClientTimeout(connect=config['nina_http_connect_timeout_in_seconds'],
+                                        sock_read=config['nina_http_read_timeout_in_seconds'])
+        _session = aiohttp.ClientSession(connector=connector, timeout=timeout)
+        _session_loop = loop
+    return _session
+
+
+async def close_session():
+    """
+    Closes the session of the running event loop, should be awaited before the event loop is closed
+    """
+    global _session, _session_loop
+    if _session is not None and _session_loop is asyncio.get_running_loop():
+        await _session.close()
+        _session = None
+        _session_loop = None
+
+
+async def _get_json(url: str, endpoint: str,
+                    read: Callable[[aiohttp.StreamReader], Awaitable[Any]] = None) -> Any:
+    """
+    Gets the url with the same retries and circuit breaker as nina_client.get and records the latency in its statistics
+    :param url: the complete url
+    :param endpoint: name of the endpoint for the latency statistics and the circuit breaker of nina_client
+    :param read: coroutine that parses the body while it is downloaded, by default the whole body is read as json
+    :return: the json response or the result of read
+    :raises nina_client.CircuitOpenError: if the circuit breaker of the endpoint is open
+    :raises HTTPError: if the status code of the last attempt is an error
+    :raises aiohttp.ClientError, asyncio.TimeoutError: if there was no response after all retries
+    """
+    circuit_breaker = nina_client.get_circuit_breaker(endpoint)
+    if not circuit_breaker.allow_request():
+        raise nina_client.CircuitOpenError(endpoint)
+    # like nina_client.get, also a cancelled request is recorded, so a trial request cannot keep the breaker half-open
+    failed = True
+    try:
+        status, response = await _get_json_with_retries(url, endpoint, read)
+        failed = status in nina_client._RETRY_STATUS_CODES
+    finally:
+        if failed:
+            circuit_breaker.record_failure()
+        else:
+            circuit_breaker.record_success()
+    if status >= 400:
+        raise HTTPError(str(status) + " for url: " + url)
+    return response
+
+
+async def _get_json_with_retries(url: str, endpoint: str,
+                                 read: Callable[[aiohttp.StreamReader], Awaitable[Any]] = None) -> tuple[int, Any]:
+    """
+    :return: the status code of the last attempt and the json response, None if the status code is an error
+    """
+    config = data_service.get_cached_config()
+    max_retries = config['nina_http_max_retries']
+    attempt = 0
+    while True:
+        start = time.perf_counter()
+        try:
+            async with _get_session().get(url) as response:
+                retry = response.status in nina_client._RETRY_STATUS_CODES and attempt < max_retries
+                nina_client._record_latency(endpoint, time.perf_counter() - start, response.status >= 400, retry)
+                if not retry:
+                    if response.status >= 400:
+                        return response.status, None
+                    if read is not None:
+                        return response.status, await read(response.content)
+                    return response.status, await response.json(content_type=None)
+        except (aiohttp.ClientConnectionError, asyncio.TimeoutError):
+            nina_client._record_latency(endpoint, time.perf_counter() - start, True, attempt < max_retries)
+            if attempt >= max_retries:
+                raise
+        await asyncio.sleep(nina_client._get_backoff_time(config['nina_http_backoff_in_seconds'], attempt))
+        attempt += 1
+
+
+async def _poll_general_warning(api_string: str) -> list[GeneralWarning]:
+    return nina_service._parse_general_warnings(
+        await _get_json(nina_service._API_URL + api_string, api_string.strip("/").replace(".json", "")))
+
+
+async def get_all_active_warnings() -> list[tuple[GeneralWarning, WarningCategory]]:
+    """
+    Coroutine version of nina_service.get_all_active_warnings: polls all mapData feeds at the same time. If a feed can
+    not be polled, only its warnings are missing.
+    :return: list of tuples consisting of GeneralWarning and WarningCategory
+    """
+    feed_results = await asyncio.gather(*[_poll_general_warning(path) for path, category in _feed_path_category_list],
+                                        return_exceptions=True)
+    warnings = []
+    complete = True
+    for (path, category), feed_warnings in zip(_feed_path_category_list, feed_results):
+        if isinstance(feed_warnings, BaseException):
+            print("ERROR: could not poll " + path + ", skipping its warnings: " + repr(feed_warnings))
+            complete = False
+            continue
+        for warning in feed_warnings:
+            warnings.append((warning, category))
+
+    nina_service._update_active_warning_versions([warning for warning, category in warnings], complete)
+    return warnings
+
+
+async def _get_cached_by_version(cache: dict, warning_id: str, version: int, key_suffix: tuple,
+                                 load: Callable[[], Awaitable[Any]]) -> Any:
+    cache_key, result = nina_service._get_cached(cache, warning_id, version, key_suffix)
+    if result is not None:
+        return result
+
+    result = await load()
+    if cache_key is not None:
+        nina_service._put_cached(cache, cache_key, result)
+    return result
+
+
+async def get_detailed_warning(warning_id: str, language: str = "de", version: int = None) -> DetailedWarning:
+    """
+    Coroutine version of nina_service.get_detailed_warning, uses the same cache
+    :param warning_id: GeneralWarning.id
+    :param language: what language will be returned
+    :param version: GeneralWarning.version, by default the version of the last poll
+    :return: the detailed Warning as a DetailedWarning class
+    :raises HTTPError:
+    """
+    async def load() -> DetailedWarning:
+        response = await _get_json(nina_service._API_URL + "/warnings/" + warning_id + ".json", "warnings")
+        return nina_service._parse_detailed_warning(response, language)
+
+    return await _get_cached_by_version(nina_service._detailed_warning_cache, warning_id, version, (language,), load)
+
+
+async def get_detailed_warning_geo(warning_id: str, version: int = None) -> DetailedWarningGeo:
+    """
+    Coroutine version of nina_service.get_detailed_warning_geo, uses the same cache
+    :param warning_id: GeneralWarning.id
+    :param version: GeneralWarning.version, by default the version of the last poll
+    :return: the detailed Warning as a geojson
+    :raises HTTPError:
+    """
+    async def load() -> DetailedWarningGeo:
+        return await _get_json(nina_service._API_URL + "/warnings/" + warning_id + ".geojson", "warnings.geojson",
+                               _parse_detailed_warning_geo_stream)
+
+    return await _get_cached_by_version(nina_service._detailed_warning_geo_cache, warning_id, version, (), load)
+
+
+async def _parse_detailed_warning_geo_stream(body: aiohttp.StreamReader) -> DetailedWarningGeo:
+    """
+    Coroutine version of nina_service._parse_detailed_warning_geo_stream, parses the geojson feature by feature while
+    it is downloaded
+    """
+    affected_areas = []
+    async for geometry in ijson.items_async(body, "features.item.geometry", use_float=True):
+        geo_coordinates = nina_service._get_geo_coordinates(geometry)
+        if geo_coordinates is not None:
+            affected_areas.append(geo_coordinates)
+    return DetailedWarningGeo(affected_areas=affected_areas)
+
+
+async def gather(calls: Iterable[Callable[[], Awaitable[Any]]], max_concurrency: int = None) -> list:
+    """
+    Runs the calls with at most max_concurrency of them at the same time
+    :param calls: functions without parameters that return an awaitable,
+    for example lambda: get_detailed_warning(warning.id, version=warning.version)
+    :param max_concurrency: by default nina_http_pool_size from config.json
+    :return: the results in the order of the calls, the exception for a call that failed
+    """
+    if max_concurrency is None:
+        max_concurrency = data_service.get_cached_config()['nina_http_pool_size']
+    semaphore = asyncio.Semaphore(max_concurrency)
+
+    async def run(call: Callable[[], Awaitable[Any]]) -> Any:
+        async with semaphore:
+            return await call()
+
+    return await asyncio.gather(*[run(call) for call in calls], return_exceptions=True)
+
+
+def _run_prefetch(calls: list[Callable[[], Awaitable[Any]]]):
+    async def prefetch():
+        try:
+            results = await gather(calls)
+        finally:
+            await close_session()
+        for result in results:
+            if isinstance(result, BaseException):
+                print("ERROR: prefetching a warning failed: " + repr(result))
+
+    # recorded and replayed requests must go through the session of nina_client, the synchronous calls get the warnings
+    if len(calls) > 0 and not nina_client.is_recording_or_replaying():
+        asyncio.run(prefetch())
+
+
+def prefetch_detailed_warnings(warnings: list[GeneralWarning], language: str = "de"):
+    """
+    Downloads the detailed warnings concurrently into the cache of nina_service.get_detailed_warning.
+    Must not be called from a running event loop. Failed downloads are only printed, the synchronous call retries them
+    :param warnings: the warnings, their versions are used for the cache
+    :param language: what language will be cached
+    """
+    _run_prefetch([lambda warning=warning: get_detailed_warning(warning.id, language, warning.version)
+                   for warning in warnings])
+
+
+def prefetch_detailed_warning_geos(warnings: list[GeneralWarning]):
+    """
+    Downloads the geojson of the warnings concurrently into the cache of nina_service.get_detailed_warning_geo.
+    Must not be called from a running event loop. Failed downloads are only printed, the synchronous call retries them
+    :param warnings: the warnings, their versions are used for the cache
+    """
+    _run_prefetch([lambda warning=warning: get_detailed_warning_geo(warning.id, warning.version)
+                   for warning in warnings])
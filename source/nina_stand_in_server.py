@@ -0,0 +1,112 @@
+import argparse
+import http.server
+import os
+import random
+import threading
+import time
+
+import nina_recording
+
+# A local stand-in for the NINA API (mapData feeds, warnings .json/.geojson, covid rules, dashboards) that serves a
+# fixture directory recorded with nina_http_record_directory (see nina_recording), with configurable latency and
+# injected errors. To run the bot offline, start the server and set nina_api_url in config.json to
+# http://<host>:<port>/api31, the path prefix of the recorded urls.
+#
+# Usage: python nina_stand_in_server.py <fixture directory> [--port 8080] [--latency 0.2] [--jitter 0.1]
+#        [--error-rate 0.05] [--error-status 503]
+
+
+class _StandInRequestHandler(http.server.BaseHTTPRequestHandler):
+    def do_GET(self):
+        server = self.server
+        time.sleep(max(0.0, server.latency_in_seconds + random.uniform(-server.jitter_in_seconds,
+                                                                         server.jitter_in_seconds)))
+        with server.statistics_lock:
+            server.statistics['requests'] += 1
+        if random.random() < server.error_rate:
+            with server.statistics_lock:
+                server.statistics['injected_errors'] += 1
+            self._send(server.error_status, b"")
+            return
+
+        path = nina_recording.get_fixture_path(server.directory, self.path)
+        if path is None or not os.path.isfile(path):
+            self._send(404, b"")
+            return
+        with open(path, "rb") as file_object:
+            body = file_object.read()
+        etag = nina_recording.get_etag(body)
+        if self.headers.get("If-None-Match") == etag:
+            self._send(304, b"", {"ETag": etag})
+            return
+        self._send(200, body, {"ETag": etag, "Content-Type": nina_recording.get_content_type(path)})
+
+    def _send(self, status: int, body: bytes, headers: dict = None):
+        self.send_response(status)
+        for name, value in (headers or {}).items():
+            self.send_header(name, value)
+        self.send_header("Content-Length", str(len(body)))
+        self.end_headers()
+        try:
+            self.wfile.write(body)
+        except (BrokenPipeError, ConnectionResetError):
+            pass  # the client gave up because of its timeout
+
+    def log_message(self, format, *args):
+        pass
+
+
+def create_server(directory: str, host: str = "127.0.0.1", port: int = 0, latency_in_seconds: float = 0.0,
+                  jitter_in_seconds: float = 0.0, error_rate: float = 0.0,
+                  error_status: int = 503) -> http.server.ThreadingHTTPServer:
+    """
+    Creates the server, it is started with serve_forever (for example in a daemon thread) and stopped with shutdown
+
+    Args:
+        directory: the fixture directory
+        host: the address the server listens on
+        port: the port, 0 for any free port (see server.server_address)
+        latency_in_seconds: delay of every answer
+        jitter_in_seconds: the delay varies uniformly by up to this many seconds
+        error_rate: share of the requests that are answered with error_status instead of the fixture
+        error_status: the status code of the injected errors
+
+    Returns:
+        the server, server.statistics counts the 'requests' and 'injected_errors'
+    """
+    server = http.server.ThreadingHTTPServer((host, port), _StandInRequestHandler)
+    server.daemon_threads = True
+    server.directory = directory
+    server.latency_in_seconds = latency_in_seconds
+    server.jitter_in_seconds = jitter_in_seconds
+    server.error_rate = error_rate
+    server.error_status = error_status
+    server.statistics = {'requests': 0, 'injected_errors': 0}
+    server.statistics_lock = threading.Lock()
+    return server
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Serves recorded NINA API responses")
+    parser.add_argument("directory", help="the fixture directory")
+    parser.add_argument("--host", default="127.0.0.1")
+    parser.add_argument("--port", type=int, default=8080)
+    parser.add_argument("--latency", type=float, default=0.0, help="delay of every answer in seconds")
+    parser.add_argument("--jitter", type=float, default=0.0, help="random variation of the delay in seconds")
+    parser.add_argument("--error-rate", type=float, default=0.0, help="share of the requests answered with an error")
+    parser.add_argument("--error-status", type=int, default=503, help="status code of the injected errors")
+    arguments = parser.parse_args()
+
+    server = create_server(arguments.directory, arguments.host, arguments.port, arguments.latency, arguments.jitter,
+                           arguments.error_rate, arguments.error_status)
+    print("NINA stand-in server running on http://" + arguments.host + ":" + str(server.server_address[1]))
+    try:
+        server.serve_forever()
+    except KeyboardInterrupt:
+        pass
+    finally:
+        server.server_close()
+
+
+if __name__ == '__main__':
+    main()
@@ -1,3 +1,6 @@
+import re
+
+
 def find_specific(s: str, index: int, sub_str: str) -> bool:
     """
     searches in string s, starting at index, if the next characters are sub_str
@@ -23,12 +26,18 @@ def extract_till_char(s: str, index: int, stop_char: str) -> str:
     Returns:
         The substring starting at index until the character stop_char occurs
     """
-    extracted_string = ""
-    for i in range(index, len(s)):
-        if s[i] == stop_char:
-            break
-        extracted_string += s[i]
-    return extracted_string
+    stop_index = s.find(stop_char, index)
+    if stop_index == -1:
+        return s[index:]
+    return s[index:stop_index]
+
+
+_BRACKET_PATTERN = re.compile(r"[<>]")
+_PARAGRAPH_PATTERN = re.compile(r"/(?=p)")
+"""the newline of </p> is written after the /"""
+_PARAGRAPH_OR_BREAK_PATTERN = re.compile(r"/(?=p)|b(?=r)")
+"""outside of the text <br> also ends the line, the newline is written after the b"""
+_LINK_PATTERN = re.compile(r"href=")
 
 
 def filter_html_tags(s: str) -> str:
@@ -46,13 +55,14 @@ def filter_html_tags(s: str) -> str:
 
     &nbsp; (== nonbreaking space) replaced with space
 
+    The string is read in one pass from bracket to bracket, the text between two brackets is copied as a whole
+
     Arguments:
         s: String that will be filtered. Has to be valid html code.
     Returns:
         Filtered String
     """
-    # return s
-    filtered_string = ""
+    filtered_parts = []
     opened_brackets_counter = 0
 
     link = ""  # brauchen wir um hlinks aus den html tags rauszukopieren, da wir diese eigentlich insgesamt löschen
@@ -60,33 +70,61 @@ def filter_html_tags(s: str) -> str:
 
     s = s.replace("&nbsp;", " ")
 
-    for i in range(0, len(s)):
-        c = s[i]
+    position = 0
+    for bracket in _BRACKET_PATTERN.finditer(s):
+        index = bracket.start()
+        if index > position:
+            link = _filter_part(s, position, index, opened_brackets_counter == 0, in_text, link, filtered_parts)
+            # the hyperlink is pasted after the last character of the hyperlink text, if the next tag follows
+            if opened_brackets_counter == 0 and in_text and len(link) != 0 and s[index] == "<":
+                filtered_parts.append(": " + link)
+                link = ""
 
-        if c == '<':
+        if s[index] == "<":
             in_text = False
             opened_brackets_counter += 1
+            if opened_brackets_counter == 0:
+                filtered_parts.append("<")
+        else:
+            if opened_brackets_counter == 0:
+                filtered_parts.append(">")
+                if in_text and len(link) != 0 and index + 1 < len(s) and s[index + 1] == "<":
+                    filtered_parts.append(": " + link)
+                    link = ""
+            opened_brackets_counter -= 1
+            in_text = True
+        position = index + 1
 
-        if opened_brackets_counter == 0:
-            filtered_string += c
-            if len(link) != 0 and i + 1 < len(s) and s[i + 1] == "<" and in_text:
-                filtered_string += ": " + link
-                link = ""
-
-        if find_specific(s, i, "/p"):
-            filtered_string += '\n'
+    if position < len(s):
+        _filter_part(s, position, len(s), opened_brackets_counter == 0, in_text, link, filtered_parts)
 
-        if not in_text and find_specific(s, i, "br"):
-            filtered_string += '\n'
+    return "".join(filtered_parts)
 
-        if find_specific(s, i, "href="):
-            link = extract_till_char(s, i + len("href=\""), '"')
 
-        if c == '>':
-            opened_brackets_counter -= 1
-            in_text = True
+def _filter_part(s: str, start: int, end: int, visible: bool, in_text: bool, link: str, filtered_parts: list) -> str:
+    """
+    Filters the part s[start:end] that contains no bracket into filtered_parts
 
-    return filtered_string
+    Arguments:
+        visible: True if the part is not inside of a tag, then it is copied
+        in_text: True if the last bracket was >
+        link: the last hyperlink that was found
+    Returns:
+        the last hyperlink found in the part, link if there is none
+    """
+    newline_pattern = _PARAGRAPH_PATTERN if in_text else _PARAGRAPH_OR_BREAK_PATTERN
+    copied_until = start
+    for newline in newline_pattern.finditer(s, start, end):
+        if visible:
+            filtered_parts.append(s[copied_until:newline.end()])
+            copied_until = newline.end()
+        filtered_parts.append("\n")
+    if visible:
+        filtered_parts.append(s[copied_until:end])
+
+    for link_match in _LINK_PATTERN.finditer(s, start, end):
+        link = extract_till_char(s, link_match.start() + len("href=\""), '"')
+    return link
 
 
 def expand_location_id_with_zeros(location_id: str) -> str:
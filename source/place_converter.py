@@ -1,4 +1,8 @@
-from typing import List, Union, Any, Tuple
+import threading
+import types
+from collections import OrderedDict
+from dataclasses import dataclass, replace
+from typing import List, Union, Any, Tuple, Mapping
 
 import requests
 import shapely
@@ -7,6 +11,9 @@ import geopy
 from geopy.geocoders import Nominatim
 from shapely.geometry import Polygon
 
+import data_service
+from postal_code_store import PostalCodeStore
+
 # District => Kreis
 # Place => Ort
 # Places are needed for everything besides Covid info
@@ -14,86 +21,424 @@ from shapely.geometry import Polygon
 # Districts' IDs (5 numbers) are shorter than Places' IDs (12 numbers)
 
 
-_districts_dictionary = {}
-"""dictionary district_id : str -> district_name : str """
+_UMLAUT_REPLACEMENTS = [("ä", "ae"), ("ö", "oe"), ("ü", "ue")]
 
-_places_dictionary = {}
-"""dictionary place_id : str -> place_name : str"""
 
-_postal_code_dictionary = {}
-"""dictionary postal_code: str -> [place_name : str, district_id : str, polygon_area : list[[float, float]]]"""
+def _normalize_query(text: str) -> str:
+    """
+    Returns the text in the form used for suggestion lookups: case folded (ß -> ss), umlauts written as ae, oe and ue
+    and whitespace collapsed, so "Düsseldorf", " DUESSELDORF " and "düsseldorf" are the same query
 
-_postal_place_dictionary = {}
-"""dictionary postal_code: str -> place_name : str"""
+    Arguments:
+        text (str): the given text
+    Returns:
+        normalized_text (str): the normalized text
+    """
+    normalized_text = text.casefold()
+    for umlaut, replacement in _UMLAUT_REPLACEMENTS:
+        normalized_text = normalized_text.replace(umlaut, replacement)
+    return " ".join(normalized_text.split())
 
 
-def _fill_districts_dict() -> None:
+class _SuggestionCache:
     """
-    Fills the _districts_dictionary dictionary with selected infos from
+    Bounded LRU cache for suggestion results, key (normalized query, suggestion_limit, mode) -> list[dict].
+    Every reference data snapshot has its own cache, so replacing the snapshot also invalidates the cache.
+    """
+
+    def __init__(self, max_size: int):
+        self._max_size = max_size
+        self._entries = OrderedDict()
+        self._lock = threading.Lock()
+        self._hits = 0
+        self._misses = 0
+
+    def get(self, key: tuple) -> Union[list[dict], None]:
+        """
+        Returns:
+            suggestion_dicts (list[dict]): a copy of the cached suggestions, None if the key is not cached
+        """
+        with self._lock:
+            try:
+                suggestion_dicts = self._entries[key]
+            except KeyError:
+                self._misses += 1
+                return None
+            self._entries.move_to_end(key)
+            self._hits += 1
+        return [dict(suggestion_dict) for suggestion_dict in suggestion_dicts]
+
+    def put(self, key: tuple, suggestion_dicts: list[dict]) -> None:
+        if self._max_size <= 0:
+            return
+        suggestion_dicts = [dict(suggestion_dict) for suggestion_dict in suggestion_dicts]
+        with self._lock:
+            self._entries[key] = suggestion_dicts
+            self._entries.move_to_end(key)
+            if len(self._entries) > self._max_size:
+                self._entries.popitem(last=False)
+
+    def get_statistics(self) -> dict:
+        """
+        Returns:
+            statistics (dict): {'hits', 'misses', 'hit_ratio', 'size', 'max_size'}
+        """
+        with self._lock:
+            lookups = self._hits + self._misses
+            return {'hits': self._hits, 'misses': self._misses,
+                    'hit_ratio': self._hits / lookups if lookups > 0 else 0.0,
+                    'size': len(self._entries), 'max_size': self._max_size}
+
+
+@dataclass(frozen=True)
+class _ReferenceData:
+    """
+    Immutable snapshot of all reference data. A refresh builds a new snapshot and replaces _reference_data with one
+    assignment, so a lookup that got the snapshot once (_get_reference_data) finishes against the snapshot it started
+    with.
+    """
+    districts: Mapping
+    """dictionary district_id : str -> district_name : str """
+    places: Mapping
+    """dictionary place_id : str -> place_name : str"""
+    postal_codes: PostalCodeStore
+    """dictionary-like postal_code: str -> PostalCodeRecord [place_name : str, district_id : str, polygon_area]"""
+    postal_places: Mapping
+    """dictionary-like postal_code: str -> place_name : str (view on postal_codes)"""
+    geocode_postal_codes: Mapping
+    """dictionary geocode: str -> postal_codes : list[str], empty until the reference data refresher computed it (see
+    _with_geocode_postal_codes)"""
+    normalized_districts: Mapping
+    """dictionary district_id : str -> normalized district_name : str (see _normalize_query)"""
+    normalized_places: Mapping
+    """dictionary place_id : str -> normalized place_name : str"""
+    normalized_postal_places: Mapping
+    """dictionary postal_code : str -> normalized place_name : str"""
+    suggestion_cache: _SuggestionCache
+    """cache for the suggestions computed from this snapshot"""
+
+
+def _fill_districts_dict(districts_dictionary: dict, source: str) -> None:
+    """
+    Fills the given districts dictionary with selected infos from the source, by default
     https://warnung.bund.de/assets/json/converted_corona_kreise.json
     Format: district_id -> district_name
+
+    Arguments:
+        districts_dictionary (dict): the dictionary to fill
+        source (str): url of the data set
     """
-    converted_covid_districts = requests.get('https://warnung.bund.de/assets/json/converted_corona_kreise.json').json()
+    converted_covid_districts = requests.get(source).json()
     for district_id, district_description in converted_covid_districts.items():
-        _districts_dictionary[district_id] = district_description["n"]
-
-
-_fill_districts_dict()
+        districts_dictionary[district_id] = district_description["n"]
 
 
-def _fill_places_dict() -> None:
+def _fill_places_dict(places_dictionary: dict, districts_dictionary: dict, source: str) -> None:
     """
-    Fills the _places_dictionary dictionary with selected infos from
+    Fills the given places dictionary with selected infos from the source, by default
     https://www.xrepository.de/api/xrepository/urn:de:bund:destatis:bevoelkerungsstatistik:schluessel:rs_2021-07-31
     /download/Regionalschl_ssel_2021-07-31.json
     Format: place_id -> place_name
+
+    Arguments:
+        places_dictionary (dict): the dictionary to fill
+        districts_dictionary (dict): the already filled districts dictionary
+        source (str): url of the data set
     """
-    bevoelkerungsstaat_key = requests.get(
-        'https://www.xrepository.de/api/xrepository/urn:de:bund:destatis:bevoelkerungsstatistik:schluessel:rs_2021-07'
-        '-31/download/Regionalschl_ssel_2021-07-31.json').json()
+    bevoelkerungsstaat_key = requests.get(source).json()
     for area_triple in bevoelkerungsstaat_key['daten']:
         if area_triple[2] is None:
-            _places_dictionary[area_triple[0]] = area_triple[1]
+            places_dictionary[area_triple[0]] = area_triple[1]
         else:
             possible_district_id = area_triple[0][0:5]
             try:
-                _districts_dictionary[possible_district_id]
+                districts_dictionary[possible_district_id]
             except KeyError:
                 pass
             else:
-                _places_dictionary[area_triple[0]] = area_triple[1]
+                places_dictionary[area_triple[0]] = area_triple[1]
 
 
-_fill_places_dict()
-
-
-def _fill_postal_code_dict() -> None:
+def _get_postal_code_store(source: str) -> PostalCodeStore:
     """
-    Fills the _postal_code_dictionary dictionary with selected infos from
+    Returns a PostalCodeStore with selected infos from the source, by default
     https://public.opendatasoft.com/api/records/1.0/search/?dataset=georef-germany-postleitzahl&q=&rows=-1
-    Format: postal_code : str -> [place_name : str, district_id : str, polygon_area : list[[float, float]]]
+    Format: postal_code : str -> PostalCodeRecord [place_name : str, district_id : str, polygon_area]
+
+    Arguments:
+        source (str): url of the data set
     """
-    postal_code_table = requests.get(
-        'https://public.opendatasoft.com/api/records/1.0/search/?dataset=georef-germany-postleitzahl&q=&rows=-1').json()
+    postal_code_table = requests.get(source).json()
+    records = []
     for record in postal_code_table['records']:
-        _postal_code_dictionary[record['fields']['plz_code']] = [record['fields']['plz_name'],
-                                                                 record['fields']['krs_code'],
-                                                                 record['fields']['geometry']['coordinates'][0]]
+        records.append((record['fields']['plz_code'], record['fields']['plz_name'], record['fields']['krs_code'],
+                        record['fields']['geometry']['coordinates'][0]))
+    return PostalCodeStore(records)
+
+
+def _get_district_areas(source: str) -> dict:
+    """
+    Returns the areas of the districts from the source, by default
+    https://public.opendatasoft.com/api/records/1.0/search/?dataset=georef-germany-kreis&q=&rows=-1
+    Format: district_id : str -> district_area : shapely geometry
+
+    Arguments:
+        source (str): url of the data set
+    """
+    district_table = requests.get(source).json()
+    district_areas = {}
+    for record in district_table['records']:
+        district_id = record['fields']['krs_code']
+        if isinstance(district_id, list):
+            district_id = district_id[0]
+        district_areas[district_id] = shapely.geometry.shape(record['fields']['geo_shape'])
+    return district_areas
+
+
+_MINIMUM_DISTRICT_OVERLAP = 0.01
+"""share of the area of a postal code that has to lie in a district to count as part of it, smaller overlaps are only
+differences between the borders of the two data sets"""
+
+
+def _get_district_ids_of_postal_codes(postal_codes: PostalCodeStore, district_areas: Mapping) -> dict:
+    """
+    Returns the districts every postal code overlaps with. The postal code data set only has one district per postal
+    code, but many postal code areas reach into a neighbouring district.
+    Format: postal_code : str -> district_ids : list[str]
+
+    Arguments:
+        postal_codes (PostalCodeStore): the postal code reference data
+        district_areas (Mapping): district_id : str -> district_area : shapely geometry (see _get_district_areas)
+    Returns:
+        district_ids (dict): the district of the postal code data set first, then the other overlapping districts
+    """
+    records = list(postal_codes.records())
+    polygons = [shapely.Polygon(record.rings[0], record.rings[1:]) for record in records]
+    tree = shapely.STRtree(polygons)
+    district_ids = {record.postal_code: {record.district_id: None} for record in records}
+    for district_id, district_area in district_areas.items():
+        shapely.prepare(district_area)
+        for index in tree.query(district_area, predicate="intersects"):
+            polygon = polygons[index]
+            if polygon.area > 0 \
+                    and polygon.intersection(district_area).area / polygon.area >= _MINIMUM_DISTRICT_OVERLAP:
+                district_ids[records[index].postal_code][district_id] = None
+    return {postal_code: list(district_ids_of_postal_code)
+            for postal_code, district_ids_of_postal_code in district_ids.items()}
+
+
+def _is_independent_city(district_id: str, places: Mapping) -> bool:
+    """
+    Returns:
+        True if the district is a kreisfreie Stadt: the district is its only municipality, which has the ARS of the
+        district
+    """
+    return district_id + "0000000" in places
+
+
+def _get_geocodes_for_district_id(district_id: str, places: Mapping) -> list[str]:
+    """
+    Returns the geocodes NINA uses for an area that covers the whole district (or its state or all of Germany)
+
+    Arguments:
+        district_id (str): the given district id (5 numbers)
+        places (Mapping): the places dictionary, to tell kreisfreie Städte from Landkreise
+    Returns:
+        geocodes (list[str]): ARS (12 numbers) of the district, its state and Germany, DWD warncell ids (9 numbers) of
+        the district. The municipality warncell id ("8" and the 8 numbers of the municipality) only covers the whole
+        district for a kreisfreie Stadt, for a Landkreis it is left out, so the polygons of the warning are used.
+    """
+    geocodes = [district_id + "0000000", district_id[0:2] + "0000000000", "000000000000", "1" + district_id + "000"]
+    if _is_independent_city(district_id, places):
+        geocodes.append("8" + district_id + "000")
+    return geocodes
+
+
+def _fill_geocode_postal_codes_dict(geocode_postal_codes_dictionary: dict, postal_codes: PostalCodeStore,
+                                    district_areas: Mapping, places: Mapping) -> None:
+    """
+    Fills the given geocode dictionary with selected infos from the postal codes.
+    The areas of a warning are described by geocodes: Amtliche Regionalschlüssel (ARS) or DWD warncell ids. Only the
+    geocodes of whole districts, states and Germany can be derived from the reference data, so only those are keys.
+    A postal code belongs to every district its area overlaps with, not only to the district of the postal code data
+    set, so a warning for a district reaches every postal code that reaches into the district.
+    Format: geocode : str -> postal_codes : list[str]
+
+    Arguments:
+        geocode_postal_codes_dictionary (dict): the dictionary to fill
+        postal_codes (PostalCodeStore): the postal code reference data
+        district_areas (Mapping): district_id : str -> district_area : shapely geometry (see _get_district_areas)
+        places (Mapping): the places dictionary (see _fill_places_dict)
+    """
+    district_ids = _get_district_ids_of_postal_codes(postal_codes, district_areas)
+    for postal_code, district_ids_of_postal_code in district_ids.items():
+        geocodes = {}  # dict instead of list to keep the order but skip duplicates in O(1)
+        for district_id in district_ids_of_postal_code:
+            for geocode in _get_geocodes_for_district_id(district_id, places):
+                geocodes[geocode] = None
+        for geocode in geocodes:
+            geocode_postal_codes_dictionary.setdefault(geocode, []).append(postal_code)
+
+
+def _get_normalized_dict(dictionary: Mapping) -> Mapping:
+    """
+    Returns:
+        normalized_dictionary (Mapping): read-only copy of the dictionary with normalized values (see _normalize_query)
+    """
+    return types.MappingProxyType({key: _normalize_query(value) for key, value in dictionary.items()})
+
+
+def _build_reference_data(sources: dict, suggestion_cache_size: int) -> _ReferenceData:
+    """
+    Downloads the data sets of the lookups and builds a new snapshot of the reference data, without the geocode
+    table (see _with_geocode_postal_codes)
+
+    Arguments:
+        sources (dict): urls of the data sets, keys 'districts', 'places' and 'postal_codes'
+        suggestion_cache_size (int): maximum number of cached suggestion results
+    Returns:
+        reference_data (_ReferenceData): the new snapshot
+    """
+    districts = {}
+    _fill_districts_dict(districts, sources['districts'])
+    places = {}
+    _fill_places_dict(places, districts, sources['places'])
+    postal_codes = _get_postal_code_store(sources['postal_codes'])
+    return _ReferenceData(types.MappingProxyType(districts), types.MappingProxyType(places), postal_codes,
+                          postal_codes.place_names, types.MappingProxyType({}),
+                          _get_normalized_dict(districts), _get_normalized_dict(places),
+                          _get_normalized_dict(postal_codes.place_names), _SuggestionCache(suggestion_cache_size))
 
 
-_fill_postal_code_dict()
+def _with_geocode_postal_codes(reference_data: _ReferenceData, source: str) -> _ReferenceData:
+    """
+    Downloads the district areas and intersects them with all postal code areas, which takes long, so it only runs in
+    the reference data refresher and never on a lookup. Until then the postal codes of a warning are computed from its
+    polygons.
+
+    Arguments:
+        reference_data (_ReferenceData): the snapshot the geocode table is computed for
+        source (str): url of the district areas (see _get_district_areas)
+    Returns:
+        reference_data (_ReferenceData): a copy of the snapshot with the geocode table
+    """
+    district_areas = _get_district_areas(source)
+    geocode_postal_codes = {}
+    _fill_geocode_postal_codes_dict(geocode_postal_codes, reference_data.postal_codes, district_areas,
+                                    reference_data.places)
+    return replace(reference_data, geocode_postal_codes=types.MappingProxyType(geocode_postal_codes))
+
+
+def _build_reference_data_from_config() -> _ReferenceData:
+    config = data_service.get_config()
+    return _build_reference_data(config['reference_data_sources'], config['suggestion_cache_size'])
+
+
+_reference_data: _ReferenceData = None
+"""the current snapshot, built on the first lookup (not on import, so importing this module downloads nothing) and only
+replaced as a whole by refresh_reference_data"""
+_reference_data_lock = threading.Lock()
+
+
+def _get_reference_data() -> _ReferenceData:
+    """
+    Returns:
+        reference_data (_ReferenceData): the current snapshot, the first call downloads the data sets
+    """
+    global _reference_data
+    reference_data = _reference_data
+    if reference_data is None:
+        with _reference_data_lock:
+            if _reference_data is None:
+                _reference_data = _build_reference_data_from_config()
+            reference_data = _reference_data
+    return reference_data
+
+_refresh_requested = threading.Event()
+
+
+_REFERENCE_DATA_ERRORS = (requests.exceptions.RequestException, ValueError, KeyError, TypeError, IndexError,
+                          shapely.errors.GEOSException)
+
 
+def refresh_reference_data() -> bool:
+    """
+    Downloads all data sets again and replaces the reference data, including the geocode table. Lookups keep working
+    on the old snapshot while the new one is built. If a download fails the old snapshot stays in use.
+
+    Returns:
+        success (bool): True if the reference data was replaced
+    """
+    global _reference_data
+    try:
+        district_areas_source = data_service.get_config()['reference_data_sources']['district_areas']
+        new_reference_data = _with_geocode_postal_codes(_build_reference_data_from_config(), district_areas_source)
+    except _REFERENCE_DATA_ERRORS as e:
+        print("ERROR: could not refresh the reference data, keeping the old one: " + str(e))
+        return False
+    with _reference_data_lock:
+        old_reference_data = _reference_data
+        _reference_data = new_reference_data
+    if old_reference_data is not None:
+        old_cache_statistics = old_reference_data.suggestion_cache.get_statistics()
+        print("Reference data refreshed: " + str(len(new_reference_data.postal_codes)) + " postal codes, "
+              + "suggestion cache hit ratio before the refresh: " + str(round(old_cache_statistics['hit_ratio'], 3)))
+    return True
+
+
+def request_reference_data_refresh() -> None:
+    """
+    Wakes up the reference data refresher to refresh the reference data now (see init_reference_data_refresher)
+    """
+    _refresh_requested.set()
 
-def _fill_postal_place_dict() -> None:
+
+def _add_geocode_postal_codes() -> bool:
     """
-    Fills the _postal_name_dictionary dictionary with selected infos from _postal_code_dictionary
-    Format: postal_code : str -> place_name : str
+    Computes the geocode table of the current snapshot, which is built without it on the first lookup
+
+    Returns:
+        success (bool): True if the snapshot was replaced by one with the geocode table
     """
-    for record in _postal_code_dictionary:
-        _postal_place_dictionary[record] = _postal_code_dictionary[record][0]
+    global _reference_data
+    reference_data = _get_reference_data()
+    try:
+        district_areas_source = data_service.get_config()['reference_data_sources']['district_areas']
+        new_reference_data = _with_geocode_postal_codes(reference_data, district_areas_source)
+    except _REFERENCE_DATA_ERRORS as e:
+        print("ERROR: could not compute the postal codes of the geocodes, using the polygons of the warnings: "
+              + str(e))
+        return False
+    with _reference_data_lock:
+        # a refresh in the meantime already brought its own geocode table
+        if _reference_data is not reference_data:
+            return False
+        _reference_data = new_reference_data
+    print("Postal codes of " + str(len(new_reference_data.geocode_postal_codes)) + " geocodes computed")
+    return True
 
 
-_fill_postal_place_dict()
+def _start_reference_data_refresher_loop() -> None:
+    """
+    Computes the geocode table of the first snapshot, then refreshes the reference data every
+    reference_data_refresh_interval_in_seconds (config.json) and whenever a refresh is requested. An interval of 0
+    disables the timer, then only requested refreshes happen.
+    """
+    _add_geocode_postal_codes()
+    while True:
+        refresh_interval = data_service.get_config()['reference_data_refresh_interval_in_seconds']
+        _refresh_requested.wait(timeout=refresh_interval if refresh_interval > 0 else None)
+        _refresh_requested.clear()
+        refresh_reference_data()
+
+
+def init_reference_data_refresher():
+    """
+    This method will be called when the bot is initialized
+    """
+    print("Initializing Reference Data Refresher")
+    refresher_thread = threading.Thread(target=_start_reference_data_refresher_loop)
+    refresher_thread.start()
 
 
 def _get_exact_address_from_coordinates(latitude: float, longitude: float) -> Tuple[str, str]:
@@ -109,46 +454,58 @@ def _get_exact_address_from_coordinates(latitude: float, longitude: float) -> Tu
     return place_name, postal_code
 
 
-def _get_suggestions_for_place_name(place_name: str, suggestion_limit: int) -> list[dict]:
+def _get_suggestions_for_place_name(place_name: str, suggestion_limit: int,
+                                    reference_data: _ReferenceData = None) -> list[dict]:
     """
     Returns a list of dicts {'place_name', 'place_id'} with suggestions for the given place name
 
     Arguments:
         place_name (str): the given place name
         suggestion_limit (int): limits the number of suggestions to the top x
+        reference_data (_ReferenceData): the snapshot to use, the current one by default
     Returns:
         similar_places_dicts (list[dict]): list of suggested dicts
     """
-    similar_place_names = process.extract(place_name, _places_dictionary, limit=suggestion_limit)
+    if reference_data is None:
+        reference_data = _get_reference_data()
+    similar_place_names = process.extract(_normalize_query(place_name), reference_data.normalized_places,
+                                          limit=suggestion_limit)
     similar_places_dicts = []
     for place_info in similar_place_names:
-        similar_place_dict = {'place_name': place_info[0], 'place_id': place_info[2]}
+        similar_place_dict = {'place_name': reference_data.places[place_info[2]], 'place_id': place_info[2]}
         similar_places_dicts.append(similar_place_dict)
     return similar_places_dicts
 
 
-def _get_suggestion_dicts_for_non_covid_place_name(place_name: str, suggestion_limit: int) -> list[dict]:
+def _get_suggestion_dicts_for_non_covid_place_name(place_name: str, suggestion_limit: int,
+                                                   reference_data: _ReferenceData = None) -> list[dict]:
     """
     Returns a list of dicts {'place_name', 'postal_code'} with suggestions for the given place name
 
     Arguments:
         place_name (str): the given place name
         suggestion_limit (int): limits the number of suggestions to the top x
+        reference_data (_ReferenceData): the snapshot to use, the current one by default
     Returns:
         similar_places_dicts (list[dict]): list of suggested dicts
     """
-    similar_place_names = process.extract(place_name, _postal_place_dictionary, limit=suggestion_limit)
+    if reference_data is None:
+        reference_data = _get_reference_data()
+    similar_place_names = process.extract(_normalize_query(place_name), reference_data.normalized_postal_places,
+                                          limit=suggestion_limit)
     similar_places_dicts = []
     for place_info in similar_place_names:
-        district_id = _postal_code_dictionary[place_info[2]][1]
-        district_name = _districts_dictionary[district_id]
-        similar_place_dict = {'place_name': place_info[0], 'postal_code': place_info[2], 'district_id': district_id,
-                              'district_name': district_name}
+        record = reference_data.postal_codes[place_info[2]]
+        district_id = record.district_id
+        district_name = reference_data.districts[district_id]
+        similar_place_dict = {'place_name': record.place_name, 'postal_code': place_info[2],
+                              'district_id': district_id, 'district_name': district_name}
         similar_places_dicts.append(similar_place_dict)
     return similar_places_dicts
 
 
-def _get_place_dict_suggestions(place_name: str, suggestion_limit: int) -> list[dict]:
+def _get_place_dict_suggestions(place_name: str, suggestion_limit: int,
+                                reference_data: _ReferenceData = None) -> list[dict]:
     """
     Returns a list of dicts {'place_name', 'place_id', 'district_name', 'district_id'} with suggestions for the given
     place name
@@ -156,37 +513,47 @@ def _get_place_dict_suggestions(place_name: str, suggestion_limit: int) -> list[
     Arguments:
         place_name (str): the given place name
         suggestion_limit (int): limits the number of suggestions to the top x
+        reference_data (_ReferenceData): the snapshot to use, the current one by default
     Returns:
         place_dict_suggestions (list[dict]): list of suggested dicts
     """
-    place_dict_suggestions = _get_suggestions_for_place_name(place_name, suggestion_limit)
+    if reference_data is None:
+        reference_data = _get_reference_data()
+    place_dict_suggestions = _get_suggestions_for_place_name(place_name, suggestion_limit, reference_data)
 
     for place in place_dict_suggestions:
         district_id = place['place_id'][0:5]
-        place['district_name'] = _districts_dictionary[district_id]
+        place['district_name'] = reference_data.districts[district_id]
         place['district_id'] = district_id
     return place_dict_suggestions
 
 
-def _get_suggestions_for_district_name(district_name: str, suggestion_limit: int) -> list[dict]:
+def _get_suggestions_for_district_name(district_name: str, suggestion_limit: int,
+                                       reference_data: _ReferenceData = None) -> list[dict]:
     """
     Returns a list of dicts {'district_name', 'district_id'} with suggestions for the given district name
 
     Arguments:
         district_name (str): the given district name
         suggestion_limit (int): limits the number of suggestions to the top x
+        reference_data (_ReferenceData): the snapshot to use, the current one by default
     Returns:
         similar_districts_dicts (list[dict]): list of suggested dicts
     """
-    similar_district_names = process.extract(district_name, _districts_dictionary, limit=suggestion_limit)
+    if reference_data is None:
+        reference_data = _get_reference_data()
+    similar_district_names = process.extract(_normalize_query(district_name), reference_data.normalized_districts,
+                                             limit=suggestion_limit)
     similar_districts_dicts = []
     for district_info in similar_district_names:
-        similar_district_dict = {'district_name': district_info[0], 'district_id': district_info[2]}
+        similar_district_dict = {'district_name': reference_data.districts[district_info[2]],
+                                 'district_id': district_info[2]}
         similar_districts_dicts.append(similar_district_dict)
     return similar_districts_dicts
 
 
-def _get_district_dict_suggestions(district_name: str, suggestion_limit: int) -> list[dict]:
+def _get_district_dict_suggestions(district_name: str, suggestion_limit: int,
+                                   reference_data: _ReferenceData = None) -> list[dict]:
     """
     Returns a list of dicts {'place_name', 'place_id', 'district_name', 'district_id'} with suggestions for the given
     district name
@@ -194,15 +561,18 @@ def _get_district_dict_suggestions(district_name: str, suggestion_limit: int) ->
     Arguments:
         district_name (str): the given district name
         suggestion_limit (int): limits the number of suggestions to the top x
+        reference_data (_ReferenceData): the snapshot to use, the current one by default
     Returns:
         district_dict_suggestions (list[dict]): list of suggested dicts, dict['place_name'] can be None
     """
-    district_dict_suggestions = _get_suggestions_for_district_name(district_name, suggestion_limit)
+    if reference_data is None:
+        reference_data = _get_reference_data()
+    district_dict_suggestions = _get_suggestions_for_district_name(district_name, suggestion_limit, reference_data)
 
     for district in district_dict_suggestions:
         place_id = district['district_id'] + "0000000"
         try:
-            place_name = _places_dictionary[place_id]
+            place_name = reference_data.places[place_id]
         except KeyError:
             district['place_name'] = None
         else:
@@ -211,7 +581,8 @@ def _get_district_dict_suggestions(district_name: str, suggestion_limit: int) ->
     return district_dict_suggestions
 
 
-def _get_place_and_district_dict_suggestions(name: str, suggestion_limit: int) -> list[dict]:
+def _get_place_and_district_dict_suggestions(name: str, suggestion_limit: int,
+                                             reference_data: _ReferenceData = None) -> list[dict]:
     """
     Returns a list of dicts {'place_name', 'place_id', 'district_name', 'district_id'} with suggestions for the given
     district or place name
@@ -219,11 +590,14 @@ def _get_place_and_district_dict_suggestions(name: str, suggestion_limit: int) -
     Arguments:
         name (str): the given name
         suggestion_limit (int): limits the number of suggestions to the top x
+        reference_data (_ReferenceData): the snapshot to use, the current one by default
     Returns:
         dict_suggestions (list[dict]): list of suggested dicts
     """
-    district_dict_suggestions = _get_district_dict_suggestions(name, suggestion_limit)
-    place_dict_suggestions = _get_place_dict_suggestions(name, suggestion_limit)
+    if reference_data is None:
+        reference_data = _get_reference_data()
+    district_dict_suggestions = _get_district_dict_suggestions(name, suggestion_limit, reference_data)
+    place_dict_suggestions = _get_place_dict_suggestions(name, suggestion_limit, reference_data)
     for place_dict in place_dict_suggestions:
         for district_dict in district_dict_suggestions:
             if place_dict['place_id'] == district_dict['place_id']:
@@ -232,7 +606,8 @@ def _get_place_and_district_dict_suggestions(name: str, suggestion_limit: int) -
     return dict_suggestions
 
 
-def _get_dicts_for_postal_code(postal_code: str, suggestion_limit: int) -> list[dict]:
+def _get_dicts_for_postal_code(postal_code: str, suggestion_limit: int,
+                               reference_data: _ReferenceData = None) -> list[dict]:
     """
     Returns a list of dicts {'place_name', 'place_id', 'district_name', 'district_id', 'postal_code'} that fit the place
     name and district id of given postal code (is not 100% accurate)
@@ -240,18 +615,21 @@ def _get_dicts_for_postal_code(postal_code: str, suggestion_limit: int) -> list[
     Arguments:
         postal_code (str): the given postal code
         suggestion_limit (int): limits the number of suggestions to the top x
+        reference_data (_ReferenceData): the snapshot to use, the current one by default
     Returns:
         place_dict_suggestions (list[dict]): list of dicts with fitting suggested place name and district id
     """
+    if reference_data is None:
+        reference_data = _get_reference_data()
     try:
-        record = _postal_code_dictionary[postal_code]
+        record = reference_data.postal_codes[postal_code]
     except KeyError:
         return []  # no postal code found
     else:
         place_name = record[0]
         district_id = record[1]
 
-    unfiltered_place_dict_suggestions = _get_place_dict_suggestions(place_name, suggestion_limit)
+    unfiltered_place_dict_suggestions = _get_place_dict_suggestions(place_name, suggestion_limit, reference_data)
     place_dict_suggestions = []
     for place_dict in unfiltered_place_dict_suggestions:
         if place_dict['district_id'] == district_id:
@@ -269,21 +647,21 @@ def get_name_for_id(given_id: str) -> Any:
        Returns:
            name (str): the place or district name of the given ID, can be None if not found
        """
-
+    reference_data = _get_reference_data()
     if len(given_id) == 5:  # district id
         try:
-            district_name = _districts_dictionary[given_id]
+            district_name = reference_data.districts[given_id]
         except KeyError:
             return None
         else:
             return district_name
     elif given_id[5:12] == '0000000':  # could still be only a district id
         try:
-            place_name = _places_dictionary[given_id]
+            place_name = reference_data.places[given_id]
         except KeyError:
             try:
                 given_id = given_id[0:5]
-                district_name = _districts_dictionary[given_id]
+                district_name = reference_data.districts[given_id]
             except KeyError:
                 return None
             else:
@@ -292,7 +670,7 @@ def get_name_for_id(given_id: str) -> Any:
             return place_name
     else:  # place id
         try:
-            place_name = _places_dictionary[given_id]
+            place_name = reference_data.places[given_id]
         except KeyError:
             return None
         else:
@@ -308,12 +686,13 @@ def get_dicts_for_exact_district_name(district_name: str) -> list[dict]:
     Returns:
         district_dicts (list[dict]): list of dicts, can be empty
     """
+    reference_data = _get_reference_data()
     district_dicts = []
-    for district_id in _districts_dictionary.keys():
-        if _districts_dictionary[district_id] == district_name:
+    for district_id in reference_data.districts.keys():
+        if reference_data.districts[district_id] == district_name:
             place_id = district_id + "0000000"
             try:
-                place_name = _places_dictionary[place_id]
+                place_name = reference_data.places[place_id]
             except KeyError:
                 place_name = None
             district_dict = {'place_name': place_name, 'place_id': place_id, 'district_name': district_name,
@@ -331,17 +710,42 @@ def get_dicts_for_exact_place_name(place_name: str) -> list[dict]:
     Returns:
         matching_place_dicts (list[dict]): list of suggested dicts
     """
+    reference_data = _get_reference_data()
     matching_place_dicts = []
-    for place_id in _places_dictionary.keys():
-        if _places_dictionary[place_id] == place_name:
+    for place_id in reference_data.places.keys():
+        if reference_data.places[place_id] == place_name:
             district_id = place_id[0:5]
-            district_name = _districts_dictionary[district_id]
+            district_name = reference_data.districts[district_id]
             place_dict = {'place_name': place_name, 'place_id': place_id, 'district_name': district_name,
                           'district_id': district_id}
             matching_place_dicts.append(place_dict)
     return matching_place_dicts
 
 
+def _get_postal_code_dicts_with_prefix(prefix: str, suggestion_limit: int,
+                                       reference_data: _ReferenceData = None) -> list[dict]:
+    """
+    Returns a list of dicts {'postal_code', 'place_name', 'district_name', 'district_id'} of all postal codes starting
+    with the given prefix
+
+    Arguments:
+        prefix (str): the beginning of the postal code
+        suggestion_limit (int): limits the number of suggestions to the first x postal codes
+        reference_data (_ReferenceData): the snapshot to use, the current one by default
+    Returns:
+        postal_dicts (list[dict]): list of dicts sorted by postal code, can be empty
+    """
+    if reference_data is None:
+        reference_data = _get_reference_data()
+    postal_dicts = []
+    for record in reference_data.postal_codes.records_with_prefix(prefix, suggestion_limit):
+        district_id = record.district_id
+        postal_dict = {'postal_code': record.postal_code, 'place_name': record.place_name,
+                       'district_name': reference_data.districts[district_id], 'district_id': district_id}
+        postal_dicts.append(postal_dict)
+    return postal_dicts
+
+
 def get_dict_suggestions(given_string: str, suggestion_limit=11) -> list[dict]:
     """
     Returns a list of dicts {'place_name', 'place_id', 'district_name', 'district_id'} with suggestions for the given
@@ -353,16 +757,26 @@ def get_dict_suggestions(given_string: str, suggestion_limit=11) -> list[dict]:
     Returns:
         dict_suggestions (list[dict]): list of suggested dicts
     """
-    if given_string.isnumeric():
-        return _get_dicts_for_postal_code(given_string, suggestion_limit)
+    reference_data = _get_reference_data()
+    query = _normalize_query(given_string)
+    cache_key = (query, suggestion_limit, "covid")
+    dict_suggestions = reference_data.suggestion_cache.get(cache_key)
+    if dict_suggestions is not None:
+        return dict_suggestions
+
+    if query.isnumeric():
+        dict_suggestions = _get_dicts_for_postal_code(query, suggestion_limit, reference_data)
     else:
-        return _get_place_and_district_dict_suggestions(given_string, suggestion_limit)
+        dict_suggestions = _get_place_and_district_dict_suggestions(query, suggestion_limit, reference_data)
+    reference_data.suggestion_cache.put(cache_key, dict_suggestions)
+    return dict_suggestions
 
 
 def get_non_covid_dict_suggestions(given_string: str, suggestion_limit=11) -> list[dict]:
     """
     Returns a list of dicts {'place_name', 'postal_code', 'district_id', 'district_name'} with suggestions for the given
-    place name (alphabetic string) or postal code (numeric string)
+    place name (alphabetic string) or postal code (numeric string, an incomplete postal code gives all postal codes
+    starting with it)
 
     Arguments:
         given_string (str): the given name or postal code
@@ -370,19 +784,37 @@ def get_non_covid_dict_suggestions(given_string: str, suggestion_limit=11) -> li
     Returns:
         dict_suggestions (list[dict]): list of suggested dicts
     """
-    if given_string.isnumeric():
+    reference_data = _get_reference_data()
+    query = _normalize_query(given_string)
+    cache_key = (query, suggestion_limit, "non_covid")
+    dict_suggestions = reference_data.suggestion_cache.get(cache_key)
+    if dict_suggestions is not None:
+        return dict_suggestions
+
+    if query.isnumeric():
         try:
-            record = _postal_code_dictionary[given_string]
+            record = reference_data.postal_codes[query]
         except KeyError:
-            return []
+            # incomplete postal code like "642"
+            dict_suggestions = _get_postal_code_dicts_with_prefix(query, suggestion_limit, reference_data)
         else:
-            dict_list = []
-            postal_dict = {'postal_code': given_string, 'place_name': record[0],
-                           'district_name': _districts_dictionary[record[1]], 'district_id': record[1]}
-            dict_list.append(postal_dict)
-            return dict_list
+            postal_dict = {'postal_code': query, 'place_name': record[0],
+                           'district_name': reference_data.districts[record[1]], 'district_id': record[1]}
+            dict_suggestions = [postal_dict]
     else:
-        return _get_suggestion_dicts_for_non_covid_place_name(given_string, suggestion_limit)
+        dict_suggestions = _get_suggestion_dicts_for_non_covid_place_name(query, suggestion_limit, reference_data)
+    reference_data.suggestion_cache.put(cache_key, dict_suggestions)
+    return dict_suggestions
+
+
+def get_suggestion_cache_statistics() -> dict:
+    """
+    Returns the statistics of the suggestion cache of the current reference data (reset by every refresh)
+
+    Returns:
+        statistics (dict): {'hits', 'misses', 'hit_ratio', 'size', 'max_size'}
+    """
+    return _get_reference_data().suggestion_cache.get_statistics()
 
 
 def get_place_name_from_dict(dictionary: dict) -> Any:
@@ -476,13 +908,14 @@ def get_non_covid_dict_from_coordinates(latitude: float, longitude: float) -> di
     Returns:
         postal_dict (dict): dict that fits the infos
     """
+    reference_data = _get_reference_data()
     place_tuple = _get_exact_address_from_coordinates(latitude, longitude)
 
     postal_code = place_tuple[1]
-    record = _postal_code_dictionary[postal_code]
+    record = reference_data.postal_codes[postal_code]
 
     postal_dict = {'postal_code': postal_code, 'place_name': record[0],
-                   'district_name': _districts_dictionary[record[1]], 'district_id': record[1]}
+                   'district_name': reference_data.districts[record[1]], 'district_id': record[1]}
 
     return postal_dict
 
@@ -497,24 +930,61 @@ def get_postal_code_dicts_in_polygon(coordinate_list: list) -> list[dict]:
         Returns:
             list_of_matches (list[dict]): list of dicts that fit the infos, can be empty if no match is found
         """
-
+    reference_data = _get_reference_data()
     list_of_matches = []
     polygon = shapely.Polygon(coordinate_list)
-    for place in _postal_code_dictionary:
-        place_coordinates = _postal_code_dictionary[place][2]
-        place_poly = shapely.Polygon(place_coordinates)
+    for record in reference_data.postal_codes.records():
+        place_rings = record.rings
+        place_poly = shapely.Polygon(place_rings[0], place_rings[1:])
 
         if polygon.intersects(place_poly):
             intersections = polygon.intersection(place_poly)
             if not isinstance(intersections, shapely.geometry.multilinestring.MultiLineString):
-                district_id = _postal_code_dictionary[place][1]
-                district_name = _districts_dictionary[district_id]
-                matching_dict = {'postal_code': place, 'place_name': _postal_code_dictionary[place][0],
+                district_id = record.district_id
+                district_name = reference_data.districts[district_id]
+                matching_dict = {'postal_code': record.postal_code, 'place_name': record.place_name,
                                  'district_id': district_id, 'district_name': district_name}
                 list_of_matches.append(matching_dict)
     return list_of_matches
 
 
+def get_postal_code_store() -> PostalCodeStore:
+    """
+    Returns the postal code reference data, for example for postal_code_mapper. A refresh of the reference data
+    replaces it with a new store, the returned one is never changed.
+
+    Returns:
+        postal_codes (PostalCodeStore): the postal codes of the current reference data
+    """
+    return _get_reference_data().postal_codes
+
+
+def get_postal_codes_for_geocodes(geocodes: list[str]) -> Union[list[str], None]:
+    """
+    Returns the postal codes of the areas described by the given geocodes (ARS or DWD warncell ids), without any
+    polygon computation.
+
+    Arguments:
+        geocodes (list[str]): the geocodes of a warning (DetailedWarningInfoArea.geocode)
+    Returns:
+        postal_codes (list[str]): postal codes of all given geocodes, None if the list is empty, at least one geocode
+        is unknown or the geocode table is not computed yet (then the polygons of the warning have to be used)
+    """
+    reference_data = _get_reference_data()
+    if len(geocodes) == 0:
+        return None
+
+    postal_codes = {}  # dict instead of list to keep the order but skip duplicates in O(1)
+    for geocode in geocodes:
+        try:
+            postal_codes_for_geocode = reference_data.geocode_postal_codes[geocode]
+        except (KeyError, TypeError):
+            return None
+        for postal_code in postal_codes_for_geocode:
+            postal_codes[postal_code] = None
+    return list(postal_codes)
+
+
 def get_place_name_for_postal_code(postal_code: str) -> str:
     """
     Returns the place name matching the postal code.
@@ -524,7 +994,7 @@ def get_place_name_for_postal_code(postal_code: str) -> str:
     Returns:
         place_name (str): the place name matching the postal code
     """
-    return _postal_place_dictionary[postal_code]
+    return _get_reference_data().postal_places[postal_code]
 
 
 def get_district_name_for_district_id(district_id: str) -> str:
@@ -536,4 +1006,4 @@ def get_district_name_for_district_id(district_id: str) -> str:
     Returns:
         district_name (str): the district name matching the district id
     """
-    return _districts_dictionary[district_id]
+    return _get_reference_data().districts[district_id]
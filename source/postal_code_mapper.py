@@ -0,0 +1,149 @@
+import multiprocessing
+import os
+import threading
+from concurrent.futures import Future, ProcessPoolExecutor
+from concurrent.futures.process import BrokenProcessPool
+
+import numpy
+import shapely
+
+import data_service
+from postal_code_store import PostalCodeStore
+
+# Finding the postal codes in the polygons of a warning is CPU bound in shapely, so it runs on a pool of processes
+# instead of the threads of the bot. Every worker builds the polygons of all postal codes and a spatial index of them
+# once, when it starts, from the PostalCodeStore of the reference data (pickled once per worker). After that a worker
+# only gets the id and the rings of a warning and returns the postal codes, the warning handler writes them into
+# active_warnings.json. When the reference data is refreshed, the pool is started again with the new store.
+# The workers are spawned, not forked: the bot has many threads, a fork would copy locks that are held by one of them
+# at that moment (logging, the connection pools of requests, the locks of data_service) and a worker that needs such a
+# lock would wait forever. A spawned worker only has what _init_worker gets. It imports the main script (bot_runner)
+# again, so the script only starts the bot under if __name__ == '__main__' and place_converter only downloads the
+# reference data on the first lookup, not on import.
+
+_MULTIPROCESSING_CONTEXT = multiprocessing.get_context("spawn")
+
+
+class _PostalCodeIndex:
+    """
+    The polygons of all postal codes of a PostalCodeStore and a spatial index of them
+    """
+
+    def __init__(self, store: PostalCodeStore):
+        """
+        Arguments:
+            store (PostalCodeStore): the postal code reference data
+        """
+        self._postal_codes = [record.postal_code for record in store.records()]
+        self._polygons = [shapely.Polygon(record.rings[0], record.rings[1:]) for record in store.records()]
+        shapely.prepare(self._polygons)
+        self._tree = shapely.STRtree(self._polygons)
+
+    def get_postal_codes_in_rings(self, rings: list[numpy.ndarray]) -> list[str]:
+        """
+        Returns the postal codes whose polygons overlap with the rings, like place_converter.
+        get_postal_code_dicts_in_polygon for every ring. Postal codes that only touch a ring along a border of more than
+        one line are left out.
+
+        Arguments:
+            rings (list[numpy.ndarray]): every ring is a polygon on its own, as (n, 2) array
+        Returns:
+            postal_codes (list[str]): the postal codes in the order of the rings and then of the postal codes, without
+            duplicates
+        """
+        postal_codes = {}  # dict instead of list to keep the order but skip duplicates in O(1)
+        for ring in rings:
+            polygon = shapely.Polygon(ring)
+            # the tree only compares the bounding boxes, the candidates are checked like before
+            for index in sorted(self._tree.query(polygon)):
+                place_polygon = self._polygons[index]
+                if polygon.intersects(place_polygon):
+                    intersections = polygon.intersection(place_polygon)
+                    if not isinstance(intersections, shapely.MultiLineString):
+                        postal_codes[self._postal_codes[index]] = None
+        return list(postal_codes)
+
+
+_worker_index: _PostalCodeIndex = None
+"""the index of the worker process, built by _init_worker"""
+
+
+def _init_worker(store: PostalCodeStore):
+    global _worker_index
+    _worker_index = _PostalCodeIndex(store)
+
+
+def _get_postal_codes_in_rings(warning_id: str, rings: list[numpy.ndarray]) -> tuple[str, list[str]]:
+    """
+    Runs in a worker process
+
+    Returns:
+        warning_id (str) and postal_codes (list[str]): the postal codes of the rings
+    """
+    return warning_id, _worker_index.get_postal_codes_in_rings(rings)
+
+
+_executor: ProcessPoolExecutor = None
+_executor_store: PostalCodeStore = None
+"""the store the workers of _executor were started with"""
+_executor_lock = threading.Lock()
+
+
+def get_worker_count() -> int:
+    """
+    Returns:
+        worker_count (int): postal_code_mapping_processes of config.json, the number of CPU cores if that is 0
+    """
+    worker_count = data_service.get_config()['postal_code_mapping_processes']
+    if worker_count <= 0:
+        return os.cpu_count() or 1
+    return worker_count
+
+
+def _get_executor(store: PostalCodeStore, replace: bool = False) -> ProcessPoolExecutor:
+    """
+    Arguments:
+        store (PostalCodeStore): the postal code reference data the workers have to use
+        replace (bool): True if the pool is broken, for example because a worker was killed
+    Returns:
+        executor (ProcessPoolExecutor): the pool of processes, started again if the store changed
+    """
+    global _executor, _executor_store
+    with _executor_lock:
+        if _executor is None or _executor_store is not store or replace:
+            if _executor is not None:
+                _executor.shutdown(wait=False)
+            _executor = ProcessPoolExecutor(max_workers=get_worker_count(), mp_context=_MULTIPROCESSING_CONTEXT,
+                                            initializer=_init_worker, initargs=(store,))
+            _executor_store = store
+        return _executor
+
+
+def submit(store: PostalCodeStore, warning_id: str, rings: list[numpy.ndarray]) -> Future:
+    """
+    Computes the postal codes of the rings of a warning in a worker process
+
+    Arguments:
+        store (PostalCodeStore): the postal code reference data, place_converter.get_postal_code_store()
+        warning_id (str): id of the warning, returned with the result
+        rings (list[numpy.ndarray]): the rings of the polygons of the warning (GeoCoordinates.get_rings)
+    Returns:
+        future (Future): its result is the tuple warning_id (str), postal_codes (list[str])
+    """
+    try:
+        return _get_executor(store).submit(_get_postal_codes_in_rings, warning_id, rings)
+    except BrokenProcessPool:
+        print("ERROR: the postal code mapping processes broke down, starting them again")
+        return _get_executor(store, replace=True).submit(_get_postal_codes_in_rings, warning_id, rings)
+
+
+def shutdown():
+    """
+    Stops the worker processes, they are started again with the next submit
+    """
+    global _executor, _executor_store
+    with _executor_lock:
+        if _executor is not None:
+            _executor.shutdown()
+        _executor = None
+        _executor_store = None
@@ -0,0 +1,233 @@
+from collections.abc import Mapping
+from typing import Iterator
+
+import numpy
+
+# The postal code reference data contains one polygon per postal code. Kept as nested Python lists every coordinate
+# costs a list object and two float objects (~120 bytes). Here all coordinates of all postal codes share one float64
+# buffer (16 bytes per coordinate) with offset arrays for the rings. Postal codes, place names and district ids are
+# numpy string arrays as well (names and district ids stored once and referenced by index), so no Python object of the
+# parsed json is kept alive and the memory of the json can be given back completely.
+
+
+class PostalCodeRecord:
+    """
+    Read-only view on one postal code of a PostalCodeStore.
+    Can be used like the list [place_name, district_id, polygon_area] that was stored per postal code before.
+    """
+    __slots__ = ("_store", "_index")
+
+    def __init__(self, store: "PostalCodeStore", index: int):
+        self._store = store
+        self._index = index
+
+    @property
+    def postal_code(self) -> str:
+        return str(self._store._postal_codes[self._index])
+
+    @property
+    def place_name(self) -> str:
+        return str(self._store._names[self._store._name_indices[self._index]])
+
+    @property
+    def district_id(self) -> str:
+        return str(self._store._district_ids[self._store._district_indices[self._index]])
+
+    @property
+    def rings(self) -> list[numpy.ndarray]:
+        """
+        Returns:
+            rings (list[numpy.ndarray]): shell (and holes) of the polygon as (n, 2) arrays, these are read-only views
+            on the shared buffer
+        """
+        return self._store._get_rings(self._index)
+
+    @property
+    def polygon_area(self) -> list:
+        """
+        Returns:
+            polygon_area (list): the coordinates as nested lists, in the same format they were given to the store
+        """
+        rings = [ring.tolist() for ring in self.rings]
+        if self._store._is_nested[self._index]:
+            return rings
+        return rings[0]
+
+    def __getitem__(self, item: int):
+        if item == 0 or item == -3:
+            return self.place_name
+        if item == 1 or item == -2:
+            return self.district_id
+        if item == 2 or item == -1:
+            return self.polygon_area
+        raise IndexError("PostalCodeRecord index out of range")
+
+    def __len__(self) -> int:
+        return 3
+
+    def __iter__(self) -> Iterator:
+        return iter((self.place_name, self.district_id, self.polygon_area))
+
+    def __eq__(self, other) -> bool:
+        if isinstance(other, (PostalCodeRecord, list, tuple)):
+            return list(self) == list(other)
+        return NotImplemented
+
+    def __repr__(self) -> str:
+        return "PostalCodeRecord(" + repr(self.postal_code) + ", " + repr(self.place_name) + ", " \
+               + repr(self.district_id) + ")"
+
+
+class _PostalPlaceView(Mapping):
+    """
+    dictionary-like view postal_code: str -> place_name : str on a PostalCodeStore (nothing is copied)
+    """
+
+    def __init__(self, store: "PostalCodeStore"):
+        self._store = store
+
+    def __getitem__(self, postal_code: str) -> str:
+        index = self._store._get_index(postal_code)
+        return str(self._store._names[self._store._name_indices[index]])
+
+    def __iter__(self) -> Iterator[str]:
+        return iter(self._store)
+
+    def __len__(self) -> int:
+        return len(self._store)
+
+
+class PostalCodeStore(Mapping):
+    """
+    Columnar, read-only store of the postal code reference data, sorted by postal code.
+    dictionary-like: postal_code: str -> PostalCodeRecord
+    """
+
+    def __init__(self, records: list[tuple[str, str, str, list]]):
+        """
+        Arguments:
+            records (list[tuple]): (postal_code, place_name, district_id, polygon_area) per postal code,
+                polygon_area is either one ring list[[float, float]] or a list of rings (shell and holes)
+        """
+        postal_codes = []
+        names = {}
+        name_indices = []
+        district_ids = {}
+        district_indices = []
+        is_nested = []
+        ring_offsets = [0]
+        record_ring_offsets = [0]
+        rings = []
+
+        for postal_code, place_name, district_id, polygon_area in sorted(records, key=lambda record: record[0]):
+            postal_codes.append(postal_code)
+            name_indices.append(names.setdefault(place_name, len(names)))
+            district_indices.append(district_ids.setdefault(district_id, len(district_ids)))
+
+            # this check is needed because the polygon can be a ring or a list of rings (shell and holes)
+            nested = len(polygon_area) > 0 and isinstance(polygon_area[0][0], list)
+            is_nested.append(nested)
+            for ring in (polygon_area if nested else [polygon_area]):
+                ring_array = numpy.asarray(ring, dtype=numpy.float64)[:, 0:2]  # (n, 2), drops a possible height
+                rings.append(ring_array)
+                ring_offsets.append(ring_offsets[-1] + len(ring_array))
+            record_ring_offsets.append(len(rings))
+
+        if len(rings) > 0:
+            self._coordinates = numpy.concatenate(rings)
+        else:
+            self._coordinates = numpy.empty((0, 2), dtype=numpy.float64)
+        self._coordinates.flags.writeable = False
+        self._ring_offsets = numpy.asarray(ring_offsets, dtype=numpy.int64)
+        self._record_ring_offsets = numpy.asarray(record_ring_offsets, dtype=numpy.int32)
+        self._postal_codes = numpy.asarray(postal_codes, dtype=str)
+        self._names = numpy.asarray(list(names), dtype=str)
+        self._name_indices = numpy.asarray(name_indices, dtype=numpy.int32)
+        self._district_ids = numpy.asarray(list(district_ids), dtype=str)
+        self._district_indices = numpy.asarray(district_indices, dtype=numpy.int32)
+        self._is_nested = numpy.asarray(is_nested, dtype=bool)
+        self._place_names = _PostalPlaceView(self)
+
+    def _get_index(self, postal_code: str) -> int:
+        """
+        Binary search for the postal code
+
+        Raises:
+            KeyError: if the postal code is not in the store
+        """
+        if not isinstance(postal_code, str):
+            raise KeyError(postal_code)
+        index = int(numpy.searchsorted(self._postal_codes, postal_code))
+        if index < len(self._postal_codes) and self._postal_codes[index] == postal_code:
+            return index
+        raise KeyError(postal_code)
+
+    def _get_rings(self, index: int) -> list[numpy.ndarray]:
+        first_ring = self._record_ring_offsets[index]
+        last_ring = self._record_ring_offsets[index + 1]
+        return [self._coordinates[self._ring_offsets[ring]:self._ring_offsets[ring + 1]]
+                for ring in range(first_ring, last_ring)]
+
+    @property
+    def place_names(self) -> Mapping:
+        """
+        Returns:
+            place_names (Mapping): dictionary-like view postal_code: str -> place_name : str
+        """
+        return self._place_names
+
+    def records(self) -> Iterator[PostalCodeRecord]:
+        """
+        Returns:
+            records (Iterator[PostalCodeRecord]): the records of all postal codes sorted by postal code
+        """
+        for index in range(len(self._postal_codes)):
+            yield PostalCodeRecord(self, index)
+
+    def records_with_prefix(self, prefix: str, limit: int = None) -> Iterator[PostalCodeRecord]:
+        """
+        Returns the records of all postal codes starting with the prefix, found with two binary searches on the sorted
+        postal codes (O(log n + number of results))
+
+        Arguments:
+            prefix (str): the beginning of the postal codes, "" matches all
+            limit (int): maximum number of records, all by default
+        Returns:
+            records (Iterator[PostalCodeRecord]): the matching records sorted by postal code
+        """
+        start = int(numpy.searchsorted(self._postal_codes, prefix, side="left"))
+        if prefix == "":
+            end = len(self._postal_codes)
+        else:
+            # all strings starting with the prefix are smaller than the prefix with its last character incremented
+            end = int(numpy.searchsorted(self._postal_codes, prefix[:-1] + chr(ord(prefix[-1]) + 1), side="left"))
+        if limit is not None:
+            end = min(end, start + limit)
+        for index in range(start, end):
+            yield PostalCodeRecord(self, index)
+
+    def __getitem__(self, postal_code: str) -> PostalCodeRecord:
+        return PostalCodeRecord(self, self._get_index(postal_code))
+
+    def __contains__(self, postal_code) -> bool:
+        try:
+            self._get_index(postal_code)
+        except KeyError:
+            return False
+        return True
+
+    def __iter__(self) -> Iterator[str]:
+        for postal_code in self._postal_codes:
+            yield str(postal_code)
+
+    def __len__(self) -> int:
+        return len(self._postal_codes)
+
+    def get_memory_size(self) -> int:
+        """
+        Returns:
+            memory_size (int): bytes used by the arrays of the store
+        """
+        return self._coordinates.nbytes + self._ring_offsets.nbytes + self._record_ring_offsets.nbytes \
+            + self._postal_codes.nbytes + self._names.nbytes + self._name_indices.nbytes \
+            + self._district_ids.nbytes + self._district_indices.nbytes + self._is_nested.nbytes
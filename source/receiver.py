@@ -288,6 +288,17 @@ def send_location_pressed(message: typ.Message):
     controller.location_was_sent(message.chat.id, latitude=lat, longitude=long)
 
 
+@bot.inline_handler(func=lambda query: True)
+def location_inline_query(inline_query: typ.InlineQuery):
+    """
+    This method is called whenever the user types "@<bot name> <text>" and will give the text to the controller
+
+    Args:
+        inline_query: the inline query with the text the user typed so far
+    """
+    controller.location_inline_query(inline_query.id, inline_query.query)
+
+
 # bot callback handlers ------------------------------------------------------------------------------------------------
 
 
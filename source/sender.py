@@ -22,6 +22,15 @@ def send_message(chat_id: int, message_string: str, reply_markup=None) -> telebo
     return message
 
 
+def answer_inline_query(inline_query_id: str, results: list[telebot.types.InlineQueryResultArticle]):
+    """
+    Args:
+        inline_query_id: a string for the id of the inline query that is answered
+        results: list of the results that are shown to the user
+    """
+    bot.answer_inline_query(inline_query_id, results)
+
+
 def send_document(chat_id: int, document, caption: str, reply_markup=None):
     bot.send_document(chat_id, document, caption=caption, reply_markup=reply_markup)
 
@@ -71,6 +80,22 @@ def create_button(text: str, request_contact=False, request_location=False) -> t
     return telebot.types.KeyboardButton(text, request_contact=request_contact, request_location=request_location)
 
 
+def create_inline_query_result(result_id: str, title: str, description: str,
+                               message_text: str) -> telebot.types.InlineQueryResultArticle:
+    """
+    Args:
+        result_id: a string with a unique id of the result in its inline query answer
+        title: a string with the title of the result
+        description: a string with a short description below the title
+        message_text: a string with the text that is sent to the chat when the user selects the result
+    Returns:
+        inline query result
+    """
+    return telebot.types.InlineQueryResultArticle(result_id, title,
+                                                  telebot.types.InputTextMessageContent(message_text),
+                                                  description=description)
+
+
 def create_inline_button(text: str, callback_data: str) -> telebot.types.InlineKeyboardButton:
     """
     Args:
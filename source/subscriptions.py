@@ -1,44 +1,123 @@
-import time
+import threading
 
 import controller
 import data_service
 import enum_types
-import nina_service
+import warning_expiry
+import warning_feed
+import warning_handler
 from nina_service import WarningCategory, GeneralWarning
 
 
+_pending_warnings = {}
+"""dictionary warning id -> (GeneralWarning, WarningCategory): added or updated warnings without postal codes yet"""
+_evaluated_subscriptions = {}
+"""dictionary chat_id -> subscriptions of the user when all active warnings were last checked for the user"""
+_active_warnings_with_category = []
+"""the active warnings of the latest update of the warning feed"""
+_lock = threading.Lock()
+"""the users are warned by the subscriptions thread and by the thread of the warning handler that mapped a warning"""
+
+
 def start_subscriptions():
     """
 
     This endless loop should only be started once when the main script is started.
-
-    Args:
-        minutes_to_wait: amount of minutes to wait after checking for new warnings (2 minutes by default)
+    It warns the users every time the warning feed publishes an update of the active warnings.
 
 
     """
     print("Subscriptions running...")
-    subscription_timer_in_seconds = data_service.get_config()['subscription_timer_in_seconds']
+    warning_handler.add_warning_mapped_listener(process_mapped_warning)
+    updates = warning_feed.subscribe()
     while True:
-        warn_users()
-        time.sleep(subscription_timer_in_seconds)
+        process_update(updates.get())
+
+
+def process_update(update: warning_feed.WarningFeedUpdate) -> bool:
+    """
+
+    Warns the users about the added and updated warnings of the update.
+    A warning is only checked once the warning handler computed its postal codes, until then it stays pending.
+
+    Args:
+        update: update of the warning feed
+
+    Returns: True if at least one user was warned
+
+    """
+    global _active_warnings_with_category
+    with _lock:
+        for event in update.events:
+            if isinstance(event, warning_feed.WarningExpired):
+                _pending_warnings.pop(event.warning.id, None)
+            else:
+                _pending_warnings[event.warning.id] = (event.warning, event.category)
+
+        saved_warning_ids = data_service.get_active_warnings_dict().keys()
+        changed_warnings_with_category = [pending_warning for warning_id, pending_warning in _pending_warnings.items()
+                                          if warning_id in saved_warning_ids]
+        for (warning, warning_category) in changed_warnings_with_category:
+            del _pending_warnings[warning.id]
+
+        _active_warnings_with_category = list(update.snapshot.warnings)
+        return warn_users(_active_warnings_with_category, changed_warnings_with_category)
 
 
-def warn_users() -> bool:
+def process_mapped_warning(warning_id: str) -> bool:
+    """
+
+    Warns the users about a pending warning as soon as the warning handler wrote its postal codes, instead of waiting
+    for the next update of the warning feed. Called by the warning handler (see add_warning_mapped_listener).
+
+    Args:
+        warning_id: id of the warning whose postal codes were written
+
+    Returns: True if at least one user was warned
+
+    """
+    with _lock:
+        pending_warning = _pending_warnings.pop(warning_id, None)
+        if pending_warning is None:
+            # not announced by the warning feed yet, process_update checks it then
+            return False
+        return warn_users(_active_warnings_with_category, [pending_warning])
+
+
+def warn_users(active_warnings_with_category: list[tuple[GeneralWarning, WarningCategory]],
+               changed_warnings_with_category: list[tuple[GeneralWarning, WarningCategory]] = None) -> bool:
     """
 
     Warns every user following his warning subscriptions.
 
+    Args:
+        active_warnings_with_category: the active warnings of the latest warning feed snapshot
+        changed_warnings_with_category: the warnings that were added or updated since the last call. Only users whose
+            subscriptions changed since the last call or who were not warned before are checked for all active
+            warnings, the others only for these. None checks all active warnings for all users
+
     Returns: True if at least one user was warned
 
     """
     chat_ids_of_warned_users = data_service.get_chat_ids_of_warned_users()
-    active_warnings_with_category = nina_service.get_all_active_warnings()
+    for chat_id in set(_evaluated_subscriptions).difference(chat_ids_of_warned_users):
+        del _evaluated_subscriptions[chat_id]
+
     warnings_sent_counter = 0
     for chat_id in chat_ids_of_warned_users:
+        warnings_to_check = active_warnings_with_category
+        if changed_warnings_with_category is not None:
+            subscriptions = data_service.get_subscriptions(chat_id)
+            if _evaluated_subscriptions.get(chat_id) == subscriptions:
+                warnings_to_check = changed_warnings_with_category
+            _evaluated_subscriptions[chat_id] = subscriptions
+        if len(warnings_to_check) == 0:
+            continue
+
         postal_codes = data_service.get_user_subscription_postal_codes(chat_id)
-        filtered_warnings = list(filter(lambda x: not data_service.has_user_already_received_warning(chat_id, x[0].id),
-                                        active_warnings_with_category))
+        filtered_warnings = list(filter(lambda x: not data_service.has_user_already_received_warning(chat_id, x[0].id)
+                                        and not warning_expiry.has_expired(x[0].id, x[0].version),
+                                        warnings_to_check))
 
         for (warning, warning_category) in filtered_warnings:
 
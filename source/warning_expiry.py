@@ -0,0 +1,166 @@
+import heapq
+import threading
+import time
+
+import data_service
+import nina_service
+
+# The warning expiry removes every warning at the end given in its detailed warning (info/expires) instead of on the
+# next poll of its feed, which may be minutes later or never if the feed cannot be polled: the warning leaves
+# active_warnings.json, the warnings_already_received lists of the users and the caches of nina_service.
+# The warning handler schedules the warnings it processes, the expiry times are kept in a min-heap and one thread
+# sleeps until the earliest one is due. A warning that expired but is still in the warning feed (the NINA API often
+# keeps it for a while) is not processed or sent again, until a new version of it comes.
+
+_MAXIMUM_WAIT_IN_SECONDS = 60.0
+"""the thread checks the heap at least this often, in case the system clock is changed"""
+
+_expiry_heap = []
+"""min-heap of (expires_at : float, warning_id : str, version : int), entries that do not match _scheduled_warnings
+anymore (rescheduled or forgotten warnings) are skipped when they are popped"""
+_scheduled_warnings = {}
+"""dictionary warning_id : str -> (expires_at : float, version : int) of the warnings that did not expire yet"""
+_expired_warning_versions = {}
+"""dictionary warning_id : str -> version : int of the expired warnings that are still in the warning feed"""
+_condition = threading.Condition()
+
+_statistics = {'expired': 0}
+
+
+def schedule(warning_id: str, version: int, expires_at: float):
+    """
+    Schedules the removal of the warning, an earlier schedule of the warning is replaced
+
+    Args:
+        warning_id: id of the warning
+        version: version of the warning the expiry time belongs to
+        expires_at: the end of the warning as a POSIX timestamp (DetailedWarningInfo.expires)
+    """
+    with _condition:
+        if _scheduled_warnings.get(warning_id) == (expires_at, version):
+            return
+        _scheduled_warnings[warning_id] = (expires_at, version)
+        _expired_warning_versions.pop(warning_id, None)
+        heapq.heappush(_expiry_heap, (expires_at, warning_id, version))
+        if len(_expiry_heap) > 2 * len(_scheduled_warnings) + 64:
+            # drop the skipped entries of rescheduled warnings, so the heap does not grow with every update
+            _expiry_heap[:] = [(expires_at, warning_id, version)
+                               for warning_id, (expires_at, version) in _scheduled_warnings.items()]
+            heapq.heapify(_expiry_heap)
+        _condition.notify()
+
+
+def forget(warning_id: str):
+    """
+    Cancels the schedule of the warning, for example when it is not in the warning feed anymore or its new version has
+    no end
+
+    Args:
+        warning_id: id of the warning
+    """
+    with _condition:
+        _scheduled_warnings.pop(warning_id, None)
+        _expired_warning_versions.pop(warning_id, None)
+
+
+def has_expired(warning_id: str, version: int, now: float = None) -> bool:
+    """
+    Args:
+        warning_id: id of the warning
+        version: version of the warning
+        now: POSIX timestamp, time.time() if None
+
+    Returns:
+        True if the version of the warning expired, also if the thread did not remove it yet
+    """
+    if now is None:
+        now = time.time()
+    with _condition:
+        if _expired_warning_versions.get(warning_id) == version:
+            return True
+        scheduled_warning = _scheduled_warnings.get(warning_id)
+        return scheduled_warning is not None and scheduled_warning[1] == version and scheduled_warning[0] <= now
+
+
+def _pop_due_warnings(now: float) -> list[str]:
+    """
+    Returns:
+        the ids of the warnings that expired until now, they are marked as expired
+    """
+    due_warning_ids = []
+    with _condition:
+        while len(_expiry_heap) > 0 and _expiry_heap[0][0] <= now:
+            expires_at, warning_id, version = heapq.heappop(_expiry_heap)
+            if _scheduled_warnings.get(warning_id) != (expires_at, version):
+                continue
+            del _scheduled_warnings[warning_id]
+            _expired_warning_versions[warning_id] = version
+            due_warning_ids.append(warning_id)
+    return due_warning_ids
+
+
+def _remove_warning(warning_id: str):
+    data_service.remove_from_active_warnings_dict_if_present(warning_id)
+    data_service.remove_warning_id_from_all_warnings_received_lists(warning_id)
+    nina_service.remove_warning_from_caches(warning_id)
+
+
+def expire_due_warnings(now: float = None) -> list[str]:
+    """
+    Removes all warnings that expired until now
+
+    Args:
+        now: POSIX timestamp, time.time() if None
+
+    Returns:
+        the ids of the removed warnings
+    """
+    if now is None:
+        now = time.time()
+    due_warning_ids = _pop_due_warnings(now)
+    for warning_id in due_warning_ids:
+        try:
+            _remove_warning(warning_id)
+            print("Warning with id:" + warning_id + " expired")
+        except Exception as e:
+            print("ERROR: removing the expired warning with id:" + warning_id + " failed\n" + str(e))
+    with _condition:
+        _statistics['expired'] += len(due_warning_ids)
+    return due_warning_ids
+
+
+def get_statistics() -> dict:
+    """
+    Returns:
+        the number of 'scheduled' warnings, of 'expired' warnings since the start and the time of the 'next_expiry'
+        (None if no warning is scheduled)
+    """
+    with _condition:
+        next_expiry = min([expires_at for expires_at, version in _scheduled_warnings.values()], default=None)
+        return {'scheduled': len(_scheduled_warnings), 'expired': _statistics['expired'], 'next_expiry': next_expiry}
+
+
+def start_warning_expiry_loop():
+    """
+    This endless loop should only be started once when the bot is started
+    """
+    print("Warning expiry running...")
+    while True:
+        with _condition:
+            now = time.time()
+            if len(_expiry_heap) == 0 or _expiry_heap[0][0] > now:
+                timeout = _MAXIMUM_WAIT_IN_SECONDS
+                if len(_expiry_heap) > 0:
+                    timeout = min(timeout, _expiry_heap[0][0] - now)
+                _condition.wait(timeout)
+                continue
+        expire_due_warnings()
+
+
+def init_warning_expiry():
+    """
+    This method will be called when the bot is initialized
+    """
+    print("Initializing Warning Expiry")
+    warning_expiry_thread = threading.Thread(target=start_warning_expiry_loop)
+    warning_expiry_thread.start()
@@ -0,0 +1,325 @@
+import queue
+import threading
+import time
+from dataclasses import dataclass
+
+from requests import HTTPError
+
+import data_service
+import nina_service
+from enum_types import WarningSeverity
+from nina_service import ActiveWarningsPoll, GeneralWarning, WarningCategory
+
+# The warning feed is the only place that polls the mapData feeds of the NINA API on a schedule. The subscriptions, the
+# warning handler and the manual warning queries of the controller all read the same snapshot of the active warnings
+# instead of polling the API on their own timers.
+# Every poll is compared with the previous one by (id, version), the subscribers get the snapshot together with the
+# WarningAdded, WarningUpdated and WarningExpired events, so they only have to process what changed.
+# Every feed is polled on its own interval between the floor and the ceiling from config.json: after a poll that showed
+# changes or while the feed has an extreme warning the interval is the floor, otherwise it grows towards the ceiling.
+
+_BACKOFF_FACTOR = 1.5
+_HIGH_SEVERITIES = {WarningSeverity.EXTREME}
+_MINIMUM_SLEEP_IN_SECONDS = 1.0
+
+
+@dataclass(frozen=True)
+class WarningSnapshot:
+    warnings: tuple[tuple[GeneralWarning, WarningCategory], ...]
+    failed_categories: frozenset[WarningCategory]
+    """categories of which at least one feed could not be polled"""
+    created_at: float
+    stale_categories: frozenset[WarningCategory] = frozenset()
+    """categories of which at least one feed could not be polled and the warnings of its last successful poll are used
+    instead"""
+
+    @property
+    def complete(self) -> bool:
+        """
+        Returns:
+            True if every feed could be polled
+        """
+        return len(self.failed_categories) == 0
+
+    def get_warnings(self, category: WarningCategory) -> list[GeneralWarning]:
+        """
+        Args:
+            category: WarningCategory of the warnings
+
+        Returns:
+            the warnings of the category, an empty list for WarningCategory.NONE and WarningCategory.ALL_WARNINGS
+
+        Raises:
+            HTTPError: if a feed of the category could not be polled, there is no older result of it and there are no
+                       warnings of the category
+        """
+        warnings = [warning for warning, warning_category in self.warnings if warning_category == category]
+        if len(warnings) == 0 and category in self.failed_categories and category not in self.stale_categories:
+            raise HTTPError("could not poll the warnings of category " + category.name)
+        return warnings
+
+
+@dataclass(frozen=True)
+class WarningAdded:
+    warning: GeneralWarning
+    category: WarningCategory
+
+
+@dataclass(frozen=True)
+class WarningUpdated:
+    warning: GeneralWarning
+    category: WarningCategory
+    previous_version: int
+
+
+@dataclass(frozen=True)
+class WarningExpired:
+    warning: GeneralWarning
+    """the last known version of the warning"""
+    category: WarningCategory
+
+
+@dataclass(frozen=True)
+class WarningFeedUpdate:
+    snapshot: WarningSnapshot
+    events: tuple
+    """WarningAdded, WarningUpdated and WarningExpired events since the previous update"""
+    initial: bool
+    """True for the first update a subscriber gets, its events are WarningAdded events for every known warning"""
+
+
+def diff_warnings(known_warnings: dict, snapshot: WarningSnapshot) -> tuple[list, dict]:
+    """
+    Compares the known warnings with a new snapshot by (id, version).
+    A warning of a category that could not be polled is not expired, it stays known until its feed can be polled again.
+
+    Args:
+        known_warnings: dictionary warning id -> (GeneralWarning, WarningCategory) of the previous diff, empty at first
+        snapshot: the new snapshot
+
+    Returns:
+        the list of events and the known warnings for the next diff
+    """
+    next_known_warnings = {}
+    for warning, category in snapshot.warnings:
+        if warning.id not in next_known_warnings:
+            next_known_warnings[warning.id] = (warning, category)
+
+    events = []
+    for warning_id, (warning, category) in next_known_warnings.items():
+        known_warning = known_warnings.get(warning_id)
+        if known_warning is None:
+            events.append(WarningAdded(warning, category))
+        elif known_warning[0].version != warning.version:
+            events.append(WarningUpdated(warning, category, known_warning[0].version))
+
+    for warning_id, (warning, category) in known_warnings.items():
+        if warning_id in next_known_warnings:
+            continue
+        if category in snapshot.failed_categories:
+            next_known_warnings[warning_id] = (warning, category)
+        else:
+            events.append(WarningExpired(warning, category))
+
+    return events, next_known_warnings
+
+
+@dataclass
+class _FeedSchedule:
+    interval_in_seconds: float
+    next_poll_at: float
+    """time.monotonic() of the next poll"""
+
+
+_snapshot: WarningSnapshot = None
+_feed_schedules = {}
+"""dictionary feed name : str -> _FeedSchedule"""
+_known_warnings = {}
+"""dictionary warning id -> (GeneralWarning, WarningCategory), the state the events of the last poll lead to"""
+_poll_lock = threading.Lock()
+"""only one thread polls at a time, the others wait for its snapshot"""
+
+_subscriber_queues: list[queue.Queue] = []
+_subscriber_queues_lock = threading.Lock()
+
+_statistics = {'polls': 0, 'reads': 0, 'events': 0}
+_statistics_lock = threading.Lock()
+
+
+def _set_snapshot_and_publish(snapshot: WarningSnapshot, events: list):
+    """
+    Replaces the snapshot and puts the update into every subscriber queue. Both happen under the same lock, so a new
+    subscriber gets either this update or an initial update with the new snapshot, never both.
+    The queues are not bounded, since a subscriber that is behind needs every update to know all events.
+    """
+    global _snapshot
+    with _subscriber_queues_lock:
+        update = WarningFeedUpdate(snapshot, tuple(events), _snapshot is None)
+        _snapshot = snapshot
+        for subscriber_queue in _subscriber_queues:
+            subscriber_queue.put_nowait(update)
+
+
+def _get_next_interval(interval_in_seconds: float, floor_in_seconds: float, ceiling_in_seconds: float,
+                       changed: bool, high_severity: bool) -> float:
+    """
+    Returns:
+        the floor if the feed changed or has a high severity warning, otherwise the interval increased by
+        _BACKOFF_FACTOR up to the ceiling
+    """
+    if changed or high_severity:
+        return floor_in_seconds
+    return min(ceiling_in_seconds, interval_in_seconds * _BACKOFF_FACTOR)
+
+
+def _update_feed_schedules(active_warnings_poll: ActiveWarningsPoll, now: float):
+    """
+    Computes the next interval of every polled feed. A feed that could not be polled keeps its interval, its circuit
+    breaker in nina_client decides whether it is requested
+    """
+    intervals = data_service.get_cached_config()['warning_feed_intervals_in_seconds']
+    for name, feed_warnings in active_warnings_poll.feed_results.items():
+        floor_in_seconds = intervals[name]['floor']
+        ceiling_in_seconds = intervals[name]['ceiling']
+        schedule = _feed_schedules.get(name)
+        interval_in_seconds = floor_in_seconds if schedule is None else schedule.interval_in_seconds
+        if feed_warnings is not None:
+            high_severity = any(warning.severity in _HIGH_SEVERITIES for warning in feed_warnings)
+            interval_in_seconds = _get_next_interval(interval_in_seconds, floor_in_seconds, ceiling_in_seconds,
+                                                     name in active_warnings_poll.changed_feeds, high_severity)
+        _feed_schedules[name] = _FeedSchedule(interval_in_seconds, now + interval_in_seconds)
+
+
+def _get_due_feed_names(now: float) -> set[str]:
+    return {name for name in nina_service.get_feed_names()
+            if name not in _feed_schedules or _feed_schedules[name].next_poll_at <= now}
+
+
+def get_feed_schedules() -> dict:
+    """
+    Returns:
+        dictionary feed name : str -> {'interval_in_seconds', 'next_poll_in_seconds'}
+    """
+    now = time.monotonic()
+    with _poll_lock:
+        return {name: {'interval_in_seconds': schedule.interval_in_seconds,
+                       'next_poll_in_seconds': max(0.0, schedule.next_poll_at - now)}
+                for name, schedule in _feed_schedules.items()}
+
+
+def poll(feed_names: set[str] = None) -> WarningSnapshot:
+    """
+    Polls the mapData feeds, replaces the snapshot and publishes it with the events to all subscribers
+
+    Args:
+        feed_names: names of the feeds that are polled, all feeds if None. The other feeds keep their last warnings
+
+    Returns:
+        the new snapshot
+    """
+    with _poll_lock:
+        return _poll_while_locked(feed_names)
+
+
+def _poll_while_locked(feed_names: set[str] = None) -> WarningSnapshot:
+    global _known_warnings
+    active_warnings_poll = nina_service.poll_active_warnings(feed_names)
+    _update_feed_schedules(active_warnings_poll, time.monotonic())
+    snapshot = WarningSnapshot(tuple(active_warnings_poll.warnings), frozenset(active_warnings_poll.failed_categories),
+                               time.time(), frozenset(active_warnings_poll.stale_categories))
+    events, _known_warnings = diff_warnings(_known_warnings, snapshot)
+    _set_snapshot_and_publish(snapshot, events)
+    with _statistics_lock:
+        _statistics['polls'] += 1
+        _statistics['events'] += len(events)
+    return snapshot
+
+
+def get_snapshot() -> WarningSnapshot:
+    """
+    Returns the latest snapshot. The feeds are only polled if there is no snapshot yet or if the snapshot is older than
+    the highest ceiling of the feed intervals, for example because the feed loop is not running.
+
+    Returns:
+        the latest snapshot of the active warnings
+    """
+    with _statistics_lock:
+        _statistics['reads'] += 1
+    intervals = data_service.get_cached_config()['warning_feed_intervals_in_seconds']
+    max_age_in_seconds = max(interval['ceiling'] for interval in intervals.values())
+    snapshot = _snapshot
+    if snapshot is not None and time.time() - snapshot.created_at <= max_age_in_seconds:
+        return snapshot
+    with _poll_lock:
+        snapshot = _snapshot  # another thread may have polled while this thread was waiting
+        if snapshot is not None and time.time() - snapshot.created_at <= max_age_in_seconds:
+            return snapshot
+        return _poll_while_locked()
+
+
+def get_warnings(category: WarningCategory) -> list[GeneralWarning]:
+    """
+    Replaces nina_service.call_general_warning for queries that can use the latest snapshot
+
+    Args:
+        category: WarningCategory of the warnings
+
+    Returns:
+        the active warnings of the category
+
+    Raises:
+        HTTPError: if the warnings of the category could not be polled
+    """
+    return get_snapshot().get_warnings(category)
+
+
+def subscribe() -> queue.Queue:
+    """
+    Returns:
+        a queue that receives a WarningFeedUpdate after every poll. If there is a snapshot already, the first update
+        contains it with WarningAdded events for all its warnings
+    """
+    subscriber_queue = queue.Queue()
+    with _subscriber_queues_lock:
+        if _snapshot is not None:
+            events = diff_warnings({}, _snapshot)[0]
+            subscriber_queue.put_nowait(WarningFeedUpdate(_snapshot, tuple(events), True))
+        _subscriber_queues.append(subscriber_queue)
+    return subscriber_queue
+
+
+def get_statistics() -> dict:
+    """
+    Returns:
+        {'polls', 'reads', 'events'}: how often the mapData feeds were polled, how often the snapshot was read and
+        how many events were published
+    """
+    with _statistics_lock:
+        return dict(_statistics)
+
+
+def start_warning_feed_loop():
+    """
+    This endless loop should only be started once when the bot is started
+    """
+    print("Warning feed running...")
+    while True:
+        try:
+            with _poll_lock:
+                due_feed_names = _get_due_feed_names(time.monotonic())
+                if len(due_feed_names) > 0:
+                    _poll_while_locked(due_feed_names)
+        except Exception as e:
+            print("ERROR: polling the warning feed failed: " + repr(e))
+        with _poll_lock:
+            next_poll_at = min([schedule.next_poll_at for schedule in _feed_schedules.values()], default=0.0)
+        time.sleep(max(_MINIMUM_SLEEP_IN_SECONDS, next_poll_at - time.monotonic()))
+
+
+def init_warning_feed():
+    """
+    This method will be called when the bot is initialized
+    """
+    print("Initializing Warning Feed")
+    warning_feed_thread = threading.Thread(target=start_warning_feed_loop)
+    warning_feed_thread.start()
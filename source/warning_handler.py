@@ -1,8 +1,19 @@
+import itertools
+import queue
+import time
+from concurrent.futures import Future
+from dataclasses import dataclass
+from typing import Callable
+
+import enum_types
 import nina_service
+import nina_service_async
 import place_converter
+import postal_code_mapper
 import data_service
-import time
 import threading
+import warning_expiry
+import warning_feed
 
 
 def get_all_relevant_warning_ids(general_warnings: list[nina_service.GeneralWarning],
@@ -35,6 +46,26 @@ def get_all_relevant_warning_ids(general_warnings: list[nina_service.GeneralWarn
     return result_ids
 
 
+def get_regional_warnings_for_postal_code(general_warnings: list[nina_service.GeneralWarning],
+                                          postal_code: str) -> list[nina_service.GeneralWarning]:
+    """
+    This method will return the warnings of a district (nina_service.get_regional_warnings) that are relevant for the
+    given postal code.\n
+    A warning is relevant if the postal code is in its active area. A warning that the warning handler did not map to
+    postal codes yet is kept, the dashboard already limits it to the district.
+
+    Args:
+        general_warnings: list of GeneralWarnings Enum of the district
+        postal_code: string with the postal code in the district
+
+    Returns:
+        list of the relevant GeneralWarnings, in the given order
+    """
+    all_warnings = data_service.get_active_warnings_dict()
+    return [warning for warning in general_warnings
+            if warning.id not in all_warnings or postal_code in all_warnings[warning.id]]
+
+
 def get_random_postal_code_for_active_warning(general_warning: nina_service.GeneralWarning) -> str:
     """
     This method will return a relevant postal code for the given general_warning\n
@@ -53,75 +84,366 @@ def get_random_postal_code_for_active_warning(general_warning: nina_service.Gene
     return all_warnings[general_warning.id][0]
 
 
-def write_postal_codes(warning_id: int, geo_areas, counter: int):
+def _submit_postal_codes(warning_id: str, geo_areas) -> Future:
     """
-    Gets postal code out of the polygones in geo_ares and writes them into active_warnings_dictionary using
-    the key warning_id
+    Computes the postal codes of the polygones in geo_areas in a process of postal_code_mapper
 
     Args:
-        warning_id: int, used as key to write to active warnings dictionary
+        warning_id: str, returned with the result
         geo_areas: used to get the postal codes
+
+    Returns:
+        Future with the result warning_id, list of the postal codes
+    """
+    # every ring of every polygon (the nina api sends Polygons and MultiPolygons) is checked on its own
+    rings = [ring for area in geo_areas for ring in area.get_rings()]
+    return postal_code_mapper.submit(place_converter.get_postal_code_store(), warning_id, rings)
+
+
+def _get_postal_codes_from_geocodes(warning_id: str, counter: int) -> list[str] or None:
+    """
+    Gets the postal codes out of the geocodes (ARS / DWD warncell ids) of the areas of the warning.\n
+    This is only a dictionary lookup, but it only works if place_converter knows every geocode of the warning
+
+    Args:
+        warning_id: str, used to get the geocodes
         counter: int, used to count the entries
+
+    Returns:
+        list of the postal codes, None if the polygons of the warning have to be used instead
+    """
+    try:
+        detailed_warning = nina_service.get_detailed_warning(warning_id)
+    except Exception as e:
+        print("ERROR: getting geocodes of warning:" + str(counter) + " with id:" + str(warning_id) + " failed\n" + str(e))
+        return None
+
+    if detailed_warning.info is None:
+        return None
+
+    geocodes = []
+    for area in detailed_warning.info.area:
+        geocodes.extend(area.geocode)
+
+    return place_converter.get_postal_codes_for_geocodes(geocodes)
+
+
+@dataclass(frozen=True)
+class _QueuedWarning:
+    counter: int
+    warning: nina_service.GeneralWarning
+    postal_codes: list[str] or None
+    """the postal codes of the geocodes of the warning, None if they are computed from its polygons"""
+    queued_at: float
+    """time.monotonic() when the warning was queued"""
+
+
+_processing_queue = queue.PriorityQueue()
+"""entries (priority : tuple, sequence number : int, _QueuedWarning), the entry with the lowest priority is processed
+first (see _get_priority), the sequence number keeps the order of the feed for equal priorities"""
+_queued_warning_versions = {}
+"""dictionary warning_id : str -> version : int of the queued warnings and of the warnings whose postal codes are
+computed right now, entries of other versions are skipped and their results are not written"""
+_queue_lock = threading.Lock()
+_sequence_numbers = itertools.count()
+_SLOW_WAIT_IN_SECONDS = 60.0
+"""a warning that waited longer than this in the queue is printed, the other wait times are only in
+get_queue_statistics"""
+_queue_statistics = {}
+"""dictionary WarningSeverity -> dictionary with the number of 'queued' and 'processed' warnings, the
+'total_wait_in_seconds' and 'max_wait_in_seconds' of the processed warnings"""
+
+_processing_lock = threading.Lock()
+"""held while the postal codes of a warning are written and while warnings are removed, so an expired warning is not
+written again after its removal"""
+
+_warning_mapped_listeners: list[Callable[[str], None]] = []
+"""called with the warning id after the postal codes of a warning were written (see add_warning_mapped_listener)"""
+
+
+def _get_priority(warning: nina_service.GeneralWarning) -> tuple:
+    """
+    Returns:
+        the priority of the warning in the processing queue, the most severe warnings first and among them the ones
+        that started first
+    """
+    start_timestamp = warning.get_start_timestamp()
+    return (-enum_types.get_integer_from_warning_severity(warning.severity),
+            start_timestamp if start_timestamp is not None else float("inf"))
+
+
+def _is_queued(warning: nina_service.GeneralWarning) -> bool:
+    with _queue_lock:
+        return _queued_warning_versions.get(warning.id) == warning.version
+
+
+def _enqueue_warning(counter: int, warning: nina_service.GeneralWarning, postal_codes: list[str] or None):
+    """
+    Queues the warning for the computation of its postal codes, an older version of it in the queue is skipped
+
+    Args:
+        counter: int, used to count the entries
+        warning: the warning
+        postal_codes: the postal codes of the geocodes of the warning, None if they are computed from its polygons
+    """
+    with _queue_lock:
+        if _queued_warning_versions.get(warning.id) == warning.version:
+            return
+        _queued_warning_versions[warning.id] = warning.version
+        _queue_statistics.setdefault(warning.severity, {'queued': 0, 'processed': 0, 'total_wait_in_seconds': 0.0,
+                                                        'max_wait_in_seconds': 0.0})['queued'] += 1
+        _processing_queue.put((_get_priority(warning), next(_sequence_numbers),
+                               _QueuedWarning(counter, warning, postal_codes, time.monotonic())))
+
+
+def _forget_queued_warning(warning_id: str):
+    """
+    The queued warning with the id is skipped, for example because it expired
+    """
+    with _queue_lock:
+        _queued_warning_versions.pop(warning_id, None)
+
+
+def _process_next_warning(timeout: float = None) -> Future or None:
+    """
+    Takes the warning with the highest priority from the queue and computes its postal codes
+
+    Args:
+        timeout: seconds to wait for a warning, None waits until there is one
+
+    Returns:
+        the Future of the computation if it runs in a process of postal_code_mapper, None if the warning was written or
+        skipped already
+
+    Raises:
+        queue.Empty: if no warning was queued until the timeout
     """
+    priority, sequence_number, queued_warning = _processing_queue.get(timeout=timeout)
+
+    warning = queued_warning.warning
+    with _queue_lock:
+        statistics = _queue_statistics[warning.severity]
+        statistics['queued'] -= 1
+        if _queued_warning_versions.get(warning.id) != warning.version:
+            return None
+        wait_in_seconds = time.monotonic() - queued_warning.queued_at
+        statistics['processed'] += 1
+        statistics['total_wait_in_seconds'] += wait_in_seconds
+        statistics['max_wait_in_seconds'] = max(statistics['max_wait_in_seconds'], wait_in_seconds)
+
+    if wait_in_seconds > _SLOW_WAIT_IN_SECONDS:
+        print("Warning with id:" + str(warning.id) + " (" + warning.severity.name + ") waited "
+              + str(round(wait_in_seconds, 1)) + " s in the warning handler queue")
+    return _process_warning(queued_warning)
+
+
+def _process_warning(queued_warning: _QueuedWarning) -> Future or None:
+    counter, warning = queued_warning.counter, queued_warning.warning
+    if warning_expiry.has_expired(warning.id, warning.version):
+        _finish_warning(queued_warning, None)
+        return None
+
+    if queued_warning.postal_codes is not None:
+        print("Processing Warning Number: " + str(counter) + " (by geocodes)")
+        _finish_warning(queued_warning, queued_warning.postal_codes)
+        return None
+
     try:
+        geo_areas = nina_service.get_detailed_warning_geo(warning.id, warning.version).affected_areas
         print("Processing Warning Number: " + str(counter))
+        future = _submit_postal_codes(warning.id, geo_areas)
+    except Exception as e:
+        print("ERROR: getting geojson of warning:" + str(counter) + " with id:" + str(warning.id) + " failed\n" +
+              str(e))
+        _finish_warning(queued_warning, None)
+        return None
+    future.add_done_callback(lambda done_future: _finish_mapped_warning(queued_warning, done_future))
+    return future
 
-        all_postal_codes = []
-        for area in geo_areas:
-            for coordinates in area.coordinates:
-
-                # this check is needed because sometimes the nina api send us list(list(list(list(float))))
-                # instead of list(list(list(float)))
-                if isinstance(coordinates[0][0], list):
-                    for deeper_coordinates in coordinates:
-                        dicts_in_polygon = place_converter.get_postal_code_dicts_in_polygon(deeper_coordinates)
-                        for dict_in_polygon in dicts_in_polygon:
-                            postal_code = place_converter.get_postal_code_from_dict(dict_in_polygon)
-                            if postal_code not in all_postal_codes:
-                                all_postal_codes.append(postal_code)
-                else:
-                    dicts_in_polygon = place_converter.get_postal_code_dicts_in_polygon(coordinates)
-                    for dict_in_polygon in dicts_in_polygon:
-                        postal_code = place_converter.get_postal_code_from_dict(dict_in_polygon)
-                        if postal_code not in all_postal_codes:
-                            all_postal_codes.append(postal_code)
-
-        data_service.write_to_active_warnings_dict(warning_id, all_postal_codes)
 
+def _finish_mapped_warning(queued_warning: _QueuedWarning, future: Future):
+    """
+    Called in the parent process when the postal codes of the warning were computed
+    """
+    try:
+        warning_id, postal_codes = future.result()
     except Exception as e:
-        print("ERROR: processing warning:" + str(counter) + " with id:" + str(warning_id) + " failed\n" + str(e))
+        print("ERROR: processing warning:" + str(queued_warning.counter) + " with id:" +
+              str(queued_warning.warning.id) + " failed\n" + str(e))
+        postal_codes = None
+    _finish_warning(queued_warning, postal_codes)
+
+
+def _finish_warning(queued_warning: _QueuedWarning, postal_codes: list[str] or None):
+    """
+    Writes the postal codes into active_warnings.json, unless the warning was removed or a newer version of it was
+    queued in the meantime, and calls the listeners of add_warning_mapped_listener. Then the warning can be queued again
+
+    Args:
+        queued_warning: the processed warning
+        postal_codes: the postal codes of the warning, None if they could not be computed
+    """
+    warning = queued_warning.warning
+    with _processing_lock:
+        with _queue_lock:
+            current = _queued_warning_versions.get(warning.id) == warning.version
+            if current:
+                del _queued_warning_versions[warning.id]
+        written = current and postal_codes is not None and not warning_expiry.has_expired(warning.id, warning.version)
+        if written:
+            data_service.write_to_active_warnings_dict(warning.id, postal_codes)
+    if written:
+        # outside of _processing_lock, the listeners send messages
+        for listener in list(_warning_mapped_listeners):
+            try:
+                listener(warning.id)
+            except Exception as e:
+                print("ERROR: listener of warning with id:" + str(warning.id) + " failed\n" + str(e))
+
+
+def add_warning_mapped_listener(listener: Callable[[str], None]):
+    """
+    Registers a function that is called with the warning id as soon as the postal codes of a warning were written into
+    active_warnings.json, so the warning does not have to wait for the next update of the warning feed
+
+    Args:
+        listener: called in the thread that processed the warning
+    """
+    _warning_mapped_listeners.append(listener)
+
+
+def get_queue_statistics() -> dict:
+    """
+    Returns:
+        dictionary severity name : str -> dictionary with the number of 'queued' warnings, of 'processed' warnings
+        since the start and the 'average_wait_in_seconds' and 'max_wait_in_seconds' of the processed warnings
+    """
+    with _queue_lock:
+        return {severity.name: {'queued': statistics['queued'], 'processed': statistics['processed'],
+                                'average_wait_in_seconds': statistics['total_wait_in_seconds']
+                                / max(1, statistics['processed']),
+                                'max_wait_in_seconds': statistics['max_wait_in_seconds']}
+                for severity, statistics in _queue_statistics.items()}
+
+
+def schedule_expiry(warning: nina_service.GeneralWarning):
+    """
+    Schedules the removal of the warning at the end given in its detailed warning, see warning_expiry
+
+    Args:
+        warning: the warning, the detailed warning of its version is used
+    """
+    try:
+        detailed_warning = nina_service.get_detailed_warning(warning.id, version=warning.version)
+    except Exception as e:
+        print("ERROR: getting the end of warning with id:" + str(warning.id) + " failed\n" + str(e))
+        return
+
+    if detailed_warning.info is None or detailed_warning.info.expires is None:
+        warning_expiry.forget(warning.id)
+        return
+    warning_expiry.schedule(warning.id, warning.version, detailed_warning.info.expires)
+
+
+def process_update(update: warning_feed.WarningFeedUpdate):
+    """
+    Removes the expired warnings from active_warnings.json and queues the added and updated warnings for the
+    computation of their postal codes, the most severe warnings first (see _get_priority). Warnings whose postal codes
+    could not be computed before are retried.\n
+    For the initial update all warnings in active_warnings.json that are not active anymore are removed instead, since
+    they may have expired while the bot was not running.\n
+    The removal of the added and updated warnings (all warnings for the initial update) is scheduled at their end, so
+    they are removed then even if they stay in the feed. Warnings that already ended are not processed
+
+    Args:
+        update: update of the warning feed
+    """
+    all_saved_warnings = data_service.get_active_warnings_dict()
+    snapshot = update.snapshot
+    """
+        First: remove all warnings in active_warnings.json that are not active anymore
+    """
+    with _processing_lock:
+        if update.initial:
+            if snapshot.complete:
+                active_warning_ids = {active_warning[0].id for active_warning in snapshot.warnings}
+                for saved_warning_id in list(all_saved_warnings):
+                    if saved_warning_id not in active_warning_ids:
+                        data_service.remove_from_active_warnings_dict(saved_warning_id)
+                        del all_saved_warnings[saved_warning_id]
+        else:
+            for event in update.events:
+                if not isinstance(event, warning_feed.WarningExpired):
+                    continue
+                warning_expiry.forget(event.warning.id)
+                _forget_queued_warning(event.warning.id)
+                if event.warning.id in all_saved_warnings:
+                    data_service.remove_from_active_warnings_dict(event.warning.id)
+                    del all_saved_warnings[event.warning.id]
+
+    """
+        Second: queue all warnings that are new to active_warnings.json and the updated warnings, since their area may
+        have changed
+    """
+    updated_warning_ids = {event.warning.id for event in update.events
+                           if isinstance(event, warning_feed.WarningUpdated)}
+    warnings_to_process = []
+    for counter, active_warning in enumerate(snapshot.warnings, start=1):
+        if active_warning[0].id in all_saved_warnings and active_warning[0].id not in updated_warning_ids:
+            continue
+        if _is_queued(active_warning[0]):
+            continue
+        warnings_to_process.append((counter, active_warning[0]))
+    warnings_to_schedule = [warning for counter, warning in warnings_to_process]
+    if update.initial:
+        warnings_to_schedule = [active_warning[0] for active_warning in snapshot.warnings]
+
+    # the warnings are downloaded concurrently first, so the processing thread only reads the cache of nina_service
+    nina_service_async.prefetch_detailed_warnings(warnings_to_schedule)
+    for warning in warnings_to_schedule:
+        schedule_expiry(warning)
+    warnings_to_process = [(counter, warning) for counter, warning in warnings_to_process
+                           if not warning_expiry.has_expired(warning.id, warning.version)]
+    warnings_to_process.sort(key=lambda counter_and_warning: _get_priority(counter_and_warning[1]))
+
+    warnings_without_geocodes = []
+    for counter, warning in warnings_to_process:
+        postal_codes = _get_postal_codes_from_geocodes(warning.id, counter)
+        if postal_codes is None:
+            warnings_without_geocodes.append((counter, warning))
+        else:
+            _enqueue_warning(counter, warning, postal_codes)
+
+    # the geojsons of the most severe warnings are requested first
+    nina_service_async.prefetch_detailed_warning_geos([warning for counter, warning in warnings_without_geocodes])
+    for counter, warning in warnings_without_geocodes:
+        _enqueue_warning(counter, warning, None)
 
 
 def start_warning_handler_loop():
+    updates = warning_feed.subscribe()
     while True:
-        all_saved_warnings = data_service.get_active_warnings_dict()
-        all_active_warnings = nina_service.get_all_active_warnings()
-        """
-            First: remove all warnings in active_warnings.json that are not active anymore
-        """
-        for saved_warning_id in all_saved_warnings:
-            is_active = False
-            for active_warning in all_active_warnings:
-                if active_warning[0].id == saved_warning_id:
-                    is_active = True
-                    break
-            if not is_active:
-                data_service.remove_from_active_warnings_dict(saved_warning_id)
+        process_update(updates.get())
 
-        """
-            Second: compute and add all warnings that are new to active_warnings.json
-        """
-        counter = 0
-        for active_warning in all_active_warnings:
-            counter += 1
-            if active_warning[0].id in all_saved_warnings:
-                print("Warning Number: " + str(counter) + " already processed")
-                continue
 
-            geo_areas = nina_service.get_detailed_warning_geo(active_warning[0].id).affected_areas
-            write_postal_codes(active_warning[0].id, geo_areas, counter)
-
-        time.sleep(data_service.get_config()['warning_timer_in_seconds'])
+def start_warning_processing_loop():
+    """
+    This endless loop should only be started once when the bot is started, it computes the postal codes of the queued
+    warnings. There is at most one warning per process of postal_code_mapper in computation, so the next warning is
+    only taken from the queue when a process is free and a more severe warning queued in the meantime goes first
+    """
+    mapping_slots = threading.BoundedSemaphore(postal_code_mapper.get_worker_count())
+    while True:
+        mapping_slots.acquire()
+        future = None
+        try:
+            future = _process_next_warning()
+        except Exception as e:
+            print("ERROR: processing a queued warning failed: " + repr(e))
+        if future is None:
+            mapping_slots.release()
+        else:
+            future.add_done_callback(lambda done_future: mapping_slots.release())
 
 
 def init_warning_handler():
@@ -129,5 +451,8 @@ def init_warning_handler():
     This method will be called when the bot is initialized
     """
     print("Initializing Warning Handler")
+    warning_expiry.init_warning_expiry()
     warning_handler_thread = threading.Thread(target=start_warning_handler_loop)
     warning_handler_thread.start()
+    warning_processing_thread = threading.Thread(target=start_warning_processing_loop)
+    warning_processing_thread.start()
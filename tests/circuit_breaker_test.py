@@ -0,0 +1,53 @@
+import sys
+import time
+import unittest
+
+sys.path.insert(0, "..\\source")
+
+from circuit_breaker import CircuitBreaker
+from enum_types import CircuitBreakerState
+
+
+class MyTestCase(unittest.TestCase):
+    def test_opens_on_failure_rate(self):
+        circuit_breaker = CircuitBreaker("test", 4, 4, 0.5, 60)
+        circuit_breaker.record_failure()
+        circuit_breaker.record_failure()
+        circuit_breaker.record_success()
+        # not enough requests yet
+        self.assertEqual(CircuitBreakerState.CLOSED, circuit_breaker.state)
+
+        circuit_breaker.record_success()
+        self.assertEqual(CircuitBreakerState.CLOSED, circuit_breaker.state)
+        circuit_breaker.record_failure()  # the window is [failure, success, success, failure]
+        self.assertEqual(CircuitBreakerState.OPEN, circuit_breaker.state)
+        self.assertFalse(circuit_breaker.allow_request())
+        self.assertEqual(1, circuit_breaker.get_statistics()['rejected_requests'])
+
+    def test_half_open(self):
+        circuit_breaker = CircuitBreaker("test", 2, 2, 1.0, 0.05)
+        circuit_breaker.record_failure()
+        circuit_breaker.record_failure()
+        self.assertFalse(circuit_breaker.allow_request())
+
+        time.sleep(0.06)
+        # after the cool-down only one trial request is allowed
+        self.assertTrue(circuit_breaker.allow_request())
+        self.assertEqual(CircuitBreakerState.HALF_OPEN, circuit_breaker.state)
+        self.assertFalse(circuit_breaker.allow_request())
+
+        # failed trial: open again
+        circuit_breaker.record_failure()
+        self.assertEqual(CircuitBreakerState.OPEN, circuit_breaker.state)
+
+        # successful trial: closed with an empty window
+        time.sleep(0.06)
+        self.assertTrue(circuit_breaker.allow_request())
+        circuit_breaker.record_success()
+        self.assertEqual(CircuitBreakerState.CLOSED, circuit_breaker.state)
+        self.assertEqual(0.0, circuit_breaker.get_statistics()['failure_rate'])
+        self.assertEqual(5, circuit_breaker.get_statistics()['state_changes'])
+
+
+if __name__ == '__main__':
+    unittest.main()
@@ -1,4 +1,7 @@
 import importlib.util
+import os
+import shutil
+import tempfile
 import unittest
 import sys
 
@@ -7,9 +10,27 @@ sys.path.insert(0, "..\source")
 import data_service
 import enum_types
 
-file_path = "../source/data/data.json"
-warnings_already_received_path = "../source/data/warnings_already_received.json"
-active_warnings_path = "../source/data/active_warnings.json"
+# the tests write into a temporary directory instead of the data of the bot in source/data
+_test_directory = tempfile.mkdtemp()
+file_path = os.path.join(_test_directory, "data.json")
+warnings_already_received_path = os.path.join(_test_directory, "warnings_already_received.json")
+active_warnings_path = os.path.join(_test_directory, "active_warnings.json")
+_data_service_paths = {}
+
+
+def setUpModule():
+    for attribute, path in [("_USER_DATA_PATH", file_path),
+                            ("_WARNINGS_ALREADY_RECEIVED_PATH", warnings_already_received_path),
+                            ("_ACTIVE_WARNINGS_PATH", active_warnings_path)]:
+        _data_service_paths[attribute] = getattr(data_service, attribute)
+        setattr(data_service, attribute, path)
+        data_service._write_file(path, {})
+
+
+def tearDownModule():
+    for attribute, path in _data_service_paths.items():
+        setattr(data_service, attribute, path)
+    shutil.rmtree(_test_directory)
 
 
 class MyTestCase(unittest.TestCase):
@@ -489,6 +510,26 @@ class MyTestCase(unittest.TestCase):
         # write data back to json from before the test
         data_service._write_file(file_path, entries_before_test)
 
+    def test_get_all_district_ids(self):
+        # read json file and safe the current content before the test
+        entries_before_test = data_service._read_file(file_path)
+
+        # clear the json file
+        data_service._write_file(file_path, {})
+        self.assertEqual([], data_service.get_all_district_ids())
+
+        # two users with favorites and a subscription each, every district id is returned once
+        entries = {"10": {"favorites": [{"postal_code": "10827", "district_id": "11000"},
+                                        {"postal_code": "64291", "district_id": "06411"}],
+                          "locations": {"22559": {"district_id": "02000", "1": "Minor"}}},
+                   "20": {"favorites": [{"postal_code": "64291", "district_id": "06411"}],
+                          "locations": {"64287": {"district_id": "06411", "1": "Minor"}}}}
+        data_service._write_file(file_path, entries)
+        self.assertEqual(["11000", "06411", "02000"], data_service.get_all_district_ids())
+
+        # write data back to json from before the test
+        data_service._write_file(file_path, entries_before_test)
+
     def test_delete_user(self):
         """Tests reset_favorites in data_service.py.
         reates two users (user_10 and user_20) and adds 3 favorites for user_20.\n
@@ -837,6 +878,27 @@ class MyTestCase(unittest.TestCase):
         # write data back to json from before the test
         data_service._write_file(warnings_already_received_path, saved_received_warnings)
 
+    def test_remove_warning_id_from_all_warnings_received_lists(self):
+        saved_received_warnings = data_service._read_file(warnings_already_received_path)
+
+        entry = {
+            "10": ["lhp.HOCHWASSERZENTRALEN.DE.BY", "lhp.HOCHWASSERZENTRALEN.DE.HE"],
+            "20": ["lhp.HOCHWASSERZENTRALEN.DE.BY"],
+            "30": []
+        }
+        data_service._write_file(warnings_already_received_path, entry)
+
+        data_service.remove_warning_id_from_all_warnings_received_lists("lhp.HOCHWASSERZENTRALEN.DE.BY")
+        expected = {
+            "10": ["lhp.HOCHWASSERZENTRALEN.DE.HE"],
+            "20": [],
+            "30": []
+        }
+        self.assertEqual(expected, data_service._read_file(warnings_already_received_path))
+
+        # write data back to json from before the test
+        data_service._write_file(warnings_already_received_path, saved_received_warnings)
+
     def test_get_users_already_received_warning_ids_and_has_user_already_received_warning(self):
         saved_received_warnings = data_service._read_file(warnings_already_received_path)
 
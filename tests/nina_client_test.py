@@ -0,0 +1,153 @@
+import http.server
+import sys
+import threading
+import time
+import unittest
+
+import requests
+from mock import patch
+
+sys.path.insert(0, "..\\source")
+
+import data_service
+import nina_client
+
+
+class _TestRequestHandler(http.server.BaseHTTPRequestHandler):
+    """
+    /ok answers 200, /flaky answers 503 on every second request, /broken always answers 503 and /slow answers late
+    """
+    flaky_requests = 0
+
+    def do_GET(self):
+        if self.path == "/flaky":
+            _TestRequestHandler.flaky_requests += 1
+            status = 503 if _TestRequestHandler.flaky_requests % 2 == 1 else 200
+        elif self.path == "/broken":
+            status = 503
+        elif self.path == "/slow":
+            time.sleep(0.5)
+            status = 200
+        else:
+            status = 200
+        body = b'{"ok": true}'
+        self.send_response(status)
+        self.send_header("Content-Type", "application/json")
+        self.send_header("Content-Length", str(len(body)))
+        self.end_headers()
+        try:
+            self.wfile.write(body)
+        except (BrokenPipeError, ConnectionResetError):
+            pass  # the client gave up because of its timeout
+
+    def log_message(self, format, *args):
+        pass
+
+
+class MyTestCase(unittest.TestCase):
+    @classmethod
+    def setUpClass(cls):
+        cls.server = http.server.ThreadingHTTPServer(("127.0.0.1", 0), _TestRequestHandler)
+        cls.url = "http://127.0.0.1:" + str(cls.server.server_address[1])
+        threading.Thread(target=cls.server.serve_forever, daemon=True).start()
+        cls.session = requests.Session()
+
+    @classmethod
+    def tearDownClass(cls):
+        cls.server.shutdown()
+        cls.session.close()
+
+    def setUp(self):
+        # the tests patch the config
+        data_service.get_cached_config.cache_clear()
+
+    def _get(self, path: str, endpoint: str, max_retries=2, read_timeout=2.0) -> requests.Response:
+        return nina_client._request_with_retries(self.session, self.url + path, endpoint, (1.0, read_timeout),
+                                                 max_retries, 0.01)
+
+    def test_request(self):
+        response = self._get("/ok", "test_ok")
+        self.assertEqual(200, response.status_code)
+        self.assertEqual({"ok": True}, response.json())
+
+    def test_retry(self):
+        # first attempt fails with 503, the retry succeeds
+        _TestRequestHandler.flaky_requests = 0
+        response = self._get("/flaky", "test_flaky")
+        self.assertEqual(200, response.status_code)
+        statistics = nina_client.get_latency_statistics()['test_flaky']
+        self.assertEqual(2, statistics['requests'])
+        self.assertEqual(1, statistics['retries'])
+
+        # retries are bounded, the last response is returned
+        response = self._get("/broken", "test_broken")
+        self.assertEqual(503, response.status_code)
+        self.assertEqual(3, nina_client.get_latency_statistics()['test_broken']['requests'])
+
+    def test_timeout(self):
+        with self.assertRaises(requests.exceptions.Timeout):
+            self._get("/slow", "test_slow", max_retries=1, read_timeout=0.1)
+        statistics = nina_client.get_latency_statistics()['test_slow']
+        self.assertEqual(2, statistics['requests'])
+        self.assertEqual(2, statistics['errors'])
+
+    def test_circuit_breaker(self):
+        config = {'nina_http_pool_size': 1, 'nina_http_record_directory': None, 'nina_http_replay_directory': None,
+                  'nina_http_connect_timeout_in_seconds': 1,
+                  'nina_http_read_timeout_in_seconds': 1, 'nina_http_max_retries': 0,
+                  'nina_http_backoff_in_seconds': 0, 'nina_circuit_breaker_window_size': 4,
+                  'nina_circuit_breaker_minimum_requests': 2, 'nina_circuit_breaker_failure_rate': 0.5,
+                  'nina_circuit_breaker_cool_down_in_seconds': 60}
+        with patch('data_service.get_config', return_value=config):
+            for i in range(0, 2):
+                self.assertEqual(503, nina_client.get(self.url + "/broken", "test_breaker").status_code)
+
+            # the endpoint is not requested anymore, other endpoints are not affected
+            with self.assertRaises(nina_client.CircuitOpenError):
+                nina_client.get(self.url + "/broken", "test_breaker")
+            self.assertEqual(2, nina_client.get_latency_statistics()['test_breaker']['requests'])
+            self.assertEqual(200, nina_client.get(self.url + "/ok", "test_breaker_ok").status_code)
+
+            statistics = nina_client.get_circuit_breaker_statistics()
+            self.assertEqual("open", statistics['test_breaker']['state'])
+            self.assertEqual("closed", statistics['test_breaker_ok']['state'])
+
+    def test_failed_trial_request_is_recorded(self):
+        config = {'nina_http_pool_size': 1, 'nina_http_record_directory': None, 'nina_http_replay_directory': None,
+                  'nina_http_connect_timeout_in_seconds': 1,
+                  'nina_http_read_timeout_in_seconds': 1, 'nina_http_max_retries': 0,
+                  'nina_http_backoff_in_seconds': 0, 'nina_circuit_breaker_window_size': 2,
+                  'nina_circuit_breaker_minimum_requests': 2, 'nina_circuit_breaker_failure_rate': 1.0,
+                  'nina_circuit_breaker_cool_down_in_seconds': 0}
+        with patch('data_service.get_config', return_value=config):
+            for i in range(0, 2):
+                self.assertEqual(503, nina_client.get(self.url + "/broken", "test_trial").status_code)
+            self.assertEqual("open", nina_client.get_circuit_breaker_statistics()['test_trial']['state'])
+
+            # the trial request raises something else than a RequestException
+            for error in [ValueError("broken"), KeyboardInterrupt()]:
+                with patch('nina_client._request_with_retries', side_effect=error):
+                    with self.assertRaises(type(error)):
+                        nina_client.get(self.url + "/ok", "test_trial")
+                self.assertEqual("open", nina_client.get_circuit_breaker_statistics()['test_trial']['state'])
+
+            # the next trial request is allowed and closes the circuit breaker
+            self.assertEqual(200, nina_client.get(self.url + "/ok", "test_trial").status_code)
+            self.assertEqual("closed", nina_client.get_circuit_breaker_statistics()['test_trial']['state'])
+
+    def test_backoff_time(self):
+        for attempt in range(0, 5):
+            backoff_time = nina_client._get_backoff_time(0.5, attempt)
+            self.assertTrue(0 <= backoff_time <= 0.5 * (2 ** attempt))
+
+    def test_latency_statistics(self):
+        for i in range(0, 3):
+            self._get("/ok", "test_statistics")
+        statistics = nina_client.get_latency_statistics()['test_statistics']
+        self.assertEqual(3, statistics['requests'])
+        self.assertEqual(0, statistics['errors'])
+        self.assertTrue(0 < statistics['p50_ms'] <= statistics['p95_ms'] <= statistics['max_ms'])
+
+
+if __name__ == '__main__':
+    unittest.main()
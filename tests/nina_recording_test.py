@@ -0,0 +1,106 @@
+import os
+import shutil
+import sys
+import tempfile
+import threading
+import unittest
+
+from mock import patch
+
+sys.path.insert(0, "..\\source")
+
+import data_service
+import nina_client
+import nina_service
+import nina_stand_in_server
+
+_WARNING_ID = "dwdmap.2.49.0.0.276.0.DWD.PVW.1676300000000.test"
+_FIXTURES = {"api31/dwd/mapData.json": "data/nina/dwd_mapData.json",
+             "api31/warnings/" + _WARNING_ID + ".geojson": "data/nina/warning.geojson"}
+
+
+class MyTestCase(unittest.TestCase):
+    def setUp(self):
+        self.upstream_directory = tempfile.mkdtemp()
+        self.record_directory = tempfile.mkdtemp()
+        for path, fixture in _FIXTURES.items():
+            os.makedirs(os.path.dirname(os.path.join(self.upstream_directory, path)), exist_ok=True)
+            shutil.copy(fixture, os.path.join(self.upstream_directory, path))
+        self.server = nina_stand_in_server.create_server(self.upstream_directory)
+        self.url = "http://127.0.0.1:" + str(self.server.server_address[1]) + "/api31"
+        threading.Thread(target=self.server.serve_forever, daemon=True).start()
+
+        nina_client._session = None
+        data_service.get_cached_config.cache_clear()
+        nina_client._circuit_breakers.clear()
+        nina_service._conditional_get_cache.clear()
+        nina_service._detailed_warning_geo_cache.clear()
+
+    def tearDown(self):
+        self.server.shutdown()
+        self.server.server_close()
+        nina_client._session = None
+        data_service.get_cached_config.cache_clear()
+        shutil.rmtree(self.upstream_directory)
+        shutil.rmtree(self.record_directory)
+
+    def _get_config(self, record_directory: str = None, replay_directory: str = None) -> dict:
+        return dict(data_service.get_config(), nina_http_record_directory=record_directory,
+                    nina_http_replay_directory=replay_directory, nina_http_max_retries=0)
+
+    def test_record_and_replay(self):
+        with patch('nina_service._API_URL', self.url), \
+                patch('data_service.get_config', return_value=self._get_config(record_directory=self.record_directory)):
+            warnings = nina_service.poll_dwd_warning()
+            detailed_warning_geo = nina_service.get_detailed_warning_geo(_WARNING_ID, version=3)
+        # the streamed geojson is parsed and recorded
+        self.assertEqual(2, len(detailed_warning_geo.affected_areas))
+        for path in _FIXTURES:
+            self.assertTrue(os.path.isfile(os.path.join(self.record_directory, path)))
+
+        nina_client._session = None
+        data_service.get_cached_config.cache_clear()
+        nina_service._conditional_get_cache.clear()
+        nina_service._detailed_warning_geo_cache.clear()
+        # the host does not matter for the replay, nothing is requested
+        replay_url = "http://127.0.0.1:9/api31"
+        with patch('nina_service._API_URL', replay_url), \
+                patch('data_service.get_config', return_value=self._get_config(replay_directory=self.record_directory)):
+            self.assertEqual(warnings, nina_service.poll_dwd_warning())
+            self.assertEqual([area.coordinates for area in detailed_warning_geo.affected_areas],
+                             [area.coordinates for area in
+                              nina_service.get_detailed_warning_geo(_WARNING_ID, version=3).affected_areas])
+
+            # the replay answers conditional requests with 304
+            cache_key = (replay_url + "/dwd/mapData.json", None)
+            cached_warning_list = nina_service._conditional_get_cache[cache_key][2]
+            nina_service.poll_dwd_warning()
+            self.assertIs(cached_warning_list, nina_service._conditional_get_cache[cache_key][2])
+
+            # no fixture
+            self.assertEqual(404, nina_client.get(replay_url + "/lhp/mapData.json", "lhp/mapData").status_code)
+        self.assertEqual(2, self.server.statistics['requests'])
+
+    def test_stand_in_server(self):
+        with patch('data_service.get_config', return_value=self._get_config()):
+            response = nina_client.get(self.url + "/dwd/mapData.json", "dwd/mapData")
+            self.assertEqual(200, response.status_code)
+            self.assertEqual(_WARNING_ID, response.json()[0]["id"])
+
+            # not modified
+            response = nina_client.get(self.url + "/dwd/mapData.json", "dwd/mapData",
+                                       {"If-None-Match": response.headers["ETag"]})
+            self.assertEqual(304, response.status_code)
+
+            # injected errors
+            self.server.error_rate = 1.0
+            self.assertEqual(503, nina_client.get(self.url + "/dwd/mapData.json", "dwd/mapData").status_code)
+            self.assertEqual(1, self.server.statistics['injected_errors'])
+
+            # outside of the fixture directory
+            self.server.error_rate = 0.0
+            self.assertEqual(404, nina_client.get(self.url + "/../../etc/passwd", "test").status_code)
+
+
+if __name__ == '__main__':
+    unittest.main()
@@ -0,0 +1,498 @@
+import asyncio
+import http.server
+import json
+import sys
+import threading
+import time
+import unittest
+from datetime import datetime
+
+from mock import patch
+from requests import HTTPError
+
+sys.path.insert(0, "..\\source")
+
+import data_service
+import nina_client
+import nina_service
+import nina_service_async
+from enum_types import WarningCategory, WarningSeverity, WarningType
+
+_FIXTURES = {"/dwd/mapData.json": "data/nina/dwd_mapData.json",
+             "/warnings/dwdmap.2.49.0.0.276.0.DWD.PVW.1676300000000.test.json": "data/nina/warning.json",
+             "/warnings/dwdmap.2.49.0.0.276.0.DWD.PVW.1676300000000.test.geojson": "data/nina/warning.geojson",
+             "/dashboard/064110000000.json": "data/nina/dashboard.json",
+             "/appdata/covid/covidrules/DE/064110000000.json": "data/nina/covidrules.json"}
+_ETAG = '"fixture-v1"'
+_LAST_MODIFIED = "Mon, 13 Feb 2023 15:00:00 GMT"
+
+
+class _StandInNinaRequestHandler(http.server.BaseHTTPRequestHandler):
+    """
+    Serves the fixtures like the NINA API: the mapData feed with an ETag, the warning document with Last-Modified.
+    Every answer is delayed by delay_in_seconds, while broken is True every answer is 503, while error_body is True
+    every answer is 404 with a json body and while always_not_modified is True every answer is 304.
+    """
+    full_responses = 0
+    all_requests = 0
+    delay_in_seconds = 0
+    broken = False
+    error_body = False
+    always_not_modified = False
+
+    def do_GET(self):
+        _StandInNinaRequestHandler.all_requests += 1
+        time.sleep(_StandInNinaRequestHandler.delay_in_seconds)
+        path = self.path
+        if _StandInNinaRequestHandler.broken:
+            self.send_response(503)
+            self.end_headers()
+            return
+        if _StandInNinaRequestHandler.error_body:
+            body = b'{"message": "not found"}'
+            self.send_response(404)
+            self.send_header("Content-Type", "application/json")
+            self.send_header("Content-Length", str(len(body)))
+            self.end_headers()
+            self.wfile.write(body)
+            return
+        if _StandInNinaRequestHandler.always_not_modified:
+            self.send_response(304)
+            self.end_headers()
+            return
+        if path not in _FIXTURES:
+            self.send_response(404)
+            self.end_headers()
+            return
+        if path.startswith("/warnings/"):
+            not_modified = self.headers.get("If-Modified-Since") == _LAST_MODIFIED
+        else:
+            not_modified = self.headers.get("If-None-Match") == _ETAG
+        if not_modified:
+            self.send_response(304)
+            self.end_headers()
+            return
+
+        _StandInNinaRequestHandler.full_responses += 1
+        with open(_FIXTURES[path], "rb") as fixture:
+            body = fixture.read()
+        self.send_response(200)
+        self.send_header("Content-Type", "application/json")
+        self.send_header("Content-Length", str(len(body)))
+        if path.startswith("/warnings/"):
+            self.send_header("Last-Modified", _LAST_MODIFIED)
+        else:
+            self.send_header("ETag", _ETAG)
+        self.end_headers()
+        self.wfile.write(body)
+
+    def log_message(self, format, *args):
+        pass
+
+
+class MyTestCase(unittest.TestCase):
+    @classmethod
+    def setUpClass(cls):
+        cls.server = http.server.ThreadingHTTPServer(("127.0.0.1", 0), _StandInNinaRequestHandler)
+        cls.url = "http://127.0.0.1:" + str(cls.server.server_address[1])
+        threading.Thread(target=cls.server.serve_forever, daemon=True).start()
+
+    @classmethod
+    def tearDownClass(cls):
+        cls.server.shutdown()
+
+    def setUp(self):
+        data_service.get_cached_config.cache_clear()
+        nina_service._conditional_get_cache.clear()
+        nina_service._detailed_warning_cache.clear()
+        nina_service._detailed_warning_geo_cache.clear()
+        nina_service._active_warning_versions.clear()
+        _StandInNinaRequestHandler.full_responses = 0
+        _StandInNinaRequestHandler.all_requests = 0
+        _StandInNinaRequestHandler.delay_in_seconds = 0
+        _StandInNinaRequestHandler.broken = False
+        _StandInNinaRequestHandler.error_body = False
+        _StandInNinaRequestHandler.always_not_modified = False
+        nina_client._circuit_breakers.clear()
+        nina_service._last_good_feed_results.clear()
+        nina_service._failed_feeds.clear()
+        nina_service._dashboard_cache.clear()
+        nina_service._covid_cache.clear()
+        nina_service._filtered_html_cache.clear()
+
+    def test_map_data_not_modified(self):
+        with patch('nina_service._API_URL', self.url):
+            warnings = nina_service.poll_dwd_warning()
+            self.assertEqual(1, len(warnings))
+            self.assertEqual("Amtliche WARNUNG vor GLÄTTE", warnings[0].title)
+
+            # second poll gets 304 and reuses the parsed warnings
+            self.assertEqual(warnings, nina_service.poll_dwd_warning())
+            self.assertEqual(1, _StandInNinaRequestHandler.full_responses)
+
+            # the cached list can not be changed by the caller
+            warnings.clear()
+            self.assertEqual(1, len(nina_service.poll_dwd_warning()))
+
+    def test_warning_document_not_modified(self):
+        warning_id = "dwdmap.2.49.0.0.276.0.DWD.PVW.1676300000000.test"
+        with patch('nina_service._API_URL', self.url):
+            detailed_warning = nina_service.get_detailed_warning(warning_id)
+            self.assertEqual(["106432000"], detailed_warning.info.area[0].geocode)
+            self.assertIs(detailed_warning, nina_service.get_detailed_warning(warning_id))
+            self.assertEqual(1, _StandInNinaRequestHandler.full_responses)
+
+            # another language is parsed separately
+            self.assertIsNone(nina_service.get_detailed_warning(warning_id, "en").info)
+            self.assertEqual(2, _StandInNinaRequestHandler.full_responses)
+
+    def test_cache_is_bounded(self):
+        with patch('nina_service._API_URL', self.url), \
+                patch('data_service.get_config', return_value={'nina_conditional_get_cache_size': 1,
+                                                               'nina_http_connect_timeout_in_seconds': 5,
+                                                               'nina_http_read_timeout_in_seconds': 5,
+                                                               'nina_http_max_retries': 0,
+                                                               'nina_http_backoff_in_seconds': 0,
+                                                               'nina_http_pool_size': 1,
+                                                               'nina_http_record_directory': None,
+                                                               'nina_http_replay_directory': None,
+                                                               'nina_html_filter_cache_size': 10,
+                                                               'nina_circuit_breaker_window_size': 10,
+                                                               'nina_circuit_breaker_minimum_requests': 4,
+                                                               'nina_circuit_breaker_failure_rate': 0.5,
+                                                               'nina_circuit_breaker_cool_down_in_seconds': 60}):
+            nina_service.poll_dwd_warning()
+            nina_service.get_detailed_warning("dwdmap.2.49.0.0.276.0.DWD.PVW.1676300000000.test")
+            self.assertEqual(1, len(nina_service._conditional_get_cache))
+
+            # the mapData entry was dropped, so the feed is downloaded again
+            nina_service.poll_dwd_warning()
+            self.assertEqual(3, _StandInNinaRequestHandler.full_responses)
+
+
+    def test_general_warning_is_parsed_lazily(self):
+        with open("data/nina/dwd_mapData.json", "rb") as fixture:
+            warning = nina_service._parse_general_warnings(json.load(fixture))[0]
+        self.assertFalse(hasattr(warning, "__dict__"))
+        self.assertEqual(WarningSeverity.MINOR, warning.severity)
+        # start date, type and title are only converted on first access
+        self.assertIsNone(warning._start_date)
+        self.assertEqual("Update", warning._type)
+        self.assertEqual(nina_service.GeneralWarning("dwdmap.2.49.0.0.276.0.DWD.PVW.1676300000000.test", 3,
+                                                     nina_service._translate_time("2023-02-13T16:00:00+01:00"),
+                                                     WarningSeverity.MINOR, WarningType.UPDATE,
+                                                     "Amtliche WARNUNG vor GLÄTTE"), warning)
+        self.assertEqual(WarningType.UPDATE, warning._type)
+
+    def test_detailed_warning_version_cache(self):
+        warning_id = "dwdmap.2.49.0.0.276.0.DWD.PVW.1676300000000.test"
+        with patch('nina_service._API_URL', self.url):
+            detailed_warning = nina_service.get_detailed_warning(warning_id, version=3)
+            # same version: no request at all
+            self.assertIs(detailed_warning, nina_service.get_detailed_warning(warning_id, version=3))
+            self.assertEqual(1, _StandInNinaRequestHandler.all_requests)
+
+            # new version: requested again, the old version is removed
+            nina_service.get_detailed_warning(warning_id, version=4)
+            self.assertEqual(2, _StandInNinaRequestHandler.all_requests)
+            self.assertEqual([(warning_id, 4, "de")], list(nina_service._detailed_warning_cache.keys()))
+
+            # without a version the version of the last poll is used
+            general_warning = nina_service.GeneralWarning(warning_id, 4, "2023-02-13 04:00", WarningSeverity.MINOR,
+                                                          WarningType.UPDATE, "Amtliche WARNUNG vor GLÄTTE")
+            nina_service._update_active_warning_versions([general_warning], False)
+            self.assertIs(nina_service.get_detailed_warning(warning_id, version=4),
+                          nina_service.get_detailed_warning(warning_id))
+            self.assertEqual(2, _StandInNinaRequestHandler.all_requests)
+
+            # incomplete poll without the warning: kept, complete poll without the warning: removed
+            nina_service._update_active_warning_versions([], False)
+            self.assertEqual(1, len(nina_service._detailed_warning_cache))
+            nina_service._update_active_warning_versions([], True)
+            self.assertEqual(0, len(nina_service._detailed_warning_cache))
+
+    def test_error_body_is_not_parsed(self):
+        warning_id = "dwdmap.2.49.0.0.276.0.DWD.PVW.1676300000000.test"
+        with patch('nina_service._API_URL', self.url):
+            _StandInNinaRequestHandler.error_body = True
+            with self.assertRaises(HTTPError):
+                nina_service.get_detailed_warning(warning_id, version=3)
+            self.assertEqual(0, len(nina_service._detailed_warning_cache))
+
+            # the version is requested again once the API answers
+            _StandInNinaRequestHandler.error_body = False
+            detailed_warning = nina_service.get_detailed_warning(warning_id, version=3)
+            self.assertEqual(["106432000"], detailed_warning.info.area[0].geocode)
+
+    def test_not_modified_without_cache_entry(self):
+        with patch('nina_service._API_URL', self.url):
+            _StandInNinaRequestHandler.always_not_modified = True
+            with self.assertRaises(HTTPError):
+                nina_service.get_detailed_warning("dwdmap.2.49.0.0.276.0.DWD.PVW.1676300000000.test")
+
+    def test_expired_warning_is_removed_from_caches(self):
+        warning_id = "dwdmap.2.49.0.0.276.0.DWD.PVW.1676300000000.test"
+        with patch('nina_service._API_URL', self.url):
+            detailed_warning = nina_service.get_detailed_warning(warning_id, version=3)
+            nina_service.get_detailed_warning_geo(warning_id, version=3)
+            self.assertEqual(datetime.fromisoformat("2023-02-14T10:00:00+01:00").timestamp(),
+                             detailed_warning.info.expires)
+            self.assertEqual(2, len(nina_service._conditional_get_cache))
+
+            nina_service.poll_dwd_warning()
+            nina_service.remove_warning_from_caches(warning_id)
+            self.assertEqual(0, len(nina_service._detailed_warning_cache))
+            self.assertEqual(0, len(nina_service._detailed_warning_geo_cache))
+            # only the mapData feed is left
+            self.assertEqual([self.url + "/dwd/mapData.json"],
+                             [url for url, language in nina_service._conditional_get_cache])
+
+    def test_detailed_warning_geo_stream(self):
+        warning_id = "dwdmap.2.49.0.0.276.0.DWD.PVW.1676300000000.test"
+
+        async def get_detailed_warning_geo():
+            try:
+                return await nina_service_async.get_detailed_warning_geo(warning_id, version=3)
+            finally:
+                await nina_service_async.close_session()
+
+        with patch('nina_service._API_URL', self.url):
+            detailed_warning_geo = nina_service.get_detailed_warning_geo(warning_id, version=3)
+            # the feature without geometry is skipped
+            self.assertEqual(2, len(detailed_warning_geo.affected_areas))
+            polygon, multi_polygon = detailed_warning_geo.affected_areas
+            self.assertEqual([[8.0, 49.0], [8.4, 49.0], [8.4, 49.4], [8.0, 49.4], [8.0, 49.0]],
+                             polygon.coordinates[0])
+            self.assertEqual(2, len(polygon.get_rings()))
+            self.assertEqual(2, len(multi_polygon.get_rings()))
+            self.assertEqual([9.5, 50.5], multi_polygon.get_rings()[0][2].tolist())
+
+            # not modified: the parsed geometries are reused
+            self.assertIs(detailed_warning_geo, nina_service.get_detailed_warning_geo(warning_id, version=4))
+            self.assertEqual(1, _StandInNinaRequestHandler.full_responses)
+
+            # the coroutine version parses the same geometries
+            nina_service._detailed_warning_geo_cache.clear()
+            async_detailed_warning_geo = asyncio.run(get_detailed_warning_geo())
+            self.assertEqual([area.coordinates for area in detailed_warning_geo.affected_areas],
+                             [area.coordinates for area in async_detailed_warning_geo.affected_areas])
+
+            # an error status raises instead of being parsed
+            with self.assertRaises(HTTPError):
+                nina_service.get_detailed_warning_geo("unknown", version=1)
+
+    def test_filtered_html_is_reused(self):
+        warning_id = "dwdmap.2.49.0.0.276.0.DWD.PVW.1676300000000.test"
+        statistics = nina_service.get_html_filter_statistics()
+        with patch('nina_service._API_URL', self.url):
+            detailed_warning = nina_service.get_detailed_warning(warning_id, version=3)
+            self.assertEqual("Es tritt leichter Frost auf.", detailed_warning.info.description)
+
+            # a new version with the same description: the filtered text is reused
+            nina_service._conditional_get_cache.clear()
+            new_detailed_warning = nina_service.get_detailed_warning(warning_id, version=4)
+            self.assertIsNot(detailed_warning, new_detailed_warning)
+            self.assertIs(detailed_warning.info.description, new_detailed_warning.info.description)
+        self.assertEqual(statistics['misses'] + 1, nina_service.get_html_filter_statistics()['misses'])
+        self.assertEqual(statistics['hits'] + 1, nina_service.get_html_filter_statistics()['hits'])
+
+    def test_concurrent_requests_are_coalesced(self):
+        _StandInNinaRequestHandler.delay_in_seconds = 0.3
+        thread_count = 8
+        barrier = threading.Barrier(thread_count)
+        results = []
+
+        def poll():
+            barrier.wait()
+            results.append(nina_service.poll_dwd_warning())
+
+        statistics_before = nina_service.get_single_flight_statistics()
+        with patch('nina_service._API_URL', self.url):
+            threads = [threading.Thread(target=poll) for i in range(0, thread_count)]
+            for thread in threads:
+                thread.start()
+            for thread in threads:
+                thread.join()
+
+        # one request to the API, all threads get the same warnings
+        self.assertEqual(1, _StandInNinaRequestHandler.all_requests)
+        self.assertEqual(thread_count, len(results))
+        for result in results:
+            self.assertEqual(results[0], result)
+        statistics = nina_service.get_single_flight_statistics()
+        self.assertEqual(thread_count, statistics['requests'] - statistics_before['requests'])
+        self.assertEqual(thread_count - 1, statistics['absorbed'] - statistics_before['absorbed'])
+        self.assertEqual(0, len(nina_service._in_flight_requests))
+
+    def test_async_all_active_warnings(self):
+        async def get_all_active_warnings():
+            try:
+                return await nina_service_async.get_all_active_warnings()
+            finally:
+                await nina_service_async.close_session()
+
+        with patch('nina_service._API_URL', self.url):
+            # only the dwd feed is served, the other feeds fail and are skipped
+            warnings = asyncio.run(get_all_active_warnings())
+        self.assertEqual(1, len(warnings))
+        self.assertEqual("Amtliche WARNUNG vor GLÄTTE", warnings[0][0].title)
+        self.assertEqual(WarningCategory.WEATHER, warnings[0][1])
+        self.assertEqual(warnings[0][0].version, nina_service._active_warning_versions[warnings[0][0].id])
+
+    def test_async_prefetch_fills_the_cache(self):
+        warning_id = "dwdmap.2.49.0.0.276.0.DWD.PVW.1676300000000.test"
+        general_warning = nina_service.GeneralWarning(warning_id, 3, "2023-02-13 04:00", WarningSeverity.MINOR,
+                                                      WarningType.UPDATE, "Amtliche WARNUNG vor GLÄTTE")
+        with patch('nina_service._API_URL', self.url):
+            nina_service_async.prefetch_detailed_warnings([general_warning])
+            self.assertEqual(1, _StandInNinaRequestHandler.all_requests)
+
+            # the synchronous call reads the cache
+            detailed_warning = nina_service.get_detailed_warning(warning_id, version=3)
+            self.assertEqual(["106432000"], detailed_warning.info.area[0].geocode)
+            self.assertEqual(1, _StandInNinaRequestHandler.all_requests)
+
+    def test_async_gather_is_bounded(self):
+        running = 0
+        max_running = 0
+
+        async def call(i: int) -> int:
+            nonlocal running, max_running
+            running += 1
+            max_running = max(max_running, running)
+            await asyncio.sleep(0.01)
+            running -= 1
+            if i == 3:
+                raise ValueError()
+            return i
+
+        results = asyncio.run(nina_service_async.gather([lambda i=i: call(i) for i in range(0, 10)], 2))
+        self.assertEqual(2, max_running)
+        self.assertEqual([0, 1, 2], results[:3])
+        self.assertIsInstance(results[3], ValueError)
+
+    def test_broken_feed_is_served_stale(self):
+        config = {'nina_conditional_get_cache_size': 1024, 'nina_http_connect_timeout_in_seconds': 5,
+                  'nina_http_read_timeout_in_seconds': 5, 'nina_http_max_retries': 0,
+                  'nina_http_backoff_in_seconds': 0, 'nina_http_pool_size': 1, 'nina_http_record_directory': None,
+                  'nina_http_replay_directory': None,
+                  'nina_circuit_breaker_window_size': 2, 'nina_circuit_breaker_minimum_requests': 2,
+                  'nina_circuit_breaker_failure_rate': 1.0, 'nina_circuit_breaker_cool_down_in_seconds': 60}
+        with patch('nina_service._API_URL', self.url), patch('data_service.get_config', return_value=config):
+            warnings, failed_categories, stale_categories = nina_service.poll_all_active_warnings()
+            self.assertEqual(1, len(warnings))
+            self.assertNotIn(WarningCategory.WEATHER, failed_categories)
+
+            # the dwd feed breaks: its last warnings are used and marked stale
+            _StandInNinaRequestHandler.broken = True
+            for i in range(0, 2):
+                warnings, failed_categories, stale_categories = nina_service.poll_all_active_warnings()
+                self.assertEqual(1, len(warnings))
+                self.assertIn(WarningCategory.WEATHER, stale_categories)
+
+            # the circuit breaker is open, the feed is not requested anymore
+            requests_before = _StandInNinaRequestHandler.all_requests
+            warnings, failed_categories, stale_categories = nina_service.poll_all_active_warnings()
+            self.assertEqual(1, len(warnings))
+            self.assertIn(WarningCategory.WEATHER, stale_categories)
+            self.assertEqual(requests_before, _StandInNinaRequestHandler.all_requests)
+            self.assertEqual("open", nina_client.get_circuit_breaker_statistics()['dwd/mapData']['state'])
+
+    def test_poll_some_feeds(self):
+        with patch('nina_service._API_URL', self.url):
+            result = nina_service.poll_active_warnings({"dwd"})
+            self.assertEqual(1, len(result.warnings))
+            self.assertEqual({"dwd"}, result.changed_feeds)
+            self.assertEqual(1, _StandInNinaRequestHandler.all_requests)
+
+            # the other feeds were not polled yet
+            self.assertIn(WarningCategory.FLOOD, result.failed_categories)
+            self.assertNotIn(WarningCategory.WEATHER, result.failed_categories)
+
+            # the dwd feed is not polled again, but its warnings are kept
+            result = nina_service.poll_active_warnings({"mowas"})
+            self.assertEqual(1, len(result.warnings))
+            self.assertEqual({"mowas"}, set(result.feed_results.keys()))
+            self.assertIsNone(result.feed_results["mowas"])  # 404 from the stand-in server
+
+            # unchanged
+            self.assertEqual(set(), nina_service.poll_active_warnings({"dwd"}).changed_feeds)
+
+    def test_regional_warnings(self):
+        with patch('nina_service._API_URL', self.url):
+            warnings = nina_service.get_regional_warnings("06411")
+            self.assertEqual(2, len(warnings))
+            self.assertEqual("Amtliche WARNUNG vor GLÄTTE", warnings[0][0].title)
+            self.assertEqual(3, warnings[0][0].version)
+            self.assertEqual(WarningCategory.WEATHER, warnings[0][1])
+            self.assertEqual(WarningSeverity.SEVERE, warnings[1][0].severity)
+            self.assertEqual(WarningCategory.CIVIL_PROTECTION, warnings[1][1])
+
+            # cached per district
+            self.assertEqual(warnings, nina_service.get_regional_warnings("06411"))
+            self.assertEqual(1, _StandInNinaRequestHandler.all_requests)
+
+            # unknown district
+            with self.assertRaises(HTTPError):
+                nina_service.get_regional_warnings("01001")
+
+    def test_malformed_dashboard_entries_are_skipped(self):
+        with open("data/nina/dashboard.json", encoding="utf-8") as file:
+            response = json.load(file)
+        response[0]["startDate"] = "not a date"
+        response.insert(1, {"id": "broken", "payload": ["no", "dictionary"]})
+
+        warnings = nina_service._parse_dashboard(response)
+        self.assertEqual(["mow.DE-HE-DA-S001-20230213-001"], [warning.id for warning, category in warnings])
+
+    def test_regional_warnings_ttl(self):
+        with patch('nina_service._API_URL', self.url), \
+                patch('data_service.get_config', return_value={'nina_dashboard_cache_ttl_in_seconds': 0,
+                                                               'nina_http_connect_timeout_in_seconds': 5,
+                                                               'nina_http_read_timeout_in_seconds': 5,
+                                                               'nina_http_max_retries': 0,
+                                                               'nina_http_backoff_in_seconds': 0,
+                                                               'nina_http_pool_size': 1,
+                                                               'nina_http_record_directory': None,
+                                                               'nina_http_replay_directory': None,
+                                                               'nina_circuit_breaker_window_size': 10,
+                                                               'nina_circuit_breaker_minimum_requests': 4,
+                                                               'nina_circuit_breaker_failure_rate': 0.5,
+                                                               'nina_circuit_breaker_cool_down_in_seconds': 60}):
+            nina_service.get_regional_warnings("06411")
+            nina_service.get_regional_warnings("06411")
+            self.assertEqual(2, _StandInNinaRequestHandler.all_requests)
+
+    def test_covid_data_cache(self):
+        with patch('nina_service._API_URL', self.url):
+            # one request for the infos and the rules
+            covid_info = nina_service.get_covid_infos("06411")
+            covid_rules = nina_service.get_covid_rules("06411")
+            self.assertEqual("Infektionsgefahr Stufe 1", covid_info.infektionsgefahr_stufe)
+            self.assertEqual("Bundesland: 45,6", covid_info.sieben_tage_inzidenz_bundesland)
+            self.assertIsNone(covid_rules.school_kita_rules)
+            self.assertEqual(1, _StandInNinaRequestHandler.all_requests)
+
+            # the prefetcher requests again, a failing district does not stop it
+            nina_service.prefetch_covid_data(["01001", "06411", "06411"])
+            self.assertEqual(3, _StandInNinaRequestHandler.all_requests)
+            self.assertIsNot(covid_rules, nina_service.get_covid_rules("06411"))
+            self.assertEqual(3, _StandInNinaRequestHandler.all_requests)
+
+            with self.assertRaises(HTTPError):
+                nina_service.get_covid_rules("01001")
+
+            # expired
+            with patch('time.monotonic', return_value=time.monotonic() + 901):
+                nina_service.get_covid_infos("06411")
+            self.assertEqual(5, _StandInNinaRequestHandler.all_requests)
+
+    def test_unknown_version_is_not_cached(self):
+        warning_id = "dwdmap.2.49.0.0.276.0.DWD.PVW.1676300000000.test"
+        with patch('nina_service._API_URL', self.url):
+            nina_service.get_detailed_warning(warning_id)
+            self.assertEqual(0, len(nina_service._detailed_warning_cache))
+
+
+if __name__ == '__main__':
+    unittest.main()
@@ -50,6 +50,16 @@ class MyTestCase(unittest.TestCase):
         should_be = "first "
         self.assertEqual(should_be, nina_string_helper.filter_html_tags(input_value))
 
+        # line break and nonbreaking space
+        input_value = "<p>Glätte&nbsp;möglich<br>Stand: heute</p>"
+        should_be = "Glätte möglich\nStand: heute\n"
+        self.assertEqual(should_be, nina_string_helper.filter_html_tags(input_value))
+
+        # every link is pasted after its own hyperlink text
+        input_value = "<p>1 <a href=\"https://a.de\">A</a> 2 <a href=\"https://b.de\">B</a></p>"
+        should_be = "1 A: https://a.de 2 B: https://b.de\n"
+        self.assertEqual(should_be, nina_string_helper.filter_html_tags(input_value))
+
 
 if __name__ == '__main__':
     unittest.main()
@@ -1,33 +1,56 @@
+import dataclasses
+import types
 import unittest
 import importlib.util
+import sys
+
+import requests
+import shapely
+from mock import patch
+
+sys.path.insert(0, "..\\source")
+
+import data_service
+from postal_code_store import PostalCodeStore
 
 place_converter = importlib.util.spec_from_file_location("place_converter", "../source/place_converter.py") \
     .loader.load_module()
 
+_SOURCES = data_service.get_config()['reference_data_sources']
+
+
+def _get_square(x: float, y: float, size: float = 1.0) -> list:
+    return [[x, y], [x + size, y], [x + size, y + size], [x, y + size], [x, y]]
+
 
 class MyTestCase(unittest.TestCase):
 
     def test_fill_districts_dict(self):
         # method does not return anything
-        self.assertEqual(None, place_converter._fill_districts_dict())
+        districts_dictionary = {}
+        self.assertEqual(None, place_converter._fill_districts_dict(districts_dictionary, _SOURCES['districts']))
 
         # dictionary test
         input_value = "06434"
         should_be = "Hochtaunuskreis"
-        self.assertEqual(should_be, place_converter._districts_dictionary[input_value])
+        self.assertEqual(should_be, districts_dictionary[input_value])
+        self.assertEqual(should_be, place_converter._get_reference_data().districts[input_value])
 
     def test_fill_places_dict(self):
         # method does not return anything
-        self.assertEqual(None, place_converter._fill_places_dict())
+        places_dictionary = {}
+        self.assertEqual(None, place_converter._fill_places_dict(places_dictionary,
+                                                                 place_converter._get_reference_data().districts,
+                                                                 _SOURCES['places']))
 
         # dictionary test
         input_value = "064120000000"
         should_be = "Frankfurt am Main, Stadt"
-        self.assertEqual(should_be, place_converter._places_dictionary[input_value])
+        self.assertEqual(should_be, places_dictionary[input_value])
+        self.assertEqual(should_be, place_converter._get_reference_data().places[input_value])
 
-    def test_fill_postal_code_dict(self):
-        # method does not return anything
-        self.assertEqual(None, place_converter._fill_postal_code_dict())
+    def test_get_postal_code_store(self):
+        postal_code_store = place_converter._get_postal_code_store(_SOURCES['postal_codes'])
 
         # dictionary test
         input_value = "84076"
@@ -478,16 +501,42 @@ class MyTestCase(unittest.TestCase):
                                                 [11.8800234, 48.6540692], [11.8791838, 48.653649],
                                                 [11.8788852, 48.6535999], [11.8782872, 48.6537154],
                                                 [11.8779226, 48.6537032]]]
-        self.assertEqual(should_be, place_converter._postal_code_dictionary[input_value])
-
-    def test_fill_postal_place_dict(self):
-        # method does not return anything
-        self.assertEqual(None, place_converter._fill_postal_place_dict())
+        self.assertEqual(should_be, postal_code_store[input_value])
+        self.assertEqual(should_be, place_converter._get_reference_data().postal_codes[input_value])
 
-        # dictionary test
+    def test_postal_places(self):
         input_value = "84076"
         should_be = "Pfeffenhausen"
-        self.assertEqual(should_be, place_converter._postal_place_dictionary[input_value])
+        self.assertEqual(should_be, place_converter._get_reference_data().postal_places[input_value])
+
+    def test_import_downloads_nothing(self):
+        # spawned processes (postal_code_mapper) import the modules of the bot again
+        with patch('requests.get') as get_mock:
+            module = importlib.util.module_from_spec(
+                importlib.util.spec_from_file_location("place_converter_import", "../source/place_converter.py"))
+            module.__spec__.loader.exec_module(module)
+        get_mock.assert_not_called()
+        self.assertIsNone(module._reference_data)
+
+    def test_refresh_reference_data(self):
+        old_reference_data = place_converter._get_reference_data()
+        self.assertTrue(place_converter.refresh_reference_data())
+        self.assertIsNot(old_reference_data, place_converter._get_reference_data())
+        self.assertEqual("Hochtaunuskreis", place_converter._get_reference_data().districts["06434"])
+
+        # lookups that already hold the old snapshot keep working on it
+        result_list = place_converter._get_dicts_for_postal_code("61440", 11, old_reference_data)
+        self.assertEqual("Oberursel (Taunus), Stadt", result_list[0]['place_name'])
+
+        # failed download -> old snapshot stays
+        current_reference_data = place_converter._get_reference_data()
+        with patch('requests.get', side_effect=requests.exceptions.ConnectionError("no connection")):
+            self.assertFalse(place_converter.refresh_reference_data())
+        self.assertIs(current_reference_data, place_converter._get_reference_data())
+
+        # snapshots are immutable
+        with self.assertRaises(TypeError):
+            place_converter._get_reference_data().districts["06434"] = "changed"
 
     def test_get_exact_address_from_coordinates(self):
         # if district is not mentioned in address
@@ -672,6 +721,52 @@ class MyTestCase(unittest.TestCase):
         should_be = "06434"
         self.assertEqual(should_be, result_list[0]['district_id'])
 
+    def test_normalize_query(self):
+        should_be = "duesseldorf"
+        self.assertEqual(should_be, place_converter._normalize_query("Düsseldorf"))
+        self.assertEqual(should_be, place_converter._normalize_query(" DUESSELDORF "))
+        self.assertEqual("gross-gerau", place_converter._normalize_query("Groß-Gerau"))
+        self.assertEqual("frankfurt am main", place_converter._normalize_query("Frankfurt   am\tMain"))
+
+    def test_suggestion_cache(self):
+        cache = place_converter._SuggestionCache(2)
+        self.assertEqual(None, cache.get(("a", 11, "covid")))
+        cache.put(("a", 11, "covid"), [{'place_name': "a"}])
+        cache.put(("b", 11, "covid"), [{'place_name': "b"}])
+        self.assertEqual([{'place_name': "a"}], cache.get(("a", 11, "covid")))
+
+        # least recently used entry is dropped
+        cache.put(("c", 11, "covid"), [{'place_name': "c"}])
+        self.assertEqual(None, cache.get(("b", 11, "covid")))
+
+        # cached results can not be changed by the caller
+        cache.get(("a", 11, "covid"))[0]['place_name'] = "changed"
+        self.assertEqual([{'place_name': "a"}], cache.get(("a", 11, "covid")))
+
+        should_be = {'hits': 3, 'misses': 2, 'hit_ratio': 0.6, 'size': 2, 'max_size': 2}
+        self.assertEqual(should_be, cache.get_statistics())
+
+    def test_cached_suggestions(self):
+        hits_before = place_converter.get_suggestion_cache_statistics()['hits']
+        result_list = place_converter.get_non_covid_dict_suggestions("München")
+        self.assertEqual(result_list, place_converter.get_non_covid_dict_suggestions(" muenchen"))
+        self.assertEqual(hits_before + 1, place_converter.get_suggestion_cache_statistics()['hits'])
+
+        # modes are cached separately
+        self.assertNotIn('place_id', place_converter.get_non_covid_dict_suggestions("Oberursel")[0])
+        self.assertIn('place_id', place_converter.get_dict_suggestions("Oberursel")[0])
+
+    def test_get_postal_code_dicts_with_prefix(self):
+        result_list = place_converter._get_postal_code_dicts_with_prefix("6144", 11)
+        self.assertIn("61440", [result_dict['postal_code'] for result_dict in result_list])
+        for result_dict in result_list:
+            self.assertTrue(result_dict['postal_code'].startswith("6144"))
+
+        # incomplete postal code in the suggestions
+        result_list = place_converter.get_non_covid_dict_suggestions("642", 5)
+        self.assertEqual(5, len(result_list))
+        self.assertTrue(result_list[0]['postal_code'].startswith("642"))
+
     def test_get_place_name_from_dict(self):
         # place name is not None
         input_value = {'district_name': 'district', 'district_id': '12345', 'place_name': 'place',
@@ -729,6 +824,66 @@ class MyTestCase(unittest.TestCase):
                       'district_name': 'Landshut'}]
         self.assertEqual(should_be, place_converter.get_postal_code_dicts_in_polygon(input_value))
 
+    def test_get_postal_codes_for_geocodes(self):
+        # the lookups do not compute the geocode table, until the refresher did the polygons are used
+        reference_data = place_converter._get_reference_data()
+        with patch('place_converter._reference_data',
+                   dataclasses.replace(reference_data, geocode_postal_codes=types.MappingProxyType({}))):
+            self.assertEqual(None, place_converter.get_postal_codes_for_geocodes(["092740000000"]))
+        self.assertTrue(place_converter._add_geocode_postal_codes())
+
+        # ARS of a district
+        input_value = ["092740000000"]
+        self.assertIn("84076", place_converter.get_postal_codes_for_geocodes(input_value))
+
+        # DWD warncell id of a district
+        input_value = ["109274000"]
+        self.assertIn("84076", place_converter.get_postal_codes_for_geocodes(input_value))
+
+        # duplicates are only returned once
+        input_value = ["092740000000", "109274000"]
+        result_list = place_converter.get_postal_codes_for_geocodes(input_value)
+        self.assertEqual(len(set(result_list)), len(result_list))
+
+        # one unknown geocode (a single municipality) -> polygons have to be used
+        input_value = ["092740000000", "092745555123"]
+        self.assertEqual(None, place_converter.get_postal_codes_for_geocodes(input_value))
+
+        # municipality warncell id of a Landkreis -> polygons have to be used
+        self.assertEqual(None, place_converter.get_postal_codes_for_geocodes(["809274000"]))
+        self.assertEqual(None, place_converter.get_postal_codes_for_geocodes(["809274139"]))
+
+        # municipality warncell id of a kreisfreie Stadt covers the whole district
+        self.assertIn("60311", place_converter.get_postal_codes_for_geocodes(["806412000"]))
+
+        # no geocodes
+        self.assertEqual(None, place_converter.get_postal_codes_for_geocodes([]))
+
+    def test_fill_geocode_postal_codes_dict(self):
+        # 10000 lies in 06411, 10001 reaches half into 06412, 10002 only touches 06412 where the borders of the data
+        # sets differ
+        postal_codes = PostalCodeStore([("10000", "Ort 0", "06411", _get_square(0, 0)),
+                                        ("10001", "Ort 1", "06411", _get_square(1, 0)),
+                                        ("10002", "Ort 2", "06413", _get_square(3, 0))])
+        district_areas = {"06411": shapely.box(0, 0, 1.5, 1), "06412": shapely.box(1.5, 0, 3.005, 1),
+                          "06413": shapely.box(3.005, 0, 4, 1)}
+        # 06411 is a kreisfreie Stadt, 06412 and 06413 are Landkreise
+        places = {"064110000000": "Darmstadt, Stadt", "064120001001": "Gemeinde"}
+        geocode_postal_codes = {}
+        place_converter._fill_geocode_postal_codes_dict(geocode_postal_codes, postal_codes, district_areas, places)
+
+        self.assertEqual(["10000", "10001"], geocode_postal_codes["064110000000"])
+        self.assertEqual(["10000", "10001"], geocode_postal_codes["106411000"])
+        self.assertEqual(["10001"], geocode_postal_codes["064120000000"])
+        self.assertEqual(["10001"], geocode_postal_codes["106412000"])
+        self.assertEqual(["10002"], geocode_postal_codes["106413000"])
+        self.assertEqual(["10000", "10001", "10002"], geocode_postal_codes["060000000000"])
+
+        # the municipality warncell id is only a key for the kreisfreie Stadt
+        self.assertEqual(["10000", "10001"], geocode_postal_codes["806411000"])
+        self.assertNotIn("806412000", geocode_postal_codes)
+        self.assertNotIn("806413000", geocode_postal_codes)
+
     def test_get_place_name_for_postal_code(self):
         input_value = "61440"
         should_be = "Oberursel (Taunus)"
@@ -0,0 +1,90 @@
+import sys
+import threading
+import unittest
+
+import numpy
+from mock import patch
+
+sys.path.insert(0, "..\\source")
+
+import data_service
+import postal_code_mapper
+import postal_code_store
+
+
+def _get_square(x: float, y: float, size: float = 1.0) -> list:
+    return [[x, y], [x + size, y], [x + size, y + size], [x, y + size], [x, y]]
+
+
+def _get_test_store() -> postal_code_store.PostalCodeStore:
+    # a row of squares 10000 (0-1), 10001 (1-2), 10002 (2-3) and a square with a hole 20000 (10-14 without 11-13)
+    records = [(str(10000 + i), "Ort " + str(i), "06411", _get_square(i, 0)) for i in range(3)]
+    records.append(("20000", "Ort mit Loch", "06412", [_get_square(10, 0, 4), _get_square(11, 1, 2)]))
+    # looked up on the module, postal_code_store_test executes it again and the workers unpickle the current class
+    return postal_code_store.PostalCodeStore(records)
+
+
+class MyTestCase(unittest.TestCase):
+    def tearDown(self):
+        postal_code_mapper.shutdown()
+
+    def test_postal_codes_in_rings(self):
+        index = postal_code_mapper._PostalCodeIndex(_get_test_store())
+
+        # overlaps 10001, touches 10000 and 10002 along one edge (a LineString, counted like before)
+        self.assertEqual(["10000", "10001", "10002"],
+                         index.get_postal_codes_in_rings([numpy.asarray(_get_square(1, 0.5))]))
+        # touches 10001 along two edges (a MultiLineString, left out like before)
+        u_shape = [[0.5, 0], [1, 0], [1, 1], [2, 1], [2, 0], [2.5, 0], [2.5, 1.5], [0.5, 1.5], [0.5, 0]]
+        self.assertEqual(["10000", "10002"], index.get_postal_codes_in_rings([numpy.asarray(u_shape)]))
+        # inside the hole of 20000
+        self.assertEqual([], index.get_postal_codes_in_rings([numpy.asarray(_get_square(11.5, 1.5, 0.5))]))
+        # every ring on its own, in the order of the rings and without duplicates
+        self.assertEqual(["20000", "10001", "10002"],
+                         index.get_postal_codes_in_rings([numpy.asarray(_get_square(12.5, 0.25, 0.5)),
+                                                          numpy.asarray(_get_square(1.25, 0.25, 1.0)),
+                                                          numpy.asarray(_get_square(1.5, 0.25, 0.25))]))
+
+    @patch('data_service.get_config', return_value={'postal_code_mapping_processes': 2})
+    def test_worker_processes(self, get_config_mock):
+        store = _get_test_store()
+        futures = [postal_code_mapper.submit(store, "warning " + str(i), [numpy.asarray(_get_square(i + 0.25, 0.25,
+                                                                                                    0.5))])
+                   for i in range(3)]
+        self.assertEqual([("warning 0", ["10000"]), ("warning 1", ["10001"]), ("warning 2", ["10002"])],
+                         [future.result() for future in futures])
+        executor = postal_code_mapper._executor
+
+        # the same store keeps the processes, a new store starts them again
+        postal_code_mapper.submit(store, "warning", []).result()
+        self.assertIs(executor, postal_code_mapper._executor)
+        self.assertEqual(("warning", []), postal_code_mapper.submit(postal_code_store.PostalCodeStore([]), "warning",
+                                                                    [numpy.asarray(_get_square(0, 0))]).result())
+        self.assertIsNot(executor, postal_code_mapper._executor)
+
+    @patch('data_service.get_config', return_value={'postal_code_mapping_processes': 1})
+    def test_workers_do_not_inherit_held_locks(self, get_config_mock):
+        # another thread of the bot holds a lock while the pool is started, a forked worker would get it held
+        lock_is_held = threading.Event()
+        release_lock = threading.Event()
+
+        def hold_lock():
+            with data_service.ACTIVE_WARNINGS_LOCK:
+                lock_is_held.set()
+                release_lock.wait()
+
+        holder = threading.Thread(target=hold_lock)
+        holder.start()
+        try:
+            lock_is_held.wait()
+            future = postal_code_mapper.submit(_get_test_store(), "warning",
+                                               [numpy.asarray(_get_square(0.25, 0.25, 0.5))])
+            self.assertEqual(("warning", ["10000"]), future.result(timeout=60))
+            self.assertEqual("spawn", postal_code_mapper._executor._mp_context.get_start_method())
+        finally:
+            release_lock.set()
+            holder.join()
+
+
+if __name__ == '__main__':
+    unittest.main()
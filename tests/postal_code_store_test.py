@@ -0,0 +1,87 @@
+import importlib.util
+import unittest
+
+postal_code_store = importlib.util.spec_from_file_location("postal_code_store", "../source/postal_code_store.py") \
+    .loader.load_module()
+
+_RING = [[11.8779226, 48.6537032], [11.8779944, 48.6539414], [11.8782944, 48.654433], [11.8779226, 48.6537032]]
+_SHELL = [[8.0, 49.0], [9.0, 49.0], [9.0, 50.0], [8.0, 50.0], [8.0, 49.0]]
+_HOLE = [[8.2, 49.2], [8.4, 49.2], [8.4, 49.4], [8.2, 49.2]]
+
+
+def _get_test_store():
+    return postal_code_store.PostalCodeStore([("84076", "Pfeffenhausen", "09274", _RING),
+                                              ("64283", "Darmstadt", "06411", [_SHELL, _HOLE]),
+                                              ("64285", "Darmstadt", "06411", _SHELL)])
+
+
+class MyTestCase(unittest.TestCase):
+    def test_record_behaves_like_list(self):
+        store = _get_test_store()
+
+        should_be = ["Pfeffenhausen", "09274", _RING]
+        self.assertEqual(should_be, store["84076"])
+        self.assertEqual("Pfeffenhausen", store["84076"][0])
+        self.assertEqual("09274", store["84076"][1])
+        self.assertEqual(_RING, store["84076"][2])
+
+        # polygon with a hole keeps its nested format
+        should_be = ["Darmstadt", "06411", [_SHELL, _HOLE]]
+        self.assertEqual(should_be, store["64283"])
+
+        # unknown postal code
+        with self.assertRaises(KeyError):
+            store["00000"]
+
+    def test_rings(self):
+        store = _get_test_store()
+
+        rings = store["64283"].rings
+        self.assertEqual(2, len(rings))
+        self.assertEqual((5, 2), rings[0].shape)
+        self.assertEqual(_HOLE, rings[1].tolist())
+
+        # the rings are views on the shared buffer
+        with self.assertRaises(ValueError):
+            rings[0][0][0] = 0.0
+
+    def test_mapping(self):
+        store = _get_test_store()
+
+        # sorted by postal code
+        self.assertEqual(["64283", "64285", "84076"], list(store))
+        self.assertEqual(3, len(store))
+        self.assertIn("64285", store)
+        self.assertNotIn("00000", store)
+        self.assertNotIn("99999", store)
+        self.assertNotIn(64285, store)
+        self.assertEqual(["64283", "64285", "84076"], [record.postal_code for record in store.records()])
+
+    def test_records_with_prefix(self):
+        store = _get_test_store()
+
+        self.assertEqual(["64283", "64285"], [record.postal_code for record in store.records_with_prefix("642")])
+        self.assertEqual(["64283"], [record.postal_code for record in store.records_with_prefix("642", 1)])
+        self.assertEqual(["84076"], [record.postal_code for record in store.records_with_prefix("84076")])
+        self.assertEqual(3, len(list(store.records_with_prefix(""))))
+
+        # no match
+        self.assertEqual([], list(store.records_with_prefix("7")))
+        self.assertEqual([], list(store.records_with_prefix("642830")))
+
+    def test_place_names(self):
+        store = _get_test_store()
+
+        self.assertEqual("Darmstadt", store.place_names["64285"])
+        should_be = {"84076": "Pfeffenhausen", "64283": "Darmstadt", "64285": "Darmstadt"}
+        self.assertEqual(should_be, dict(store.place_names.items()))
+        self.assertIs(str, type(store.place_names["64285"]))
+
+    def test_empty_store(self):
+        store = postal_code_store.PostalCodeStore([])
+        self.assertEqual(0, len(store))
+        self.assertEqual({}, dict(store.place_names))
+
+
+if __name__ == '__main__':
+    unittest.main()
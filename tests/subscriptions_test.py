@@ -8,6 +8,7 @@ sys.path.insert(0, "..\source")
 
 import nina_service
 import subscriptions
+import warning_feed
 from nina_service import GeneralWarning, WarningCategory, WarningType, WarningSeverity
 
 
@@ -62,9 +63,7 @@ class TestSubscriptions(TestCase):
     @patch('data_service.add_warning_id_to_users_warnings_received_list')
     @patch('subscriptions._any_user_subscription_matches_warning')
     @patch('data_service.get_chat_ids_of_warned_users')
-    @patch('nina_service.get_all_active_warnings')
     def test_warn_users(self,
-                        get_all_active_warnings_mock,
                         get_chat_ids_of_warned_users_mock,
                         any_user_subscription_matches_warning_mock,
                         add_warning_id_to_users_warnings_received_list_mock,
@@ -90,16 +89,14 @@ class TestSubscriptions(TestCase):
 
         with self.subTest('There are no active warnings'):
             has_user_already_received_warning_mock.return_value = False
-            get_all_active_warnings_mock.return_value = []
             get_chat_ids_of_warned_users_mock.return_value = chat_ids
-            result = subscriptions.warn_users()
+            result = subscriptions.warn_users([])
             self.assertFalse(result)
 
         with self.subTest('There are active warnings but no user wants to be warned'):
             has_user_already_received_warning_mock.return_value = False
-            get_all_active_warnings_mock.return_value = [warning_1, warning_2]
             get_chat_ids_of_warned_users_mock.return_value = []
-            result = subscriptions.warn_users()
+            result = subscriptions.warn_users([warning_1, warning_2])
             self.assertFalse(result)
 
         with self.subTest('There are active warnings and all users want to be warned'):
@@ -107,7 +104,7 @@ class TestSubscriptions(TestCase):
             any_user_subscription_matches_warning_mock.return_value = True
             send_detailed_general_warnings_mock.return_value = 4
             get_chat_ids_of_warned_users_mock.return_value = chat_ids
-            result = subscriptions.warn_users()
+            result = subscriptions.warn_users([warning_1, warning_2])
             self.assertTrue(result)
 
         with self.subTest('There are active warnings and some users want to be warned'):
@@ -116,10 +113,60 @@ class TestSubscriptions(TestCase):
             get_chat_ids_of_warned_users_mock.return_value = chat_ids
             send_detailed_general_warnings_mock.call_count = 0
             send_detailed_general_warnings_mock.return_value = 2
-            result = subscriptions.warn_users()
+            result = subscriptions.warn_users([warning_1, warning_2])
             self.assertEqual(send_detailed_general_warnings_mock.call_count, 2)  # only chat_id=123 should be warned
             self.assertTrue(result)
 
+    @patch('data_service.get_active_warnings_dict')
+    @patch('data_service.get_subscriptions')
+    @patch('data_service.get_chat_ids_of_warned_users')
+    @patch('subscriptions.warn_users')
+    def test_process_update(self, warn_users_mock, get_chat_ids_of_warned_users_mock, get_subscriptions_mock,
+                            get_active_warnings_dict_mock):
+        subscriptions._pending_warnings.clear()
+        warning_1 = (get_test_general_warning(warning_id="WARNING_ID_ABC", severity=WarningSeverity.MINOR),
+                     WarningCategory.FLOOD)
+        warning_2 = (get_test_general_warning(warning_id="WARNING_ID_DEF", severity=WarningSeverity.SEVERE),
+                     WarningCategory.WEATHER)
+        snapshot = warning_feed.WarningSnapshot((warning_1, warning_2), frozenset(), 0)
+
+        with self.subTest('Only warnings with postal codes are checked, the others stay pending'):
+            get_active_warnings_dict_mock.return_value = {"WARNING_ID_ABC": ["64283"]}
+            update = warning_feed.WarningFeedUpdate(snapshot, (warning_feed.WarningAdded(*warning_1),
+                                                               warning_feed.WarningAdded(*warning_2)), True)
+            subscriptions.process_update(update)
+            warn_users_mock.assert_called_with([warning_1, warning_2], [warning_1])
+
+        with self.subTest('The pending warning is checked once it has postal codes'):
+            get_active_warnings_dict_mock.return_value = {"WARNING_ID_ABC": ["64283"], "WARNING_ID_DEF": ["64283"]}
+            subscriptions.process_update(warning_feed.WarningFeedUpdate(snapshot, (), False))
+            warn_users_mock.assert_called_with([warning_1, warning_2], [warning_2])
+            self.assertEqual({}, subscriptions._pending_warnings)
+
+    @patch('data_service.get_active_warnings_dict')
+    @patch('subscriptions.warn_users')
+    def test_process_mapped_warning(self, warn_users_mock, get_active_warnings_dict_mock):
+        subscriptions._pending_warnings.clear()
+        warning_1 = (get_test_general_warning(warning_id="WARNING_ID_ABC", severity=WarningSeverity.MINOR),
+                     WarningCategory.FLOOD)
+        warning_2 = (get_test_general_warning(warning_id="WARNING_ID_DEF", severity=WarningSeverity.SEVERE),
+                     WarningCategory.WEATHER)
+        snapshot = warning_feed.WarningSnapshot((warning_1, warning_2), frozenset(), 0)
+        get_active_warnings_dict_mock.return_value = {}
+        subscriptions.process_update(warning_feed.WarningFeedUpdate(snapshot, (warning_feed.WarningAdded(*warning_1),
+                                                                               warning_feed.WarningAdded(*warning_2)),
+                                                                    True))
+
+        with self.subTest('A pending warning is checked as soon as the warning handler wrote its postal codes'):
+            subscriptions.process_mapped_warning("WARNING_ID_DEF")
+            warn_users_mock.assert_called_with([warning_1, warning_2], [warning_2])
+            self.assertEqual(["WARNING_ID_ABC"], list(subscriptions._pending_warnings))
+
+        with self.subTest('A warning that is not pending is not checked again'):
+            warn_users_mock.reset_mock()
+            self.assertFalse(subscriptions.process_mapped_warning("WARNING_ID_DEF"))
+            warn_users_mock.assert_not_called()
+
     @patch('data_service.get_subscriptions')
     def test_any_user_subscription_matches_warning(self, get_subscriptions_mock):
         # Mock subscription
@@ -162,6 +209,12 @@ class TestSubscriptions(TestCase):
                                                                                             WarningCategory.FLOOD)
             self.assertTrue(result)
 
+        with self.subTest('Match with extreme warning'):
+            warning = get_test_general_warning(warning_id="test warning abc", severity=WarningSeverity.EXTREME)
+            result = subscriptions._do_subscription_and_warning_match_severity_and_category(warning, demo_subscription,
+                                                                                            WarningCategory.FLOOD)
+            self.assertTrue(result)
+
         with self.subTest('No match with lower severity in warning'):
             demo_subscription = get_test_subscription(postal_code="35394",
                                                       warning_category=WarningCategory.FLOOD,
@@ -177,5 +230,25 @@ class TestSubscriptions(TestCase):
                                                                                             WarningCategory.CIVIL_PROTECTION)
             self.assertFalse(result)
 
+    def test_subscription_levels_match_warning_severities(self):
+        # the levels a user can choose: "minor" gets all warnings, "severe" only the severe and extreme ones
+        expected_matches = {
+            WarningSeverity.MINOR: {WarningSeverity.MINOR: True, WarningSeverity.MODERATE: True,
+                                    WarningSeverity.SEVERE: True, WarningSeverity.EXTREME: True,
+                                    WarningSeverity.MANUAL: False},
+            WarningSeverity.SEVERE: {WarningSeverity.MINOR: False, WarningSeverity.MODERATE: False,
+                                     WarningSeverity.SEVERE: True, WarningSeverity.EXTREME: True,
+                                     WarningSeverity.MANUAL: False}
+        }
+        for subscription_severity, matches in expected_matches.items():
+            demo_subscription = get_test_subscription(postal_code="35394", warning_category=WarningCategory.FLOOD,
+                                                      warning_severity=subscription_severity)
+            for warning_severity, expected in matches.items():
+                with self.subTest(subscription=subscription_severity.name, warning=warning_severity.name):
+                    warning = get_test_general_warning(warning_id="test warning abc", severity=warning_severity)
+                    result = subscriptions._do_subscription_and_warning_match_severity_and_category(
+                        warning, demo_subscription, WarningCategory.FLOOD)
+                    self.assertEqual(expected, result)
+
     if __name__ == '__main__':
         unittest.main()
@@ -0,0 +1,65 @@
+import sys
+import unittest
+
+from mock import patch, call
+
+sys.path.insert(0, "..\\source")
+
+import warning_expiry
+
+
+class MyTestCase(unittest.TestCase):
+    def setUp(self):
+        warning_expiry._expiry_heap.clear()
+        warning_expiry._scheduled_warnings.clear()
+        warning_expiry._expired_warning_versions.clear()
+
+    @patch('nina_service.remove_warning_from_caches')
+    @patch('data_service.remove_warning_id_from_all_warnings_received_lists')
+    @patch('data_service.remove_from_active_warnings_dict_if_present')
+    def test_warnings_are_removed_in_order_of_expiry(self, remove_from_active_warnings_mock,
+                                                     remove_from_received_lists_mock, remove_from_caches_mock):
+        warning_expiry.schedule("storm", 1, 300.0)
+        warning_expiry.schedule("frost", 1, 100.0)
+        warning_expiry.schedule("flood", 2, 200.0)
+        self.assertEqual(100.0, warning_expiry.get_statistics()['next_expiry'])
+
+        self.assertEqual([], warning_expiry.expire_due_warnings(99.0))
+        self.assertFalse(warning_expiry.has_expired("frost", 1, 99.0))
+        self.assertTrue(warning_expiry.has_expired("frost", 1, 100.0))
+        self.assertEqual(["frost", "flood"], warning_expiry.expire_due_warnings(250.0))
+        self.assertEqual([call("frost"), call("flood")], remove_from_active_warnings_mock.call_args_list)
+        self.assertEqual([call("frost"), call("flood")], remove_from_received_lists_mock.call_args_list)
+        self.assertEqual([call("frost"), call("flood")], remove_from_caches_mock.call_args_list)
+
+        # expired while still in the feed, a new version is not expired
+        self.assertTrue(warning_expiry.has_expired("flood", 2, 0.0))
+        self.assertFalse(warning_expiry.has_expired("flood", 3, 0.0))
+        self.assertEqual(1, warning_expiry.get_statistics()['scheduled'])
+
+    @patch('nina_service.remove_warning_from_caches')
+    @patch('data_service.remove_warning_id_from_all_warnings_received_lists')
+    @patch('data_service.remove_from_active_warnings_dict_if_present')
+    def test_rescheduled_and_forgotten_warnings(self, remove_from_active_warnings_mock,
+                                                remove_from_received_lists_mock, remove_from_caches_mock):
+        # a new version ends later, the old entry of the heap is skipped
+        warning_expiry.schedule("storm", 1, 100.0)
+        warning_expiry.schedule("storm", 2, 300.0)
+        self.assertEqual([], warning_expiry.expire_due_warnings(200.0))
+        self.assertFalse(warning_expiry.has_expired("storm", 2, 200.0))
+
+        # not in the feed anymore
+        warning_expiry.forget("storm")
+        self.assertEqual([], warning_expiry.expire_due_warnings(400.0))
+        remove_from_active_warnings_mock.assert_not_called()
+        self.assertEqual(0, warning_expiry.get_statistics()['scheduled'])
+
+        # the heap is compacted when warnings are rescheduled again and again
+        for version in range(1000):
+            warning_expiry.schedule("storm", version, 500.0 + version)
+        self.assertLess(len(warning_expiry._expiry_heap), 100)
+        self.assertEqual(["storm"], warning_expiry.expire_due_warnings(1500.0))
+
+
+if __name__ == '__main__':
+    unittest.main()
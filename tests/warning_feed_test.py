@@ -0,0 +1,156 @@
+import sys
+import time
+import unittest
+
+from mock import patch
+from requests import HTTPError
+
+sys.path.insert(0, "..\\source")
+
+import data_service
+import warning_feed
+from nina_service import ActiveWarningsPoll, GeneralWarning, WarningCategory, WarningSeverity, WarningType
+
+
+def _get_test_warning(warning_id: str) -> GeneralWarning:
+    return GeneralWarning(warning_id, 0, "2023-02-13 04:00", WarningSeverity.MINOR, WarningType.ALERT, "Test warning")
+
+
+def _get_poll(warnings: list, failed_categories: set, stale_categories: set, feed_results: dict = None,
+              changed_feeds: set = None) -> ActiveWarningsPoll:
+    return ActiveWarningsPoll(warnings, failed_categories, stale_categories, feed_results or {}, changed_feeds or set())
+
+
+_INTERVALS = {'dwd': {'floor': 10, 'ceiling': 30}, 'mowas': {'floor': 5, 'ceiling': 60}}
+
+
+class MyTestCase(unittest.TestCase):
+    def setUp(self):
+        # the tests patch the config
+        data_service.get_cached_config.cache_clear()
+        warning_feed._snapshot = None
+        warning_feed._known_warnings = {}
+        warning_feed._feed_schedules.clear()
+        warning_feed._subscriber_queues.clear()
+        self.weather_warning = (_get_test_warning("weather"), WarningCategory.WEATHER)
+        self.flood_warning = (_get_test_warning("flood"), WarningCategory.FLOOD)
+
+    def tearDown(self):
+        data_service.get_cached_config.cache_clear()
+
+    @patch('data_service.get_config', return_value={'warning_feed_intervals_in_seconds': {'dwd': {'floor': 60,
+                                                                                                  'ceiling': 120}}})
+    @patch('nina_service.poll_active_warnings')
+    def test_snapshot_is_shared(self, poll_active_warnings_mock, get_config_mock):
+        poll_active_warnings_mock.return_value = _get_poll([self.weather_warning, self.flood_warning], set(), set())
+
+        snapshot = warning_feed.get_snapshot()
+        self.assertTrue(snapshot.complete)
+        self.assertEqual([self.weather_warning[0]], warning_feed.get_warnings(WarningCategory.WEATHER))
+        self.assertEqual([], warning_feed.get_warnings(WarningCategory.CIVIL_PROTECTION))
+        self.assertIs(snapshot, warning_feed.get_snapshot())
+        self.assertEqual(1, poll_active_warnings_mock.call_count)
+
+        # an old snapshot is polled again
+        warning_feed._snapshot = warning_feed.WarningSnapshot(snapshot.warnings, snapshot.failed_categories,
+                                                              time.time() - 121)
+        self.assertIsNot(snapshot, warning_feed.get_snapshot())
+        self.assertEqual(2, poll_active_warnings_mock.call_count)
+
+    @patch('nina_service.poll_active_warnings')
+    def test_subscribers_get_every_update(self, poll_active_warnings_mock):
+        poll_active_warnings_mock.return_value = _get_poll([self.weather_warning], set(), set())
+        first_snapshot = warning_feed.poll()
+
+        # a new subscriber starts with the latest snapshot
+        updates = warning_feed.subscribe()
+        update = updates.get_nowait()
+        self.assertIs(first_snapshot, update.snapshot)
+        self.assertTrue(update.initial)
+        self.assertEqual((warning_feed.WarningAdded(*self.weather_warning),), update.events)
+
+        # a subscriber that is behind gets every update in order
+        poll_active_warnings_mock.return_value = _get_poll([self.weather_warning, self.flood_warning], set(), set())
+        warning_feed.poll()
+        poll_active_warnings_mock.return_value = _get_poll([self.flood_warning], set(), set())
+        warning_feed.poll()
+        self.assertEqual((warning_feed.WarningAdded(*self.flood_warning),), updates.get_nowait().events)
+        update = updates.get_nowait()
+        self.assertFalse(update.initial)
+        self.assertEqual((warning_feed.WarningExpired(*self.weather_warning),), update.events)
+        self.assertTrue(updates.empty())
+
+        # nothing changed: no events
+        warning_feed.poll()
+        self.assertEqual((), updates.get_nowait().events)
+
+    def test_diff_warnings(self):
+        updated_weather_warning = (GeneralWarning("weather", 1, "2023-02-13 05:00", WarningSeverity.SEVERE,
+                                                  WarningType.UPDATE, "Test warning"), WarningCategory.WEATHER)
+        events, known_warnings = warning_feed.diff_warnings(
+            {}, warning_feed.WarningSnapshot((self.weather_warning, self.flood_warning), frozenset(), 0))
+        self.assertEqual([warning_feed.WarningAdded(*self.weather_warning),
+                          warning_feed.WarningAdded(*self.flood_warning)], events)
+
+        with self.subTest('version bump'):
+            snapshot = warning_feed.WarningSnapshot((updated_weather_warning, self.flood_warning), frozenset(), 1)
+            events, next_known_warnings = warning_feed.diff_warnings(known_warnings, snapshot)
+            self.assertEqual([warning_feed.WarningUpdated(*updated_weather_warning, 0)], events)
+
+        with self.subTest('the flood feed failed, so its warning is not expired'):
+            snapshot = warning_feed.WarningSnapshot((self.weather_warning,), frozenset({WarningCategory.FLOOD}), 1)
+            events, next_known_warnings = warning_feed.diff_warnings(known_warnings, snapshot)
+            self.assertEqual([], events)
+            self.assertEqual(known_warnings, next_known_warnings)
+
+            # expired while the feed failed
+            snapshot = warning_feed.WarningSnapshot((self.weather_warning,), frozenset(), 2)
+            events, next_known_warnings = warning_feed.diff_warnings(next_known_warnings, snapshot)
+            self.assertEqual([warning_feed.WarningExpired(*self.flood_warning)], events)
+
+    @patch('nina_service.poll_active_warnings')
+    def test_failed_category(self, poll_active_warnings_mock):
+        poll_active_warnings_mock.return_value = _get_poll([self.weather_warning], {WarningCategory.FLOOD}, set())
+        snapshot = warning_feed.poll()
+        self.assertFalse(snapshot.complete)
+        self.assertEqual([self.weather_warning[0]], snapshot.get_warnings(WarningCategory.WEATHER))
+        with self.assertRaises(HTTPError):
+            snapshot.get_warnings(WarningCategory.FLOOD)
+
+        # the last successful poll of the feed is used, even if it had no warnings
+        poll_active_warnings_mock.return_value = _get_poll([self.weather_warning], {WarningCategory.FLOOD},
+                                                              {WarningCategory.FLOOD})
+        self.assertEqual([], warning_feed.poll().get_warnings(WarningCategory.FLOOD))
+
+
+    @patch('data_service.get_config', return_value={'warning_feed_intervals_in_seconds': _INTERVALS})
+    def test_adaptive_intervals(self, get_config_mock):
+        extreme_warning = GeneralWarning("extreme", 0, "2023-02-13 04:00", WarningSeverity.EXTREME, WarningType.ALERT,
+                                         "Test warning")
+        warnings = {'dwd': [self.weather_warning[0]], 'mowas': [extreme_warning]}
+
+        # changed: floor
+        warning_feed._update_feed_schedules(_get_poll([], set(), set(), warnings, {'dwd', 'mowas'}), 0)
+        self.assertEqual(10, warning_feed._feed_schedules['dwd'].interval_in_seconds)
+
+        # unchanged: back off up to the ceiling, but a feed with an extreme warning stays at the floor
+        for i in range(0, 2):
+            warning_feed._update_feed_schedules(_get_poll([], set(), set(), warnings, set()), 0)
+        self.assertEqual(22.5, warning_feed._feed_schedules['dwd'].interval_in_seconds)
+        warning_feed._update_feed_schedules(_get_poll([], set(), set(), warnings, set()), 100)
+        self.assertEqual(30, warning_feed._feed_schedules['dwd'].interval_in_seconds)
+        self.assertEqual(130, warning_feed._feed_schedules['dwd'].next_poll_at)
+        self.assertEqual(5, warning_feed._feed_schedules['mowas'].interval_in_seconds)
+
+        # a failed feed keeps its interval
+        warning_feed._update_feed_schedules(_get_poll([], set(), set(), {'dwd': None}, set()), 200)
+        self.assertEqual(30, warning_feed._feed_schedules['dwd'].interval_in_seconds)
+
+        # only the due feeds are polled, a feed without schedule is due
+        with patch('nina_service.get_feed_names', return_value=['dwd', 'mowas', 'lhp']):
+            self.assertEqual({'mowas', 'lhp'}, warning_feed._get_due_feed_names(229))
+            self.assertEqual({'dwd', 'mowas', 'lhp'}, warning_feed._get_due_feed_names(230))
+
+
+if __name__ == '__main__':
+    unittest.main()
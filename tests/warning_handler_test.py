@@ -0,0 +1,140 @@
+import queue
+import sys
+import unittest
+from concurrent.futures import Future
+
+from mock import patch, call
+
+sys.path.insert(0, "..\\source")
+
+import nina_service
+import shapely
+import warning_expiry
+import warning_handler
+from nina_service import GeneralWarning, WarningSeverity
+
+
+def _get_test_warning(warning_id: str, severity: str, start_date: str, version: int = 1) -> GeneralWarning:
+    return GeneralWarning._from_map_data({"id": warning_id, "version": version, "startDate": start_date,
+                                          "severity": severity, "type": "Alert", "i18nTitle": {"de": "Test warning"}})
+
+
+def _process_all_warnings():
+    while True:
+        try:
+            warning_handler._process_next_warning(timeout=0)
+        except queue.Empty:
+            return
+
+
+class MyTestCase(unittest.TestCase):
+    def setUp(self):
+        _process_all_warnings()
+        warning_handler._queued_warning_versions.clear()
+        warning_handler._queue_statistics.clear()
+        warning_expiry._scheduled_warnings.clear()
+        warning_expiry._expired_warning_versions.clear()
+
+    @patch('data_service.get_active_warnings_dict')
+    def test_regional_warnings_for_postal_code(self, get_active_warnings_dict_mock):
+        warnings = [_get_test_warning("in area", "Minor", "2023-02-13T04:00:00+01:00"),
+                    _get_test_warning("other area", "Minor", "2023-02-13T04:00:00+01:00"),
+                    _get_test_warning("not mapped yet", "Minor", "2023-02-13T04:00:00+01:00")]
+        get_active_warnings_dict_mock.return_value = {"in area": ["61440", "61449"], "other area": ["61348"]}
+
+        result = warning_handler.get_regional_warnings_for_postal_code(warnings, "61440")
+        self.assertEqual(["in area", "not mapped yet"], [warning.id for warning in result])
+
+    @patch('data_service.write_to_active_warnings_dict')
+    def test_most_severe_warnings_are_processed_first(self, write_to_active_warnings_dict_mock):
+        warnings = [_get_test_warning("minor", "Minor", "2023-02-13T04:00:00+01:00"),
+                    _get_test_warning("severe late", "Severe", "2023-02-13T06:00:00+01:00"),
+                    _get_test_warning("extreme", "Extreme", "2023-02-13T08:00:00+01:00"),
+                    _get_test_warning("severe early", "Severe", "2023-02-13T04:30:00+00:00"),
+                    _get_test_warning("moderate", "Moderate", "2023-02-13T04:00:00+01:00")]
+        for counter, warning in enumerate(warnings, start=1):
+            warning_handler._enqueue_warning(counter, warning, ["64283"])
+        self.assertEqual(2, warning_handler.get_queue_statistics()['SEVERE']['queued'])
+
+        _process_all_warnings()
+        self.assertEqual([call("extreme", ["64283"]), call("severe early", ["64283"]),
+                          call("severe late", ["64283"]), call("moderate", ["64283"]), call("minor", ["64283"])],
+                         write_to_active_warnings_dict_mock.call_args_list)
+        statistics = warning_handler.get_queue_statistics()
+        self.assertEqual({'queued': 0, 'processed': 2}, {key: statistics['SEVERE'][key]
+                                                         for key in ['queued', 'processed']})
+        self.assertGreaterEqual(statistics['MINOR']['max_wait_in_seconds'],
+                                statistics['EXTREME']['max_wait_in_seconds'])
+
+    @patch('data_service.write_to_active_warnings_dict')
+    def test_superseded_and_expired_warnings_are_skipped(self, write_to_active_warnings_dict_mock):
+        # the same version is only queued once, an older version is skipped
+        warning_handler._enqueue_warning(1, _get_test_warning("storm", "Minor", "2023-02-13T04:00:00+01:00"), ["1"])
+        warning_handler._enqueue_warning(1, _get_test_warning("storm", "Minor", "2023-02-13T04:00:00+01:00"), ["1"])
+        warning_handler._enqueue_warning(1, _get_test_warning("storm", "Extreme", "2023-02-13T04:00:00+01:00", 2),
+                                         ["2"])
+        # not in the feed anymore
+        warning_handler._enqueue_warning(2, _get_test_warning("flood", "Severe", "2023-02-13T04:00:00+01:00"), ["3"])
+        warning_handler._forget_queued_warning("flood")
+        # ended while it was queued
+        warning_handler._enqueue_warning(3, _get_test_warning("frost", "Minor", "2023-02-13T05:00:00+01:00"), ["4"])
+        warning_expiry.schedule("frost", 1, 0.0)
+
+        _process_all_warnings()
+        self.assertEqual([call("storm", ["2"])], write_to_active_warnings_dict_mock.call_args_list)
+        statistics = warning_handler.get_queue_statistics()
+        self.assertEqual(0, sum(severity_statistics['queued'] for severity_statistics in statistics.values()))
+        self.assertEqual(0, statistics['SEVERE']['processed'])
+
+    @patch('warning_handler._warning_mapped_listeners', [])
+    @patch('data_service.write_to_active_warnings_dict')
+    def test_listeners_are_called_after_writing(self, write_to_active_warnings_dict_mock):
+        mapped_warning_ids = []
+        warning_handler.add_warning_mapped_listener(mapped_warning_ids.append)
+        warning_handler.add_warning_mapped_listener(lambda warning_id: 1 / 0)  # a broken listener is skipped
+
+        warning_handler._enqueue_warning(1, _get_test_warning("storm", "Minor", "2023-02-13T04:00:00+01:00"), ["1"])
+        warning_handler._enqueue_warning(2, _get_test_warning("flood", "Severe", "2023-02-13T04:00:00+01:00"), ["2"])
+        warning_handler._forget_queued_warning("flood")
+        _process_all_warnings()
+
+        # only warnings whose postal codes were written
+        self.assertEqual([call("storm", ["1"])], write_to_active_warnings_dict_mock.call_args_list)
+        self.assertEqual(["storm"], mapped_warning_ids)
+
+    @patch('place_converter.get_postal_code_store')
+    @patch('nina_service.get_detailed_warning_geo')
+    @patch('postal_code_mapper.submit')
+    @patch('data_service.write_to_active_warnings_dict')
+    def test_postal_codes_are_mapped_in_worker_processes(self, write_to_active_warnings_dict_mock, submit_mock,
+                                                         get_detailed_warning_geo_mock, get_postal_code_store_mock):
+        area = nina_service.GeoCoordinates(shapely.Polygon([[0, 0], [1, 0], [1, 1], [0, 0]]))
+        get_detailed_warning_geo_mock.return_value = nina_service.DetailedWarningGeo(affected_areas=[area])
+        futures = {}
+        submit_mock.side_effect = lambda store, warning_id, rings: futures.setdefault(warning_id, Future())
+
+        warning = _get_test_warning("storm", "Severe", "2023-02-13T04:00:00+01:00")
+        warning_handler._enqueue_warning(1, warning, None)
+        future = warning_handler._process_next_warning(timeout=0)
+        self.assertIs(futures["storm"], future)
+        # only the id and the rings are sent to the worker
+        self.assertEqual("storm", submit_mock.call_args[0][1])
+        self.assertEqual([[0, 0], [1, 0], [1, 1], [0, 0]], submit_mock.call_args[0][2][0].tolist())
+
+        # the same version is not queued again while it is mapped, the result is written in the parent
+        warning_handler._enqueue_warning(1, warning, None)
+        self.assertTrue(warning_handler._processing_queue.empty())
+        futures["storm"].set_result(("storm", ["64283"]))
+        write_to_active_warnings_dict_mock.assert_called_once_with("storm", ["64283"])
+
+        # not written if the warning was removed while it was mapped
+        warning_handler._enqueue_warning(1, warning, None)
+        del futures["storm"]
+        warning_handler._process_next_warning(timeout=0)
+        warning_handler._forget_queued_warning("storm")
+        futures["storm"].set_result(("storm", ["64283"]))
+        self.assertEqual(1, write_to_active_warnings_dict_mock.call_count)
+
+
+if __name__ == '__main__':
+    unittest.main()